@@ -1,9 +1,11 @@
 from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..core.db import get_db
+from ..core.db import get_async_db, count_rows, get_pool_metrics
+from ..core.counting import CountMode
 from ..core.dependencies import admin_required
 from ..models.album import Album
 from ..models.blog import BlogPost, Comment
@@ -26,16 +28,18 @@ async def list_all_users(
         keyword: str = None,
         role: str = None,
         is_active: bool = None,
+        count_mode: CountMode = CountMode.AUTO,
         current_user=Depends(admin_required),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    users, total = get_all_users(
+    users, total = await get_all_users(
         db=db,
         page=page,
         page_size=page_size,
         keyword=keyword,
         role=role,
-        is_active=is_active
+        is_active=is_active,
+        count_mode=count_mode
     )
 
     return {
@@ -56,7 +60,7 @@ async def change_user_role(
         user_id: str,
         role: Role,
         current_user=Depends(admin_required),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     # 禁止修改自己的角色
     if user_id == current_user.id:
@@ -65,7 +69,7 @@ async def change_user_role(
             detail="不能修改自己的角色"
         )
 
-    user = update_user_role(
+    user = await update_user_role(
         db=db,
         user_id=user_id,
         role=role
@@ -84,7 +88,7 @@ async def change_user_active_status(
         user_id: str,
         is_active: bool,
         current_user=Depends(admin_required),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     # 禁止禁用自己
     if user_id == current_user.id:
@@ -93,7 +97,7 @@ async def change_user_active_status(
             detail="不能禁用自己的账号"
         )
 
-    user = toggle_user_active(
+    user = await toggle_user_active(
         db=db,
         user_id=user_id,
         is_active=is_active
@@ -112,18 +116,18 @@ async def change_user_active_status(
 @router.get("/system/stats")
 async def get_system_statistics(
         current_user=Depends(admin_required),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     # 用户统计
-    total_users = db.query(User).count()
-    active_users = db.query(User).filter(User.is_active == True).count()
-    admin_users = db.query(User).filter(User.role == Role.ADMIN).count()
+    total_users = await count_rows(db, select(User.id))
+    active_users = await count_rows(db, select(User.id).where(User.is_active == True))
+    admin_users = await count_rows(db, select(User.id).where(User.role == Role.ADMIN))
 
     # 内容统计
-    total_albums = db.query(Album).filter(Album.is_deleted == False).count()
-    total_images = db.query(Image).filter(Image.is_deleted == False).count()
-    total_blogs = db.query(BlogPost).filter(BlogPost.is_draft == False).count()
-    total_comments = db.query(Comment).count()
+    total_albums = await count_rows(db, select(Album.id).where(Album.is_deleted == False))
+    total_images = await count_rows(db, select(Image.id).where(Image.is_deleted == False))
+    total_blogs = await count_rows(db, select(BlogPost.id).where(BlogPost.is_draft == False))
+    total_comments = await count_rows(db, select(Comment.id))
 
     # 存储统计
     # 实际项目中应计算文件大小总和
@@ -138,15 +142,15 @@ async def get_system_statistics(
     from datetime import datetime, timedelta
     seven_days_ago = datetime.now() - timedelta(days=7)
 
-    new_users_7d = db.query(User).filter(User.created_at >= seven_days_ago).count()
-    new_albums_7d = db.query(Album).filter(
+    new_users_7d = await count_rows(db, select(User.id).where(User.created_at >= seven_days_ago))
+    new_albums_7d = await count_rows(db, select(Album.id).where(
         Album.created_at >= seven_days_ago,
         Album.is_deleted == False
-    ).count()
-    new_images_7d = db.query(Image).filter(
+    ))
+    new_images_7d = await count_rows(db, select(Image.id).where(
         Image.created_at >= seven_days_ago,
         Image.is_deleted == False
-    ).count()
+    ))
 
     stats = {
         "user_stats": {
@@ -173,6 +177,18 @@ async def get_system_statistics(
     }
 
 
+# 获取数据库连接池配置与运行指标（取连接等待耗时、借出数、溢出连接、等待超时）
+@router.get("/system/db-pool")
+async def get_db_pool_metrics(
+        current_user=Depends(admin_required)
+):
+    return {
+        "code": 200,
+        "message": "获取连接池指标成功",
+        "data": get_pool_metrics()
+    }
+
+
 # 获取用户行为日志（简化版）
 @router.get("/logs/action")
 async def get_user_action_logs(
@@ -183,7 +199,7 @@ async def get_user_action_logs(
         page: int = 1,
         page_size: int = 10,
         current_user=Depends(admin_required),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     # 实际项目中应实现完整的日志系统
     # 这里返回模拟数据
@@ -209,7 +225,7 @@ async def manage_sensitive_word_list(
         action: str,  # add/delete/replace
         replace_word: str = "*",
         current_user=Depends(admin_required),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     # 实际项目中应将敏感词存储到数据库
     # 这里仅返回操作结果
@@ -1,13 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from ..core.db import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.db import get_async_db
+from ..core.counting import CountMode
 from ..core.dependencies import get_current_user
 from ..services.album_service import (
     create_album, get_album_list, get_album_detail, update_album,
     delete_album, restore_album, get_recycle_albums
 )
 from ..utils.security_utils import AlbumPermission, verify_album_password
-from ..utils.format_utils import model_to_dict, format_pagination_response
+from ..utils.format_utils import model_to_dict, format_pagination_response, format_cursor_response
 
 router = APIRouter()
 
@@ -20,9 +21,9 @@ async def create_new_album(
         permission: AlbumPermission = AlbumPermission.PUBLIC,
         password: str = None,
         current_user=Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    album = create_album(
+    album = await create_album(
         db=db,
         user_id=current_user.id,
         name=name,
@@ -44,15 +45,37 @@ async def list_albums(
         page: int = 1,
         page_size: int = 10,
         permission: AlbumPermission = None,
+        cursor: str = None,
+        count_mode: CountMode = CountMode.AUTO,
         current_user=Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    albums, total = get_album_list(
+    # 游标分页：传 cursor=（空）取第一页，之后回传上一页的 next_cursor
+    if cursor is not None:
+        albums, next_cursor = await get_album_list(
+            db=db,
+            user_id=current_user.id,
+            page_size=page_size,
+            permission=permission,
+            cursor=cursor
+        )
+        return {
+            "code": 200,
+            "message": "获取图片集列表成功",
+            "data": format_cursor_response(
+                items=[model_to_dict(album) for album in albums],
+                next_cursor=next_cursor,
+                page_size=page_size
+            )
+        }
+
+    albums, total = await get_album_list(
         db=db,
         user_id=current_user.id,
         page=page,
         page_size=page_size,
-        permission=permission
+        permission=permission,
+        count_mode=count_mode
     )
 
     return {
@@ -73,9 +96,9 @@ async def get_album(
         album_id: str,
         password: str = None,
         current_user=Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    album = get_album_detail(
+    album = await get_album_detail(
         db=db,
         album_id=album_id,
         user_id=current_user.id,
@@ -99,9 +122,9 @@ async def update_album_info(
         password: str = None,
         cover_image_id: str = None,
         current_user=Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    album = update_album(
+    album = await update_album(
         db=db,
         album_id=album_id,
         user_id=current_user.id,
@@ -124,9 +147,9 @@ async def update_album_info(
 async def remove_album(
         album_id: str,
         current_user=Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    result = delete_album(
+    result = await delete_album(
         db=db,
         album_id=album_id,
         user_id=current_user.id
@@ -144,9 +167,9 @@ async def remove_album(
 async def verify_album_pwd(
         album_id: str,
         password: str,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    album = get_album_detail(db=db, album_id=album_id)
+    album = await get_album_detail(db=db, album_id=album_id)
 
     if album.permission != AlbumPermission.PROTECTED:
         raise HTTPException(
@@ -173,9 +196,9 @@ async def set_album_pwd(
         album_id: str,
         password: str,
         current_user=Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    album = update_album(
+    album = await update_album(
         db=db,
         album_id=album_id,
         user_id=current_user.id,
@@ -195,9 +218,9 @@ async def set_album_pwd(
 async def restore_deleted_album(
         album_id: str,
         current_user=Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    album = restore_album(
+    album = await restore_album(
         db=db,
         album_id=album_id,
         user_id=current_user.id
@@ -215,14 +238,16 @@ async def restore_deleted_album(
 async def list_recycle_albums(
         page: int = 1,
         page_size: int = 10,
+        count_mode: CountMode = CountMode.AUTO,
         current_user=Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    albums, total = get_recycle_albums(
+    albums, total = await get_recycle_albums(
         db=db,
         user_id=current_user.id,
         page=page,
-        page_size=page_size
+        page_size=page_size,
+        count_mode=count_mode
     )
 
     return {
@@ -1,12 +1,13 @@
 # backend/app/api/auth_api.py - 完整注册接口
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel, EmailStr, field_validator
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import re
 import uuid
 from datetime import datetime
 
-from ..core.db import get_db
+from ..core.db import get_async_db
 from ..core.dependencies import (
     get_password_hash, verify_password, create_access_token, get_current_user
 )
@@ -47,16 +48,16 @@ class LoginRequest(BaseModel):
 @router.post("/register", summary="用户注册")
 async def register_user(
         req: RegisterRequest,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     try:
         # 检查用户名是否已存在
-        existing_user = db.query(User).filter(User.username == req.username).first()
+        existing_user = await db.scalar(select(User).where(User.username == req.username))
         if existing_user:
             raise HTTPException(status_code=400, detail="用户名已存在")
 
         # 检查邮箱是否已存在
-        existing_email = db.query(User).filter(User.email == req.email).first()
+        existing_email = await db.scalar(select(User).where(User.email == req.email))
         if existing_email:
             raise HTTPException(status_code=400, detail="邮箱已被注册")
 
@@ -74,8 +75,8 @@ async def register_user(
 
         # 保存到数据库
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
 
         return {
             "code": 200,
@@ -89,7 +90,7 @@ async def register_user(
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"注册失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"注册失败: {str(e)}")
 
@@ -98,11 +99,11 @@ async def register_user(
 @router.post("/login", summary="用户登录")
 async def login_user(
         req: LoginRequest,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     try:
         # 根据用户名查询用户
-        user = db.query(User).filter(User.username == req.username).first()
+        user = await db.scalar(select(User).where(User.username == req.username))
 
         # 检查用户是否存在
         if not user:
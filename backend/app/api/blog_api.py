@@ -2,10 +2,11 @@
 from fastapi import APIRouter, HTTPException, Depends, Query, Path
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # 导入数据库依赖和服务
-from ..core.db import get_db
+from ..core.db import get_async_db
+from ..core.counting import CountMode
 from ..services.blog_service import (
     create_blog_post,
     get_blog_post_by_id,
@@ -18,6 +19,7 @@ from ..services.blog_service import (
 )
 from ..core.dependencies import get_current_user
 from ..models.user import User
+from ..utils.format_utils import count_info
 
 router = APIRouter()
 
@@ -50,11 +52,11 @@ class CommentCreateRequest(BaseModel):
 @router.post("/", summary="创建博客", response_model=Dict[str, Any])
 async def create_blog(
         req: BlogCreateRequest,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         current_user: User = Depends(get_current_user)
 ):
     try:
-        blog = create_blog_post(
+        blog = await create_blog_post(
             db=db,
             title=req.title,
             content=req.content,
@@ -76,12 +78,12 @@ async def create_blog(
 @router.get("/{blog_id}", summary="获取博客详情", response_model=Dict[str, Any])
 async def get_blog_detail(
         blog_id: str = Path(..., description="博客ID"),
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         current_user: Optional[User] = Depends(get_current_user)
 ):
     try:
         user_id = current_user.id if current_user else None
-        blog = get_blog_post_by_id(db=db, blog_id=blog_id, user_id=user_id)
+        blog = await get_blog_post_by_id(db=db, blog_id=blog_id, user_id=user_id)
 
         if not blog:
             raise HTTPException(status_code=404, detail="博客不存在或无访问权限")
@@ -105,14 +107,39 @@ async def get_blog_list(
         sort_field: str = Query("created_at", description="排序字段"),
         sort_order: str = Query("desc", description="排序方式"),
         is_draft: Optional[bool] = Query(None, description="是否草稿"),
-        db: Session = Depends(get_db),
+        cursor: Optional[str] = Query(None, description="分页游标（传空值取第一页，之后回传 next_cursor）"),
+        count_mode: CountMode = Query(CountMode.AUTO, description="总数计数方式：auto/exact/cached/estimate/has_more"),
+        db: AsyncSession = Depends(get_async_db),
         current_user: Optional[User] = Depends(get_current_user)
 ):
     try:
         user_id = current_user.id if current_user else None
+
+        if cursor is not None:
+            blogs, next_cursor = await get_blog_posts(
+                db=db,
+                limit=size,
+                keyword=keyword,
+                sort_field=sort_field,
+                sort_order=sort_order,
+                user_id=user_id,
+                is_draft=is_draft,
+                cursor=cursor
+            )
+            return {
+                "code": 200,
+                "message": "获取博客列表成功",
+                "data": {
+                    "list": [blog.to_dict() for blog in blogs],
+                    "next_cursor": next_cursor,
+                    "has_more": next_cursor is not None,
+                    "size": size
+                }
+            }
+
         skip = (page - 1) * size
 
-        blogs, total = get_blog_posts(
+        blogs, total = await get_blog_posts(
             db=db,
             skip=skip,
             limit=size,
@@ -120,20 +147,26 @@ async def get_blog_list(
             sort_field=sort_field,
             sort_order=sort_order,
             user_id=user_id,
-            is_draft=is_draft
+            is_draft=is_draft,
+            count_mode=count_mode
         )
 
+        pagination = count_info(total, page, size)
         return {
             "code": 200,
             "message": "获取博客列表成功",
             "data": {
                 "list": [blog.to_dict() for blog in blogs],
-                "total": total,
+                "total": int(total),
                 "page": page,
                 "size": size,
-                "pages": (total + size - 1) // size
+                "pages": pagination["total_pages"],
+                "has_more": pagination["has_more"],
+                "count_strategy": pagination["count_strategy"]
             }
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取博客列表失败: {str(e)}")
 
@@ -142,14 +175,14 @@ async def get_blog_list(
 async def update_blog(
         blog_id: str = Path(..., description="博客ID"),
         req: BlogUpdateRequest = Depends(),
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         current_user: User = Depends(get_current_user)
 ):
     try:
         # 转换请求数据为字典（过滤 None 值）
         update_data = {k: v for k, v in req.model_dump().items() if v is not None}
 
-        blog = update_blog_post(
+        blog = await update_blog_post(
             db=db,
             blog_id=blog_id,
             user_id=current_user.id,
@@ -173,11 +206,11 @@ async def update_blog(
 @router.delete("/{blog_id}", summary="删除博客", response_model=Dict[str, Any])
 async def delete_blog(
         blog_id: str = Path(..., description="博客ID"),
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         current_user: User = Depends(get_current_user)
 ):
     try:
-        success = delete_blog_post(
+        success = await delete_blog_post(
             db=db,
             blog_id=blog_id,
             user_id=current_user.id
@@ -202,16 +235,16 @@ async def delete_blog(
 async def create_blog_comment(
         blog_id: str = Path(..., description="博客ID"),
         req: CommentCreateRequest = Depends(),
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         current_user: User = Depends(get_current_user)
 ):
     try:
         # 检查博客是否存在
-        blog = get_blog_post_by_id(db=db, blog_id=blog_id, user_id=current_user.id)
+        blog = await get_blog_post_by_id(db=db, blog_id=blog_id, user_id=current_user.id)
         if not blog:
             raise HTTPException(status_code=404, detail="博客不存在")
 
-        comment = create_comment(
+        comment = await create_comment(
             db=db,
             content=req.content,
             blog_id=blog_id,
@@ -235,29 +268,55 @@ async def get_blog_comments(
         blog_id: str = Path(..., description="博客ID"),
         page: int = Query(1, ge=1, description="页码"),
         size: int = Query(20, ge=1, le=50, description="每页数量"),
-        db: Session = Depends(get_db),
+        cursor: Optional[str] = Query(None, description="分页游标（传空值取第一页，之后回传 next_cursor）"),
+        count_mode: CountMode = Query(CountMode.AUTO, description="总数计数方式：auto/exact/cached/estimate/has_more"),
+        db: AsyncSession = Depends(get_async_db),
         current_user: Optional[User] = Depends(get_current_user)
 ):
     try:
+        if cursor is not None:
+            comments, next_cursor = await get_comments_by_blog_id(
+                db=db,
+                blog_id=blog_id,
+                limit=size,
+                cursor=cursor
+            )
+            return {
+                "code": 200,
+                "message": "获取评论成功",
+                "data": {
+                    "list": [comment.to_dict() for comment in comments],
+                    "next_cursor": next_cursor,
+                    "has_more": next_cursor is not None,
+                    "size": size
+                }
+            }
+
         skip = (page - 1) * size
-        comments, total = get_comments_by_blog_id(
+        comments, total = await get_comments_by_blog_id(
             db=db,
             blog_id=blog_id,
             skip=skip,
-            limit=size
+            limit=size,
+            count_mode=count_mode
         )
 
+        pagination = count_info(total, page, size)
         return {
             "code": 200,
             "message": "获取评论成功",
             "data": {
                 "list": [comment.to_dict() for comment in comments],
-                "total": total,
+                "total": int(total),
                 "page": page,
                 "size": size,
-                "pages": (total + size - 1) // size
+                "pages": pagination["total_pages"],
+                "has_more": pagination["has_more"],
+                "count_strategy": pagination["count_strategy"]
             }
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取评论失败: {str(e)}")
 
@@ -265,11 +324,11 @@ async def get_blog_comments(
 @router.delete("/comments/{comment_id}", summary="删除评论", response_model=Dict[str, Any])
 async def delete_blog_comment(
         comment_id: str = Path(..., description="评论ID"),
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
         current_user: User = Depends(get_current_user)
 ):
     try:
-        success = delete_comment(
+        success = await delete_comment(
             db=db,
             comment_id=comment_id,
             user_id=current_user.id
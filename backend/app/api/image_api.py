@@ -1,19 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request, Header
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 import os
-from ..core.db import get_db
+import asyncio
+from fastapi.concurrency import run_in_threadpool
+from ..core.db import get_async_db
+from ..core.counting import CountMode
 from ..core.dependencies import get_current_user
 from ..services.image_service import (
-    upload_image, get_album_images, get_image_detail,
-    update_image_sort, delete_image, batch_delete_images
+    upload_image, upload_images_batch, get_album_images, get_image_detail,
+    update_image_sort, delete_image, batch_delete_images,
+    wait_for_image_processing, get_images_for_download
 )
-from ..utils.format_utils import model_to_dict, format_pagination_response
-from ..utils.file_utils import extract_exif_data
+from ..services.render_service import (
+    render_image, negotiate_render_format, RENDER_MEDIA_TYPES
+)
+from ..services.upload_session_service import (
+    create_upload_session, get_upload_session, write_upload_range,
+    complete_upload_session, abort_upload_session, format_upload_session
+)
+from ..services.zip_import_service import start_zip_import, get_zip_import
+from ..services.duplicate_service import (
+    find_similar_images, get_album_duplicate_report, DEFAULT_DUPLICATE_THRESHOLD
+)
+from ..utils.format_utils import (
+    image_to_dict, format_srcset, format_pagination_response, format_cursor_response
+)
+from ..utils.file_utils import extract_exif_data, iter_zip_stream, get_file_mime_type, safe_archive_name
+from ..utils.http_utils import media_file_response
+from ..utils.security_utils import sign_media_url, verify_media_url
+from ..core.config import settings
+from ..core.storage import get_storage, storage_key
 
 router = APIRouter()
 upload_router = APIRouter()
+# 签名媒体URL（生产环境由 nginx secure_link 校验，开发环境由此路由校验）
+media_router = APIRouter()
 
 
 # 上传图片到图片集
@@ -22,7 +45,7 @@ async def upload_images_to_album(
         album_id: str,
         files: List[UploadFile] = File(...),
         current_user=Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     if not files:
         raise HTTPException(
@@ -30,15 +53,13 @@ async def upload_images_to_album(
             detail="请选择要上传的图片"
         )
 
-    uploaded_images = []
-    for file in files:
-        image = upload_image(
-            db=db,
-            file=file,
-            album_id=album_id,
-            user_id=current_user.id
-        )
-        uploaded_images.append(model_to_dict(image))
+    images = await upload_images_batch(
+        db=db,
+        files=files,
+        album_id=album_id,
+        user_id=current_user.id
+    )
+    uploaded_images = [image_to_dict(image) for image in images]
 
     return {
         "code": 200,
@@ -47,16 +68,168 @@ async def upload_images_to_album(
     }
 
 
+# 上传ZIP压缩包导入图片集（后台逐个成员入库，返回导入任务）
+@upload_router.post("/images/{album_id}/zip")
+async def upload_zip_to_album(
+        album_id: str,
+        file: UploadFile = File(...),
+        current_user=Depends(get_current_user),
+        db: AsyncSession = Depends(get_async_db)
+):
+    zip_import = await start_zip_import(
+        db=db,
+        file=file,
+        album_id=album_id,
+        user_id=current_user.id
+    )
+
+    return {
+        "code": 200,
+        "message": "ZIP导入任务已创建",
+        "data": zip_import.to_dict()
+    }
+
+
+# 查询ZIP导入进度
+@upload_router.get("/zip-imports/{import_id}")
+async def get_zip_import_progress(
+        import_id: str,
+        current_user=Depends(get_current_user),
+        db: AsyncSession = Depends(get_async_db)
+):
+    zip_import = await get_zip_import(
+        db=db,
+        import_id=import_id,
+        user_id=current_user.id
+    )
+
+    return {
+        "code": 200,
+        "message": "获取导入进度成功",
+        "data": zip_import.to_dict()
+    }
+
+
+# 创建断点续传会话
+@upload_router.post("/images/{album_id}/sessions")
+async def create_resumable_upload(
+        album_id: str,
+        filename: str = Form(...),
+        total_size: int = Form(...),
+        content_type: str = Form(""),
+        current_user=Depends(get_current_user),
+        db: AsyncSession = Depends(get_async_db)
+):
+    session = await create_upload_session(
+        db=db,
+        album_id=album_id,
+        user_id=current_user.id,
+        filename=filename,
+        total_size=total_size,
+        content_type=content_type
+    )
+
+    return {
+        "code": 200,
+        "message": "上传会话创建成功",
+        "data": format_upload_session(session)
+    }
+
+
+# 查询断点续传会话（含缺失区间）
+@upload_router.get("/sessions/{session_id}")
+async def get_resumable_upload(
+        session_id: str,
+        current_user=Depends(get_current_user),
+        db: AsyncSession = Depends(get_async_db)
+):
+    session = await get_upload_session(
+        db=db,
+        session_id=session_id,
+        user_id=current_user.id
+    )
+
+    return {
+        "code": 200,
+        "message": "获取上传会话成功",
+        "data": format_upload_session(session)
+    }
+
+
+# 上传字节区间（请求体为原始字节，区间由 Content-Range 指定）
+@upload_router.put("/sessions/{session_id}")
+async def put_resumable_upload_range(
+        session_id: str,
+        request: Request,
+        content_range: str = Header(...),
+        current_user=Depends(get_current_user),
+        db: AsyncSession = Depends(get_async_db)
+):
+    session = await write_upload_range(
+        db=db,
+        session_id=session_id,
+        user_id=current_user.id,
+        content_range=content_range,
+        stream=request.stream()
+    )
+
+    return {
+        "code": 200,
+        "message": "区间上传成功",
+        "data": format_upload_session(session)
+    }
+
+
+# 完成断点续传，生成图片
+@upload_router.post("/sessions/{session_id}/complete")
+async def complete_resumable_upload(
+        session_id: str,
+        current_user=Depends(get_current_user),
+        db: AsyncSession = Depends(get_async_db)
+):
+    image = await complete_upload_session(
+        db=db,
+        session_id=session_id,
+        user_id=current_user.id
+    )
+
+    return {
+        "code": 200,
+        "message": "图片上传成功",
+        "data": image_to_dict(image)
+    }
+
+
+# 取消断点续传
+@upload_router.delete("/sessions/{session_id}")
+async def abort_resumable_upload(
+        session_id: str,
+        current_user=Depends(get_current_user),
+        db: AsyncSession = Depends(get_async_db)
+):
+    result = await abort_upload_session(
+        db=db,
+        session_id=session_id,
+        user_id=current_user.id
+    )
+
+    return {
+        "code": 200,
+        "message": "上传会话已取消",
+        "data": {"success": result}
+    }
+
+
 # 上传博客图片
 @upload_router.post("/blog-image")
 async def upload_blog_image(
         file: UploadFile = File(...),
         current_user=Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     # 复用图片上传逻辑，使用特殊的博客图片集ID
     # 实际项目中可创建专门的博客图片存储逻辑
-    image = upload_image(
+    image = await upload_image(
         db=db,
         file=file,
         album_id=f"blog_{current_user.id}",  # 虚拟图片集ID
@@ -76,22 +249,44 @@ async def list_album_images(
         album_id: str,
         page: int = 1,
         page_size: int = 20,
+        cursor: str = None,
+        count_mode: CountMode = CountMode.AUTO,
         current_user=Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    images, total = get_album_images(
+    # 游标分页（瀑布流无限滚动）：传 cursor=（空）取第一页，之后回传上一页的 next_cursor
+    if cursor is not None:
+        images, next_cursor = await get_album_images(
+            db=db,
+            album_id=album_id,
+            user_id=current_user.id,
+            page_size=page_size,
+            cursor=cursor
+        )
+        return {
+            "code": 200,
+            "message": "获取图片列表成功",
+            "data": format_cursor_response(
+                items=[image_to_dict(image, sign_urls=True) for image in images],
+                next_cursor=next_cursor,
+                page_size=page_size
+            )
+        }
+
+    images, total = await get_album_images(
         db=db,
         album_id=album_id,
         user_id=current_user.id,
         page=page,
-        page_size=page_size
+        page_size=page_size,
+        count_mode=count_mode
     )
 
     return {
         "code": 200,
         "message": "获取图片列表成功",
         "data": format_pagination_response(
-            items=[model_to_dict(image) for image in images],
+            items=[image_to_dict(image, sign_urls=True) for image in images],
             total=total,
             page=page,
             page_size=page_size
@@ -99,14 +294,42 @@ async def list_album_images(
     }
 
 
+# 图片集重复图片报告（近似重复的图片分组）
+@router.get("/album/{album_id}/duplicates")
+async def get_album_duplicates(
+        album_id: str,
+        threshold: int = DEFAULT_DUPLICATE_THRESHOLD,
+        current_user=Depends(get_current_user),
+        db: AsyncSession = Depends(get_async_db)
+):
+    groups = await get_album_duplicate_report(
+        db=db,
+        album_id=album_id,
+        user_id=current_user.id,
+        threshold=threshold
+    )
+
+    return {
+        "code": 200,
+        "message": "获取重复图片报告成功",
+        "data": [
+            {
+                "max_distance": group["max_distance"],
+                "images": [image_to_dict(image, sign_urls=True) for image in group["images"]]
+            }
+            for group in groups
+        ]
+    }
+
+
 # 获取图片详情
 @router.get("/{image_id}")
 async def get_image(
         image_id: str,
         current_user=Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    image = get_image_detail(
+    image = await get_image_detail(
         db=db,
         image_id=image_id,
         user_id=current_user.id
@@ -115,18 +338,87 @@ async def get_image(
     return {
         "code": 200,
         "message": "获取图片详情成功",
-        "data": model_to_dict(image)
+        "data": image_to_dict(image, sign_urls=True)
     }
 
 
+# 查找近似重复图片（感知哈希汉明距离不超过 threshold）
+@router.get("/{image_id}/duplicates")
+async def get_image_duplicates(
+        image_id: str,
+        threshold: int = DEFAULT_DUPLICATE_THRESHOLD,
+        current_user=Depends(get_current_user),
+        db: AsyncSession = Depends(get_async_db)
+):
+    image = await get_image_detail(
+        db=db,
+        image_id=image_id,
+        user_id=current_user.id
+    )
+
+    duplicates = await find_similar_images(
+        db=db,
+        image=image,
+        user_id=current_user.id,
+        threshold=threshold
+    )
+
+    return {
+        "code": 200,
+        "message": "获取相似图片成功",
+        "data": [
+            dict(image_to_dict(duplicate, sign_urls=True), distance=distance)
+            for duplicate, distance in duplicates
+        ]
+    }
+
+
+# 获取图片处理状态（wait>0 时最多等待指定秒数直到处理完成）
+@router.get("/{image_id}/status")
+async def get_image_processing_status(
+        image_id: str,
+        wait: float = 0,
+        current_user=Depends(get_current_user),
+        db: AsyncSession = Depends(get_async_db)
+):
+    image = await wait_for_image_processing(
+        db=db,
+        image_id=image_id,
+        user_id=current_user.id,
+        timeout=wait
+    )
+
+    return {
+        "code": 200,
+        "message": "获取图片处理状态成功",
+        "data": {
+            "id": image.id,
+            "processing_status": image.processing_status,
+            "thumbnail_path": sign_media_url(image.thumbnail_path),
+            "srcset": format_srcset(image.renditions, sign_urls=True),
+            "width": image.width,
+            "height": image.height
+        }
+    }
+
+
+# 从存储读取原图并提取EXIF（远端存储先下载到临时文件），文件不存在时返回空
+def extract_storage_exif(key: str) -> dict:
+    storage = get_storage()
+    if not storage.exists(key):
+        return {}
+    with storage.local_copy(key) as local_path:
+        return extract_exif_data(local_path)
+
+
 # 获取图片EXIF信息
 @router.get("/{image_id}/exif")
 async def get_image_exif(
         image_id: str,
         current_user=Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    image = get_image_detail(
+    image = await get_image_detail(
         db=db,
         image_id=image_id,
         user_id=current_user.id
@@ -134,10 +426,11 @@ async def get_image_exif(
 
     # 如果数据库中没有EXIF数据，重新提取
     exif_data = image.exif_data
-    if not exif_data and os.path.exists(image.file_path.lstrip('/')):
-        exif_data = extract_exif_data(image.file_path.lstrip('/'))
-        image.exif_data = exif_data
-        db.commit()
+    if not exif_data:
+        exif_data = await run_in_threadpool(extract_storage_exif, storage_key(image.file_path))
+        if exif_data:
+            image.exif_data = exif_data
+            await db.commit()
 
     return {
         "code": 200,
@@ -146,56 +439,149 @@ async def get_image_exif(
     }
 
 
-# 下载图片
+# 下载图片（支持断点续传与条件请求）
 @router.get("/{image_id}/download")
 async def download_image_file(
         image_id: str,
+        request: Request,
         current_user=Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    image = get_image_detail(
+    image = await get_image_detail(
         db=db,
         image_id=image_id,
         user_id=current_user.id
     )
 
-    file_path = image.file_path.lstrip('/')
-    if not os.path.exists(file_path):
+    return await media_file_response(
+        request=request,
+        file_path=image.file_path.lstrip('/'),
+        media_type=image.file_type,
+        cache_policy="original",
+        content_hash=image.file_hash,
+        filename=image.filename
+    )
+
+
+# 获取缩略图
+@router.get("/{image_id}/thumbnail")
+async def get_image_thumbnail(
+        image_id: str,
+        request: Request,
+        current_user=Depends(get_current_user),
+        db: AsyncSession = Depends(get_async_db)
+):
+    image = await get_image_detail(
+        db=db,
+        image_id=image_id,
+        user_id=current_user.id
+    )
+
+    if not image.thumbnail_path:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="图片文件不存在"
+            detail="缩略图尚未生成"
         )
 
-    return FileResponse(
-        path=file_path,
-        filename=image.filename,
-        media_type=image.file_type
+    return await media_file_response(
+        request=request,
+        file_path=image.thumbnail_path.lstrip('/'),
+        media_type="image/jpeg",
+        cache_policy="thumbnail"
+    )
+
+
+# 按需渲染指定尺寸（fmt=auto 时按 Accept 协商 WebP/JPEG）
+@router.get("/{image_id}/render")
+async def render_image_file(
+        image_id: str,
+        request: Request,
+        w: int = 0,
+        h: int = 0,
+        fit: str = "contain",
+        fmt: str = "auto",
+        current_user=Depends(get_current_user),
+        db: AsyncSession = Depends(get_async_db)
+):
+    image = await get_image_detail(
+        db=db,
+        image_id=image_id,
+        user_id=current_user.id
     )
 
+    output_format = negotiate_render_format(fmt, request.headers.get("accept", ""))
+    file_path = await render_image(
+        image=image,
+        width=w,
+        height=h,
+        fit=fit,
+        fmt=output_format
+    )
+
+    return await media_file_response(
+        request=request,
+        file_path=file_path,
+        media_type=RENDER_MEDIA_TYPES[output_format],
+        cache_policy="rendition",
+        headers={"Vary": "Accept"},
+        use_storage=False
+    )
 
-# 批量下载图片
+
+# 批量下载图片（边读边打包，以ZIP流返回）
 @router.post("/batch-download")
 async def batch_download_images(
         image_ids: List[str] = Form(...),
         current_user=Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    # 实际项目中应打包为ZIP文件返回
-    # 这里返回图片URL列表，前端自行处理下载
-    images = []
-    for image_id in image_ids:
-        image = get_image_detail(db=db, image_id=image_id, user_id=current_user.id)
-        images.append({
-            "id": image.id,
-            "filename": image.filename,
-            "url": image.file_path
-        })
+    images = await get_images_for_download(
+        db=db,
+        image_ids=image_ids,
+        user_id=current_user.id
+    )
 
-    return {
-        "code": 200,
-        "message": "获取批量下载链接成功",
-        "data": images
-    }
+    storage = get_storage()
+
+    async def stat_image(image):
+        try:
+            return await run_in_threadpool(storage.stat, storage_key(image.file_path))
+        except FileNotFoundError:
+            return None
+
+    stats = await asyncio.gather(*(stat_image(image) for image in images))
+
+    # 包内文件名：只保留客户端文件名的最后一段，再去重（同名文件追加序号）
+    entries = []
+    used_names = set()
+    for image, file_stat in zip(images, stats):
+        if file_stat is None:
+            continue
+        filename = safe_archive_name(image.filename, f"{image.id}{os.path.splitext(image.file_path)[1]}")
+        name, ext = os.path.splitext(filename)
+        arcname = filename
+        index = 1
+        while arcname in used_names:
+            arcname = f"{name} ({index}){ext}"
+            index += 1
+        used_names.add(arcname)
+        key = storage_key(image.file_path)
+        entries.append((
+            arcname, file_stat["size"], file_stat["mtime"],
+            lambda key=key: storage.iter_range(key)
+        ))
+
+    if not entries:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="图片文件不存在"
+        )
+
+    return StreamingResponse(
+        iter_zip_stream(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="images.zip"'}
+    )
 
 
 # 更新图片排序
@@ -203,9 +589,9 @@ async def batch_download_images(
 async def sort_images(
         image_ids: List[str],
         current_user=Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    result = update_image_sort(
+    result = await update_image_sort(
         db=db,
         image_ids=image_ids,
         user_id=current_user.id
@@ -223,9 +609,9 @@ async def sort_images(
 async def remove_image(
         image_id: str,
         current_user=Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    result = delete_image(
+    result = await delete_image(
         db=db,
         image_id=image_id,
         user_id=current_user.id
@@ -243,9 +629,9 @@ async def remove_image(
 async def batch_remove_images(
         image_ids: List[str],
         current_user=Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    result = batch_delete_images(
+    result = await batch_delete_images(
         db=db,
         image_ids=image_ids,
         user_id=current_user.id
@@ -255,4 +641,34 @@ async def batch_remove_images(
         "code": 200,
         "message": f"成功删除{len(image_ids)}张图片",
         "data": {"success": result}
-    }
\ No newline at end of file
+    }
+
+
+# 访问签名媒体URL（无需登录，凭签名及过期时间访问）
+@media_router.get("/{file_path:path}")
+async def get_signed_media_file(
+        file_path: str,
+        request: Request,
+        md5: str = "",
+        expires: int = 0
+):
+    if not verify_media_url(request.url.path, md5, expires):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="链接无效或已过期"
+        )
+
+    media_root = os.path.abspath(settings.MEDIA_ROOT)
+    full_path = os.path.abspath(os.path.join(media_root, file_path))
+    if not full_path.startswith(media_root + os.sep):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="文件不存在"
+        )
+
+    return await media_file_response(
+        request=request,
+        file_path=os.path.join(settings.MEDIA_ROOT, os.path.relpath(full_path, media_root)),
+        media_type=get_file_mime_type(full_path),
+        cache_policy="original" if file_path.startswith("uploads/") else "rendition"
+    )
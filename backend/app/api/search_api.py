@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from ..core.db import get_db
+from ..core.db import get_async_db
+from ..core.counting import CountMode
 from ..core.dependencies import get_current_user
-from ..services.search_service import full_text_search, advanced_search
+from ..services.search_service import full_text_search, advanced_search, similarity_search
 from ..utils.format_utils import format_pagination_response
 
 router = APIRouter()
@@ -17,9 +18,9 @@ async def search_all(
         page: int = 1,
         page_size: int = 10,
         current_user=Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    results, total = full_text_search(
+    results, total = await full_text_search(
         db=db,
         keyword=keyword,
         type=type,
@@ -40,6 +41,28 @@ async def search_all(
     }
 
 
+# 相似图片搜索（以图搜图）
+@router.get("/similar")
+async def search_similar_images(
+        image_id: str,
+        limit: int = 20,
+        current_user=Depends(get_current_user),
+        db: AsyncSession = Depends(get_async_db)
+):
+    results = await similarity_search(
+        db=db,
+        image_id=image_id,
+        user_id=current_user.id,
+        limit=limit
+    )
+
+    return {
+        "code": 200,
+        "message": "相似图片搜索完成",
+        "data": results
+    }
+
+
 # 高级搜索
 @router.get("/advanced")
 async def advanced_search_all(
@@ -55,10 +78,11 @@ async def advanced_search_all(
         page_size: int = 10,
         sort: str = "created_at",
         order: str = "desc",
+        count_mode: CountMode = CountMode.AUTO,
         current_user=Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    results, total = advanced_search(
+    results, total = await advanced_search(
         db=db,
         keyword=keyword,
         type=type,
@@ -72,7 +96,8 @@ async def advanced_search_all(
         page=page,
         page_size=page_size,
         sort=sort,
-        order=order
+        order=order,
+        count_mode=count_mode
     )
 
     return {
@@ -97,7 +122,7 @@ async def filter_album_list(
         page: int = 1,
         page_size: int = 10,
         current_user=Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     # 转换时间范围
     start_time = None
@@ -114,7 +139,7 @@ async def filter_album_list(
         elif create_time == "year":
             start_time = now - timedelta(days=365)
 
-    results, total = advanced_search(
+    results, total = await advanced_search(
         db=db,
         type="album",
         start_time=start_time,
@@ -158,9 +183,9 @@ async def filter_image_list(
         page: int = 1,
         page_size: int = 10,
         current_user=Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    results, total = advanced_search(
+    results, total = await advanced_search(
         db=db,
         type="image",
         file_type=file_type,
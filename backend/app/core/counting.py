@@ -0,0 +1,212 @@
+# backend/app/core/counting.py - 分页总数的计数策略（精确 / 缓存 / 估算 / 仅判断是否有下一页）
+import enum
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import (
+    BigInteger, Engine, Float, Integer, and_, bindparam, case, cast, column, event, func, inspect as sa_inspect, select,
+    table as sa_table
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.util import find_tables
+from .config import settings
+from .db import count_rows
+
+
+# 计数策略
+class CountMode(str, enum.Enum):
+    AUTO = "auto"          # 无筛选的大表用估算，其余用缓存的精确计数
+    EXACT = "exact"        # 每次执行 COUNT(*)
+    CACHED = "cached"      # 按筛选条件缓存精确计数，相关表有写入时失效
+    ESTIMATE = "estimate"  # 规划器估算（仅无筛选条件的单表查询，其余回落到缓存计数）
+    HAS_MORE = "has_more"  # 不计数，多取一行判断是否还有下一页
+
+
+pg_class = sa_table(
+    "pg_class", column("oid"), column("relpages", Integer), column("reltuples", Float), schema="pg_catalog"
+)
+
+# 按当前表大小折算的行数估算（与规划器的算法一致：reltuples / relpages * 当前页数），未 ANALYZE 过的表返回 -1
+# 用 select() 而非 text()：读写分离会话只把普通 SELECT 视为只读，可路由到副本（副本上的统计信息随复制同步）
+ESTIMATE_SQL = select(
+    cast(
+        case(
+            (
+                and_(pg_class.c.relpages > 0, pg_class.c.reltuples >= 0),
+                pg_class.c.reltuples / pg_class.c.relpages * (
+                    func.pg_relation_size(pg_class.c.oid, type_=BigInteger)
+                    // cast(func.current_setting("block_size"), Integer)
+                )
+            ),
+            else_=-1
+        ),
+        BigInteger
+    )
+).where(pg_class.c.oid == func.to_regclass(bindparam("name")))
+
+
+# 分页总数：可直接当 int 使用，附带计数策略；has_more 模式下为已知下限（已翻过的行数 + 本页行数）
+class CountResult(int):
+    def __new__(cls, value: int, strategy: str, has_more: bool = None):
+        result = super().__new__(cls, value)
+        result.strategy = strategy
+        result.has_more = has_more
+        return result
+
+
+# 精确计数缓存：键为查询语句及参数（即筛选条件），同时记录计数时各相关表的版本号
+# 表在事务提交时版本号加一，旧版本上算出的计数随之失效；多进程部署时其他进程的写入靠过期时间兜底
+class CountCache:
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.table_versions = {}
+        self.lock = threading.Lock()
+
+    def versions(self, tables: tuple) -> tuple:
+        with self.lock:
+            return tuple(self.table_versions.get(table, 0) for table in tables)
+
+    def get(self, key, tables: tuple):
+        with self.lock:
+            entry = self.entries.get(key)
+            if not entry:
+                return None
+            value, versions, expires_at = entry
+            current = tuple(self.table_versions.get(table, 0) for table in tables)
+            if versions != current or expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value: int, versions: tuple):
+        with self.lock:
+            self.entries[key] = (value, versions, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, tables):
+        with self.lock:
+            for table in tables:
+                self.table_versions[table] = self.table_versions.get(table, 0) + 1
+
+
+count_cache = CountCache(settings.COUNT_CACHE_TTL, settings.COUNT_CACHE_MAX_ENTRIES)
+# 表行数估算的缓存（表名 -> (估算值, 过期时间)）
+_estimates = {}
+
+WRITTEN_TABLES_KEY = "count_cache_written_tables"
+
+
+# 记录连接上本事务写过的表（ORM flush、批量 update/delete、core insert 等都经过这里）
+@event.listens_for(Engine, "after_cursor_execute")
+def track_written_tables(conn, cursor, statement, parameters, context, executemany):
+    if context.isinsert or context.isupdate or context.isdelete:
+        table = getattr(context.compiled.statement, "table", None) if context.compiled else None
+        if table is not None:
+            conn.info.setdefault(WRITTEN_TABLES_KEY, set()).add(table.fullname)
+
+
+# 提交后让相关表的计数缓存失效；回滚时丢弃记录
+@event.listens_for(Engine, "commit")
+def invalidate_on_commit(conn):
+    tables = conn.info.pop(WRITTEN_TABLES_KEY, None)
+    if tables:
+        count_cache.invalidate(tables)
+
+
+@event.listens_for(Engine, "rollback")
+def discard_on_rollback(conn):
+    conn.info.pop(WRITTEN_TABLES_KEY, None)
+
+
+# 查询涉及的表（含 join），用于缓存失效
+def query_tables(stmt) -> tuple:
+    return tuple(sorted({table.fullname for table in find_tables(stmt, check_columns=True, include_joins=True)}))
+
+
+# 无筛选条件的单表查询返回该表，否则返回 None
+def unfiltered_table(stmt):
+    if (
+            stmt.whereclause is not None or stmt._having_criteria or stmt._group_by_clauses
+            or stmt._distinct or stmt._setup_joins
+    ):
+        return None
+    entity = stmt.column_descriptions[0].get("entity") if stmt.column_descriptions else None
+    return sa_inspect(entity).local_table if entity is not None else None
+
+
+async def estimate_table_rows(db: AsyncSession, table) -> int:
+    cached = _estimates.get(table.fullname)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+    value = await db.scalar(ESTIMATE_SQL, {"name": table.fullname})
+    value = -1 if value is None else int(value)
+    _estimates[table.fullname] = (value, time.monotonic() + settings.COUNT_CACHE_TTL)
+    return value
+
+
+async def cached_count(db: AsyncSession, stmt) -> CountResult:
+    compiled = stmt.compile()
+    key = (str(compiled), tuple(sorted((name, repr(value)) for name, value in compiled.params.items())))
+    tables = query_tables(stmt)
+
+    value = count_cache.get(key, tables)
+    if value is not None:
+        return CountResult(value, CountMode.CACHED.value)
+
+    # 先取版本号再计数：计数期间有写入提交时，这次结果存入即失效
+    versions = count_cache.versions(tables)
+    value = await count_rows(db, stmt)
+    count_cache.set(key, value, versions)
+    return CountResult(value, CountMode.EXACT.value)
+
+
+# 统计查询总数（不含 has_more 模式，has_more 需随分页查询一起完成，见 fetch_offset）
+async def count_total(db: AsyncSession, stmt, count_mode: str = CountMode.AUTO) -> CountResult:
+    if count_mode == CountMode.EXACT:
+        return CountResult(await count_rows(db, stmt), CountMode.EXACT.value)
+
+    if count_mode in (CountMode.AUTO, CountMode.ESTIMATE):
+        table = unfiltered_table(stmt)
+        if table is not None:
+            estimate = await estimate_table_rows(db, table)
+            threshold = settings.COUNT_ESTIMATE_THRESHOLD if count_mode == CountMode.AUTO else 0
+            if estimate >= 0 and estimate >= threshold:
+                return CountResult(estimate, CountMode.ESTIMATE.value)
+
+    return await cached_count(db, stmt)
+
+
+# 偏移分页取数据并按策略给出总数，返回 (数据, CountResult)
+async def fetch_offset(
+        db: AsyncSession,
+        query,
+        offset: int,
+        limit: int,
+        count_mode: str = CountMode.AUTO
+) -> tuple:
+    if count_mode == CountMode.HAS_MORE:
+        items = (await db.scalars(query.offset(offset).limit(limit + 1))).all()
+        has_more = len(items) > limit
+        items = items[:limit]
+        return items, CountResult(offset + len(items), CountMode.HAS_MORE.value, has_more)
+
+    total = await count_total(db, query, count_mode)
+    items = (await db.scalars(query.offset(offset).limit(limit))).all()
+    return items, total
+
+
+# 按页码取一页，返回 (本页数据, CountResult)
+async def fetch_page(
+        db: AsyncSession,
+        query,
+        page: int,
+        page_size: int,
+        count_mode: str = CountMode.AUTO
+) -> tuple:
+    return await fetch_offset(db, query, (page - 1) * page_size, page_size, count_mode)
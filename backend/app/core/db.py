@@ -1,6 +1,11 @@
-from sqlalchemy import create_engine, inspect, text
+from sqlalchemy import create_engine, inspect, text, func, select
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from ..core.config import settings
+from ..core.db_pool import (
+    PoolMetrics, build_pool_options, build_async_connect_args, instrument_engine
+)
+from ..core.db_routing import Replica, ReplicaSet, RoutingSession
 from ..models.base import Base  # 所有模型的父类Base
 import logging
 
@@ -8,14 +13,61 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 连接池运行指标（管理接口 /api/admin/system/db-pool 查看）
+sync_pool_metrics = PoolMetrics("sync")
+async_pool_metrics = PoolMetrics("async")
+
 # 1. 创建引擎（连接已手动建表的light_gallery库）
+# 同步引擎：供后台线程（衍生数据处理）、启动任务及 scripts 下的脚本使用
 engine = create_engine(
     settings.DATABASE_URI,
     echo=False,  # 关闭SQL日志（减少冗余）
-    pool_pre_ping=True  # 验证连接有效性
+    pool_pre_ping=True,  # 验证连接有效性
+    **build_pool_options(sync_pool_metrics, async_mode=False)
 )
+instrument_engine(engine, sync_pool_metrics)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 2. 异步引擎：接口请求使用，查询等待期间不阻塞事件循环
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URI,
+    echo=False,
+    pool_pre_ping=True,
+    connect_args=build_async_connect_args(settings.DB_STATEMENT_TIMEOUT_MS),
+    **build_pool_options(async_pool_metrics, async_mode=True)
+)
+instrument_engine(async_engine.sync_engine, async_pool_metrics)
+
+
+# 只读副本引擎（与主库相同的连接池配置，指标分别统计）
+def create_replica(index: int, uri: str) -> Replica:
+    metrics = PoolMetrics(f"replica{index}")
+    replica_engine = create_async_engine(
+        uri,
+        echo=False,
+        pool_pre_ping=True,
+        connect_args=build_async_connect_args(settings.DB_STATEMENT_TIMEOUT_MS),
+        **build_pool_options(metrics, async_mode=True)
+    )
+    instrument_engine(replica_engine.sync_engine, metrics)
+    return Replica(f"replica{index}", replica_engine, metrics)
+
+
+replica_set = ReplicaSet(
+    async_engine,
+    [create_replica(index, uri) for index, uri in enumerate(settings.DB_REPLICA_URIS)]
+)
+
+# 提交后不使对象过期：异步会话中访问过期属性会触发隐式IO而报错
+# 会话按语句类型在主库与只读副本间路由（未配置副本时全部走主库）
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+    sync_session_class=RoutingSession,
+    replica_set=replica_set
+)
+
 
 def init_database():
     try:
@@ -34,4 +86,38 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# 异步数据库依赖函数
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# 统计查询结果行数（等价于 Query.count()）
+async def count_rows(db: AsyncSession, stmt) -> int:
+    return await db.scalar(
+        select(func.count()).select_from(stmt.order_by(None).subquery())
+    ) or 0
+
+
+# 连接池配置与运行指标
+def get_pool_metrics() -> dict:
+    return {
+        "config": {
+            "pool_class": settings.DB_POOL_CLASS,
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "statement_timeout_ms": settings.DB_STATEMENT_TIMEOUT_MS,
+            "pgbouncer": settings.DB_PGBOUNCER
+        },
+        "async": async_pool_metrics.snapshot(),
+        "sync": sync_pool_metrics.snapshot(),
+        "replicas": [
+            {**replica.status(), "pool": replica.pool_metrics.snapshot()}
+            for replica in replica_set.replicas
+        ]
+    }
@@ -0,0 +1,177 @@
+# backend/app/core/db_pool.py - 数据库连接池配置与运行指标
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool, NullPool
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# 保留最近多少次取连接的等待耗时用于计算分位数
+WAIT_SAMPLE_SIZE = 1024
+
+
+# 按分位取值（values 已排序）
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+# 连接池运行指标：取连接等待耗时、借出/归还/新建次数、溢出连接与等待超时
+class PoolMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.overflow_connects = 0
+        self.overflow_peak = 0
+        self.timeouts = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.waits = deque(maxlen=WAIT_SAMPLE_SIZE)
+
+    def record_wait(self, seconds: float):
+        with self.lock:
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self.waits.append(seconds)
+
+    def record_timeout(self):
+        with self.lock:
+            self.timeouts += 1
+        logger.warning(f"数据库连接池({self.name})等待空闲连接超时: {self.pool.status() if self.pool else ''}")
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self.lock:
+            self.checkouts += 1
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        with self.lock:
+            self.checkins += 1
+
+    # 新建连接时池已超出常驻大小，说明本次借出的是溢出连接
+    def on_connect(self, dbapi_connection, connection_record):
+        overflow = self.pool.overflow() if isinstance(self.pool, QueuePool) else 0
+        with self.lock:
+            self.connects += 1
+            if overflow > 0:
+                self.overflow_connects += 1
+                self.overflow_peak = max(self.overflow_peak, overflow)
+
+    def on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self.lock:
+            self.invalidations += 1
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        with self.lock:
+            waits = sorted(self.waits)
+            data = {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "overflow_connects": self.overflow_connects,
+                "overflow_peak": self.overflow_peak,
+                "timeouts": self.timeouts,
+                "wait_ms": {
+                    "count": self.wait_count,
+                    "avg": round(self.wait_total / self.wait_count * 1000, 3) if self.wait_count else 0.0,
+                    "max": round(self.wait_max * 1000, 3),
+                    "p50": round(percentile(waits, 0.5) * 1000, 3),
+                    "p95": round(percentile(waits, 0.95) * 1000, 3),
+                    "p99": round(percentile(waits, 0.99) * 1000, 3)
+                }
+            }
+
+        if isinstance(pool, QueuePool):
+            data.update({
+                "pool_class": "queue",
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,
+                "timeout": pool.timeout()
+            })
+        else:
+            data.update({
+                "pool_class": "null",
+                "checked_out": data["checkouts"] - data["checkins"]
+            })
+        return data
+
+
+# 生成带计时的连接池类：统计每次取连接的等待耗时（含等待空闲连接与新建连接）
+def instrument_pool_class(base: type, metrics: PoolMetrics) -> type:
+    class InstrumentedPool(base):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            # 连接失效后 engine 会 recreate 出新的池实例，指标随之指向新池
+            metrics.pool = self
+
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            except exc.TimeoutError:
+                metrics.record_timeout()
+                raise
+            finally:
+                metrics.record_wait(time.perf_counter() - start)
+
+    InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+    return InstrumentedPool
+
+
+# 注册连接池事件（异步引擎传入 async_engine.sync_engine；池被 recreate 时事件随之保留）
+def instrument_engine(engine, metrics: PoolMetrics):
+    event.listen(engine, "checkout", metrics.on_checkout)
+    event.listen(engine, "checkin", metrics.on_checkin)
+    event.listen(engine, "connect", metrics.on_connect)
+    event.listen(engine, "invalidate", metrics.on_invalidate)
+
+
+# create_engine 的连接池参数
+def build_pool_options(metrics: PoolMetrics, async_mode: bool) -> dict:
+    if settings.DB_POOL_CLASS == "null":
+        return {"poolclass": instrument_pool_class(NullPool, metrics)}
+
+    return {
+        "poolclass": instrument_pool_class(AsyncAdaptedQueuePool if async_mode else QueuePool, metrics),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE
+    }
+
+
+# asyncpg 连接参数：语句超时；经由事务模式的 pgbouncer 时关闭预编译语句缓存
+# （同一客户端的前后两个事务可能落在不同的服务端连接上，预编译语句和会话级设置都不可靠）
+# 同步引擎使用 psycopg2，不做服务端预编译，无需处理
+def build_async_connect_args(statement_timeout_ms: int = 0) -> dict:
+    connect_args = {}
+    if settings.DB_PGBOUNCER:
+        connect_args.update({
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            # 语句名全局唯一，避免与其他客户端留在服务端连接上的同名语句冲突
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__"
+        })
+        # pgbouncer 默认拒绝 statement_timeout 启动参数，改由客户端超时后取消语句
+        if statement_timeout_ms:
+            connect_args["command_timeout"] = statement_timeout_ms / 1000
+    elif statement_timeout_ms:
+        connect_args["server_settings"] = {"statement_timeout": str(statement_timeout_ms)}
+    return connect_args
@@ -0,0 +1,202 @@
+# backend/app/core/db_routing.py - 读写分离：只读查询路由到副本，写入及写后读走主库
+import asyncio
+import itertools
+import logging
+import math
+import time
+from contextvars import ContextVar
+from http.cookies import SimpleCookie
+
+from sqlalchemy import Select, text
+from sqlalchemy.orm import Session
+from fastapi import Request
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# 记录“写后读走主库”截止时间的 Cookie（按客户端生效，多个 worker 之间无需共享状态）
+# 前端跨域调用接口时须携带 Cookie（axios 的 withCredentials，见 frontend/src/utils/request.ts），
+# 且接口与页面同站（SameSite=Lax），否则写后读保证不生效
+STICKY_COOKIE = "lg_db_primary_until"
+
+# 副本状态查询：是否处于恢复（复制）状态、已回放到的 WAL 位置、距最后一次回放的秒数
+REPLICA_STATUS_SQL = text(
+    "SELECT pg_is_in_recovery(), pg_last_wal_replay_lsn()::text, "
+    "EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"
+)
+
+
+# 当前请求的路由状态：是否仍在写后粘滞窗口内、本次请求是否发生写入
+class RouteState:
+    def __init__(self, primary_until: float = 0.0):
+        self.primary_until = primary_until
+        self.wrote = False
+
+    def use_primary(self) -> bool:
+        return time.time() < self.primary_until
+
+
+_route_state: ContextVar = ContextVar("db_route_state", default=None)
+
+
+# WAL 位置（如 16/B374D848）转为字节偏移
+def parse_lsn(lsn: str) -> int:
+    high, low = lsn.split("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+class Replica:
+    def __init__(self, name: str, engine, pool_metrics=None):
+        self.name = name
+        self.engine = engine
+        self.pool_metrics = pool_metrics
+        # 首次检查通过前不接收读请求
+        self.healthy = False
+        self.lag_bytes = None
+        self.lag_seconds = None
+        self.error = ""
+        self.checked_at = None
+
+    async def check(self, primary_lsn: int):
+        try:
+            async with self.engine.connect() as conn:
+                in_recovery, replay_lsn, replay_age = (
+                    await asyncio.wait_for(conn.execute(REPLICA_STATUS_SQL), settings.DB_REPLICA_CHECK_INTERVAL * 2)
+                ).one()
+        except Exception as e:
+            self.healthy, self.error = False, str(e) or type(e).__name__
+            self.checked_at = time.time()
+            return
+
+        if not in_recovery or replay_lsn is None:
+            # 非复制实例（本地测试用的替身库等）视为无延迟
+            self.lag_bytes, self.lag_seconds = 0, 0.0
+        else:
+            self.lag_bytes = max(primary_lsn - parse_lsn(replay_lsn), 0)
+            # 已追平主库时距最后回放的时长只说明主库空闲，不算延迟
+            self.lag_seconds = 0.0 if self.lag_bytes == 0 else float(replay_age if replay_age is not None else math.inf)
+
+        was_healthy = self.healthy
+        self.healthy = self.lag_seconds <= settings.DB_REPLICA_MAX_LAG_SECONDS
+        self.error = "" if self.healthy else f"复制延迟 {self.lag_seconds:.1f} 秒"
+        self.checked_at = time.time()
+        if was_healthy and not self.healthy:
+            logger.warning(f"只读副本 {self.name} 已跳过: {self.error}")
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "url": self.engine.url.render_as_string(hide_password=True),
+            "healthy": self.healthy,
+            "lag_bytes": self.lag_bytes,
+            "lag_seconds": None if self.lag_seconds is None or math.isinf(self.lag_seconds) else round(self.lag_seconds, 3),
+            "error": self.error,
+            "checked_at": self.checked_at
+        }
+
+
+class ReplicaSet:
+    def __init__(self, primary_engine, replicas: list):
+        self.primary_engine = primary_engine
+        self.replicas = replicas
+        self._next = itertools.count()
+
+    # 在健康副本间轮询（每个会话选一次）；没有可用副本时返回 None（回落到主库）
+    def choose(self):
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._next) % len(healthy)]
+
+    async def check(self):
+        if not self.replicas:
+            return
+        async with self.primary_engine.connect() as conn:
+            primary_lsn = parse_lsn(await conn.scalar(text("SELECT pg_current_wal_lsn()::text")))
+        await asyncio.gather(*(replica.check(primary_lsn) for replica in self.replicas))
+
+    # 后台定期检查副本延迟（在应用生命周期内运行）
+    async def monitor(self):
+        while True:
+            try:
+                await self.check()
+            except Exception as e:
+                # 主库不可用时无法比较延迟，暂停所有副本
+                logger.error(f"只读副本延迟检查失败: {e}")
+                for replica in self.replicas:
+                    replica.healthy, replica.error = False, "主库不可用，无法检查延迟"
+            await asyncio.sleep(settings.DB_REPLICA_CHECK_INTERVAL)
+
+
+# 路由会话：普通 SELECT 走健康副本；flush、INSERT/UPDATE/DELETE、SELECT ... FOR UPDATE、text() 等其他语句走主库，
+# 并视为写入：会话内此后的读也走主库，同时刷新本次请求的写后粘滞窗口；请求在粘滞窗口内时全部走主库
+# 会话在首次读时选定一个副本，此后的读都走它，同一请求内不会读到进度不同的副本；
+# 选定的副本中途因延迟被跳过时，该会话余下的读改走主库
+class RoutingSession(Session):
+    def __init__(self, *args, replica_set: ReplicaSet = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replica_set = replica_set
+        self.wrote = False
+        self.replica = None
+        self.replica_chosen = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        plain_select = isinstance(clause, Select) and clause._for_update_arg is None
+        if self._flushing or (clause is not None and not plain_select):
+            self.mark_write()
+        elif self.replica_set and not self.wrote and plain_select:
+            state = _route_state.get()
+            if not (state and state.use_primary()):
+                if not self.replica_chosen:
+                    self.replica = self.replica_set.choose()
+                    self.replica_chosen = True
+                elif self.replica and not self.replica.healthy:
+                    self.replica = None
+                if self.replica:
+                    return self.replica.engine.sync_engine
+
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+    def mark_write(self):
+        self.wrote = True
+        state = _route_state.get()
+        if state:
+            state.wrote = True
+
+
+# 写后读中间件（ASGI）：从 Cookie 恢复粘滞窗口；本次请求有写入时在响应头中刷新窗口
+# 不使用 BaseHTTPMiddleware，避免包装媒体文件等流式响应
+class ReadYourWritesMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            primary_until = float(Request(scope).cookies.get(STICKY_COOKIE, 0))
+        except ValueError:
+            primary_until = 0.0
+
+        state = RouteState(primary_until)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and state.wrote:
+                cookie = SimpleCookie()
+                cookie[STICKY_COOKIE] = f"{time.time() + settings.DB_REPLICA_STICKY_SECONDS:.3f}"
+                cookie[STICKY_COOKIE]["max-age"] = math.ceil(settings.DB_REPLICA_STICKY_SECONDS)
+                cookie[STICKY_COOKIE]["path"] = "/"
+                cookie[STICKY_COOKIE]["httponly"] = True
+                cookie[STICKY_COOKIE]["samesite"] = "lax"
+                headers = list(message.get("headers", []))
+                headers.append((b"set-cookie", cookie[STICKY_COOKIE].OutputString().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _route_state.set(state)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _route_state.reset(token)
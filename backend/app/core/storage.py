@@ -0,0 +1,269 @@
+# backend/app/core/storage.py - 文件存储后端（本地磁盘 / S3兼容对象存储）
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from .config import settings
+
+# 流式读取的块大小
+STORAGE_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+
+# 存储后端接口：以相对于媒体根目录的键（如 uploads/ab/cd/<hash>.jpg）寻址
+class StorageBackend(ABC):
+    # 上传本地文件（move=True 时上传后删除本地文件）
+    @abstractmethod
+    def put_file(self, key: str, local_path: str, content_type: str = "", move: bool = False):
+        ...
+
+    @abstractmethod
+    def put_bytes(self, key: str, data: bytes, content_type: str = ""):
+        ...
+
+    @abstractmethod
+    def get_bytes(self, key: str) -> bytes:
+        ...
+
+    # 流式读取 [start, end) 区间，end 为 None 时读到文件末尾
+    @abstractmethod
+    def iter_range(self, key: str, start: int = 0, end: int = None, chunk_size: int = STORAGE_CHUNK_SIZE):
+        ...
+
+    # 返回 {"size": 字节数, "mtime": 修改时间戳}；不存在时抛出 FileNotFoundError
+    @abstractmethod
+    def stat(self, key: str) -> dict:
+        ...
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.stat(key)
+            return True
+        except FileNotFoundError:
+            return False
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    # 本地可直接访问的路径（供 sendfile / X-Accel-Redirect / 图像解码使用），远端存储返回 None
+    def local_path(self, key: str) -> str:
+        return None
+
+    # 获取本地副本（上下文管理器）：本地存储直接返回原路径，远端存储下载到临时文件，用完删除
+    @abstractmethod
+    def local_copy(self, key: str):
+        ...
+
+
+# 本地磁盘存储
+class LocalStorage(StorageBackend):
+    def __init__(self, root: str):
+        self.root = root
+
+    def local_path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def put_file(self, key: str, local_path: str, content_type: str = "", move: bool = False):
+        dest_path = self.local_path(key)
+        if os.path.abspath(local_path) == os.path.abspath(dest_path):
+            return
+        os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+        if move:
+            os.replace(local_path, dest_path)
+            return
+
+        tmp_path = f"{dest_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            shutil.copyfile(local_path, tmp_path)
+            os.replace(tmp_path, dest_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def put_bytes(self, key: str, data: bytes, content_type: str = ""):
+        dest_path = self.local_path(key)
+        os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+        tmp_path = f"{dest_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, dest_path)
+
+    def get_bytes(self, key: str) -> bytes:
+        with open(self.local_path(key), "rb") as f:
+            return f.read()
+
+    def iter_range(self, key: str, start: int = 0, end: int = None, chunk_size: int = STORAGE_CHUNK_SIZE):
+        with open(self.local_path(key), "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start
+            while remaining is None or remaining > 0:
+                chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def stat(self, key: str) -> dict:
+        stat_result = os.stat(self.local_path(key))
+        return {"size": stat_result.st_size, "mtime": stat_result.st_mtime}
+
+    def delete(self, key: str):
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def local_copy(self, key: str):
+        yield self.local_path(key)
+
+
+# S3兼容对象存储（AWS S3 / MinIO 等）
+# 客户端进程内共享（线程安全，连接池大小由 max_pool_connections 控制）；
+# 大文件上传/下载按 TransferConfig 自动分片并发传输；区间读取使用 Range 请求
+class S3Storage(StorageBackend):
+    def __init__(
+            self,
+            bucket: str,
+            prefix: str = "",
+            endpoint_url: str = None,
+            access_key: str = None,
+            secret_key: str = None,
+            region: str = None,
+            max_pool_connections: int = 50,
+            multipart_threshold: int = 16 * 1024 * 1024,
+            multipart_chunksize: int = 16 * 1024 * 1024,
+            max_concurrency: int = 8
+    ):
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            aws_access_key_id=access_key or None,
+            aws_secret_access_key=secret_key or None,
+            region_name=region or None,
+            config=Config(
+                max_pool_connections=max_pool_connections,
+                retries={"max_attempts": 5, "mode": "adaptive"},
+                # 自建的 MinIO 等服务一般不支持虚拟主机风格的域名
+                s3={"addressing_style": "path" if endpoint_url else "auto"}
+            )
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunksize,
+            max_concurrency=max_concurrency,
+            use_threads=True
+        )
+
+    def object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def put_file(self, key: str, local_path: str, content_type: str = "", move: bool = False):
+        extra_args = {"ContentType": content_type} if content_type else None
+        self.client.upload_file(
+            local_path, self.bucket, self.object_key(key),
+            ExtraArgs=extra_args, Config=self.transfer_config
+        )
+        if move:
+            os.remove(local_path)
+
+    def put_bytes(self, key: str, data: bytes, content_type: str = ""):
+        extra_args = {"ContentType": content_type} if content_type else {}
+        self.client.put_object(Bucket=self.bucket, Key=self.object_key(key), Body=data, **extra_args)
+
+    def get_object(self, key: str, **kwargs) -> dict:
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.object_key(key), **kwargs)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                raise FileNotFoundError(key)
+            raise
+
+    def get_bytes(self, key: str) -> bytes:
+        return self.get_object(key)["Body"].read()
+
+    def iter_range(self, key: str, start: int = 0, end: int = None, chunk_size: int = STORAGE_CHUNK_SIZE):
+        if start == 0 and end is None:
+            response = self.get_object(key)
+        else:
+            last = "" if end is None else str(end - 1)
+            response = self.get_object(key, Range=f"bytes={start}-{last}")
+        body = response["Body"]
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def stat(self, key: str) -> dict:
+        from botocore.exceptions import ClientError
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404", "NotFound"):
+                raise FileNotFoundError(key)
+            raise
+        return {"size": response["ContentLength"], "mtime": response["LastModified"].timestamp()}
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+
+    @contextmanager
+    def local_copy(self, key: str):
+        os.makedirs(settings.STORAGE_TMP_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=settings.STORAGE_TMP_DIR, suffix=os.path.splitext(key)[1])
+        os.close(fd)
+        try:
+            # 大文件按分片并发下载（多个 Range 请求）
+            self.client.download_file(self.bucket, self.object_key(key), tmp_path, Config=self.transfer_config)
+            yield tmp_path
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+# 获取存储后端（按配置创建，进程内单例）
+def get_storage() -> StorageBackend:
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                if settings.STORAGE_BACKEND == "s3":
+                    _storage = S3Storage(
+                        bucket=settings.S3_BUCKET,
+                        prefix=settings.S3_PREFIX,
+                        endpoint_url=settings.S3_ENDPOINT_URL,
+                        access_key=settings.S3_ACCESS_KEY,
+                        secret_key=settings.S3_SECRET_KEY,
+                        region=settings.S3_REGION,
+                        max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+                        multipart_threshold=settings.S3_MULTIPART_THRESHOLD,
+                        multipart_chunksize=settings.S3_MULTIPART_CHUNKSIZE,
+                        max_concurrency=settings.S3_MAX_CONCURRENCY
+                    )
+                else:
+                    _storage = LocalStorage(settings.MEDIA_ROOT)
+    return _storage
+
+
+# 数据库中的文件路径（/static/uploads/...）-> 存储键（uploads/...）
+def storage_key(path: str) -> str:
+    relative_path = path.lstrip("/")
+    media_root = settings.MEDIA_ROOT.strip("/") + "/"
+    if relative_path.startswith(media_root):
+        relative_path = relative_path[len(media_root):]
+    return relative_path
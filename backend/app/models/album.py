@@ -18,7 +18,7 @@ class Album(Base):
     description = Column(Text, default="", comment="相册描述")
     cover_url = Column(String(255), default="", comment="封面图片URL")
     is_public = Column(Boolean, default=True, comment="是否公开")
-    user_id = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, comment="用户ID")
+    user_id = Column(String(36), ForeignKey("public.users.id", ondelete="CASCADE"), nullable=False, comment="用户ID")
     created_at = Column(DateTime, default=datetime.now, comment="创建时间")
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment="更新时间")
 
@@ -0,0 +1,59 @@
+# backend/app/models/blob.py - 内容寻址存储
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, Integer, JSON, Text, LargeBinary
+from .base import Base
+
+
+class Blob(Base):
+    __tablename__ = "blobs"
+    __table_args__ = {
+        'extend_existing': True,
+        'schema': 'public',
+        'comment': '内容寻址文件表'
+    }
+
+    # 以文件内容SHA-256为主键，相同内容只存储一份
+    hash = Column(String(64), primary_key=True, comment="文件内容SHA-256")
+    file_path = Column(String(512), nullable=False, comment="原图路径")
+    thumbnail_path = Column(String(512), default="", comment="缩略图路径")
+    size = Column(Integer, default=0, comment="文件大小(字节)")
+    mime_type = Column(String(50), default="", comment="MIME类型")
+    exif_data = Column(JSON, default={}, comment="EXIF信息")
+    width = Column(Integer, default=0, comment="宽度")
+    height = Column(Integer, default=0, comment="高度")
+    captured_at = Column(DateTime, nullable=True, comment="拍摄时间(EXIF)")
+    renditions = Column(JSON, default=[], comment="多分辨率版本列表")
+    phash = Column(String(16), nullable=True, comment="感知哈希(dHash, 64位十六进制)")
+    blurhash = Column(String(64), default="", comment="BlurHash占位图")
+    dominant_color = Column(String(7), default="", comment="主色调(#rrggbb)")
+    features = Column(LargeBinary, nullable=True, comment="视觉特征向量(float32)")
+    processing_status = Column(String(20), default="pending", comment="衍生数据处理状态: pending/processing/done/failed")
+    processing_error = Column(Text, default="", comment="处理失败原因")
+    ref_count = Column(Integer, default=0, nullable=False, comment="引用该文件的图片数")
+    created_at = Column(DateTime, default=datetime.now, comment="创建时间")
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment="更新时间")
+
+    def __repr__(self):
+        return f"<Blob(hash={self.hash}, ref_count={self.ref_count})>"
+
+    def to_dict(self):
+        return {
+            "hash": self.hash,
+            "file_path": self.file_path,
+            "thumbnail_path": self.thumbnail_path,
+            "size": self.size,
+            "mime_type": self.mime_type,
+            "exif_data": self.exif_data,
+            "width": self.width,
+            "height": self.height,
+            "captured_at": self.captured_at.strftime("%Y-%m-%d %H:%M:%S") if self.captured_at else None,
+            "renditions": self.renditions,
+            "phash": self.phash,
+            "blurhash": self.blurhash,
+            "dominant_color": self.dominant_color,
+            "processing_status": self.processing_status,
+            "processing_error": self.processing_error,
+            "ref_count": self.ref_count,
+            "created_at": self.created_at.strftime("%Y-%m-%d %H:%M:%S") if self.created_at else None,
+            "updated_at": self.updated_at.strftime("%Y-%m-%d %H:%M:%S") if self.updated_at else None
+        }
@@ -20,7 +20,7 @@ class Blog(Base):
     tags = Column(JSON, default=[], comment="标签列表")
     is_draft = Column(Boolean, default=True, comment="是否草稿")
     is_private = Column(Boolean, default=False, comment="是否私有")
-    user_id = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, comment="用户ID")
+    user_id = Column(String(36), ForeignKey("public.users.id", ondelete="CASCADE"), nullable=False, comment="用户ID")
     created_at = Column(DateTime, default=datetime.now, comment="创建时间")
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment="更新时间")
 
@@ -37,6 +37,9 @@ class Blog(Base):
         cascade="all, delete-orphan"
     )
 
+    # 评论数（非数据库列，由服务层批量统计后填充）
+    comment_count = 0
+
     def __repr__(self):
         return f"<Blog(id={self.id}, title={self.title}, user_id={self.user_id})>"
 
@@ -53,7 +56,7 @@ class Blog(Base):
             "created_at": self.created_at.strftime("%Y-%m-%d %H:%M:%S") if self.created_at else None,
             "updated_at": self.updated_at.strftime("%Y-%m-%d %H:%M:%S") if self.updated_at else None,
             "user": self.user.to_dict() if self.user else None,
-            "comment_count": self.comments.count() if hasattr(self, 'comments') else 0
+            "comment_count": self.comment_count
         }
 
 
@@ -67,9 +70,9 @@ class Comment(Base):
 
     id = Column(String(36), primary_key=True, comment="评论ID")
     content = Column(Text, nullable=False, comment="评论内容")
-    blog_id = Column(String(36), ForeignKey("blogs.id", ondelete="CASCADE"), nullable=False, comment="博客ID")
-    user_id = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, comment="用户ID")
-    parent_id = Column(String(36), ForeignKey("comments.id", ondelete="CASCADE"), nullable=True, comment="父评论ID")
+    blog_id = Column(String(36), ForeignKey("public.blogs.id", ondelete="CASCADE"), nullable=False, comment="博客ID")
+    user_id = Column(String(36), ForeignKey("public.users.id", ondelete="CASCADE"), nullable=False, comment="用户ID")
+    parent_id = Column(String(36), ForeignKey("public.comments.id", ondelete="CASCADE"), nullable=True, comment="父评论ID")
     created_at = Column(DateTime, default=datetime.now, comment="创建时间")
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment="更新时间")
     is_deleted = Column(Boolean, default=False, comment="是否删除")
@@ -83,9 +86,14 @@ class Comment(Base):
     parent = relationship(
         "Comment",
         remote_side=[id],
-        backref="children",
+        back_populates="children",
         lazy="joined"
     )
+    # 显式声明（而非 backref），导入时即可在加载选项中引用
+    children = relationship(
+        "Comment",
+        back_populates="parent"
+    )
 
     def __repr__(self):
         return f"<Comment(id={self.id}, blog_id={self.blog_id}, user_id={self.user_id})>"
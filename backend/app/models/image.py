@@ -1,6 +1,6 @@
 # backend/app/models/image.py - PostgreSQL 适配版
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean, Integer
+from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean, Integer, JSON
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -14,15 +14,26 @@ class Image(Base):
     }
 
     id = Column(String(36), primary_key=True, comment="图片ID")
-    name = Column(String(255), nullable=False, comment="图片名称")
-    url = Column(String(512), nullable=False, comment="图片URL")
-    size = Column(Integer, default=0, comment="图片大小(字节)")
-    mime_type = Column(String(50), default="image/jpeg", comment="MIME类型")
+    filename = Column(String(255), nullable=False, comment="原始文件名")
+    file_path = Column(String(512), nullable=False, comment="原图路径")
+    thumbnail_path = Column(String(512), default="", comment="缩略图路径")
+    file_type = Column(String(50), default="", comment="MIME类型")
+    file_size = Column(Integer, default=0, comment="文件大小(字节)")
+    file_hash = Column(String(64), default="", index=True, comment="文件内容SHA-256")
+    exif_data = Column(JSON, default={}, comment="EXIF信息")
     width = Column(Integer, default=0, comment="宽度")
     height = Column(Integer, default=0, comment="高度")
+    captured_at = Column(DateTime, nullable=True, comment="拍摄时间(EXIF)")
+    renditions = Column(JSON, default=[], comment="多分辨率版本列表")
+    phash = Column(String(16), nullable=True, comment="感知哈希(dHash, 64位十六进制)")
+    blurhash = Column(String(64), default="", comment="BlurHash占位图")
+    dominant_color = Column(String(7), default="", comment="主色调(#rrggbb)")
+    processing_status = Column(String(20), default="pending", comment="衍生数据处理状态: pending/processing/done/failed")
     is_public = Column(Boolean, default=True, comment="是否公开")
-    album_id = Column(String(36), ForeignKey("albums.id", ondelete="CASCADE"), nullable=True, comment="相册ID")
-    user_id = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, comment="用户ID")
+    sort_order = Column(Integer, default=0, nullable=False, comment="图片集内排序")
+    is_deleted = Column(Boolean, default=False, comment="是否删除")
+    album_id = Column(String(36), ForeignKey("public.albums.id", ondelete="CASCADE"), nullable=True, comment="相册ID")
+    user_id = Column(String(36), ForeignKey("public.users.id", ondelete="CASCADE"), nullable=False, comment="用户ID")
     created_at = Column(DateTime, default=datetime.now, comment="创建时间")
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment="更新时间")
 
@@ -40,18 +51,29 @@ class Image(Base):
     )
 
     def __repr__(self):
-        return f"<Image(id={self.id}, name={self.name}, user_id={self.user_id})>"
+        return f"<Image(id={self.id}, filename={self.filename}, user_id={self.user_id})>"
 
     def to_dict(self):
         return {
             "id": self.id,
-            "name": self.name,
-            "url": self.url,
-            "size": self.size,
-            "mime_type": self.mime_type,
+            "filename": self.filename,
+            "file_path": self.file_path,
+            "thumbnail_path": self.thumbnail_path,
+            "file_type": self.file_type,
+            "file_size": self.file_size,
+            "file_hash": self.file_hash,
+            "exif_data": self.exif_data,
             "width": self.width,
             "height": self.height,
+            "captured_at": self.captured_at.strftime("%Y-%m-%d %H:%M:%S") if self.captured_at else None,
+            "renditions": self.renditions,
+            "phash": self.phash,
+            "blurhash": self.blurhash,
+            "dominant_color": self.dominant_color,
+            "processing_status": self.processing_status,
             "is_public": self.is_public,
+            "sort_order": self.sort_order,
+            "is_deleted": self.is_deleted,
             "album_id": self.album_id,
             "user_id": self.user_id,
             "created_at": self.created_at.strftime("%Y-%m-%d %H:%M:%S") if self.created_at else None,
@@ -0,0 +1,48 @@
+# backend/app/models/upload_session.py - 断点续传会话
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, ForeignKey, BigInteger, JSON
+from .base import Base
+
+
+class UploadSession(Base):
+    __tablename__ = "upload_sessions"
+    __table_args__ = {
+        'extend_existing': True,
+        'schema': 'public',
+        'comment': '断点续传会话表'
+    }
+
+    id = Column(String(36), primary_key=True, comment="会话ID")
+    filename = Column(String(255), nullable=False, comment="原始文件名")
+    content_type = Column(String(50), default="", comment="MIME类型")
+    total_size = Column(BigInteger, nullable=False, comment="文件总大小(字节)")
+    # 已接收的字节区间，半开区间 [[start, end), ...]，按起点排序且互不重叠
+    received_ranges = Column(JSON, default=[], comment="已接收字节区间")
+    received_bytes = Column(BigInteger, default=0, comment="已接收字节数")
+    status = Column(String(20), default="uploading", comment="状态: uploading/completing/completed")
+    image_id = Column(String(36), nullable=True, comment="完成后生成的图片ID")
+    album_id = Column(String(36), ForeignKey("public.albums.id", ondelete="CASCADE"), nullable=False, comment="相册ID")
+    user_id = Column(String(36), ForeignKey("public.users.id", ondelete="CASCADE"), nullable=False, comment="用户ID")
+    expires_at = Column(DateTime, nullable=False, comment="过期时间")
+    created_at = Column(DateTime, default=datetime.now, comment="创建时间")
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment="更新时间")
+
+    def __repr__(self):
+        return f"<UploadSession(id={self.id}, filename={self.filename}, status={self.status})>"
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "content_type": self.content_type,
+            "total_size": self.total_size,
+            "received_ranges": self.received_ranges,
+            "received_bytes": self.received_bytes,
+            "status": self.status,
+            "image_id": self.image_id,
+            "album_id": self.album_id,
+            "user_id": self.user_id,
+            "expires_at": self.expires_at.strftime("%Y-%m-%d %H:%M:%S") if self.expires_at else None,
+            "created_at": self.created_at.strftime("%Y-%m-%d %H:%M:%S") if self.created_at else None,
+            "updated_at": self.updated_at.strftime("%Y-%m-%d %H:%M:%S") if self.updated_at else None
+        }
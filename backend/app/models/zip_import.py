@@ -0,0 +1,45 @@
+# backend/app/models/zip_import.py - ZIP导入任务
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, JSON
+from .base import Base
+
+
+class ZipImport(Base):
+    __tablename__ = "zip_imports"
+    __table_args__ = {
+        'extend_existing': True,
+        'schema': 'public',
+        'comment': 'ZIP导入任务表'
+    }
+
+    id = Column(String(36), primary_key=True, comment="任务ID")
+    filename = Column(String(255), nullable=False, comment="ZIP文件名")
+    status = Column(String(20), default="pending", comment="状态: pending/processing/done/failed")
+    total = Column(Integer, default=0, comment="可导入的图片数")
+    processed = Column(Integer, default=0, comment="已导入数")
+    skipped = Column(Integer, default=0, comment="跳过数（非图片/不安全路径等）")
+    failed = Column(Integer, default=0, comment="失败数")
+    errors = Column(JSON, default=[], comment="失败明细")
+    album_id = Column(String(36), ForeignKey("public.albums.id", ondelete="CASCADE"), nullable=False, comment="相册ID")
+    user_id = Column(String(36), ForeignKey("public.users.id", ondelete="CASCADE"), nullable=False, comment="用户ID")
+    created_at = Column(DateTime, default=datetime.now, comment="创建时间")
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment="更新时间")
+
+    def __repr__(self):
+        return f"<ZipImport(id={self.id}, filename={self.filename}, status={self.status})>"
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "errors": self.errors,
+            "album_id": self.album_id,
+            "user_id": self.user_id,
+            "created_at": self.created_at.strftime("%Y-%m-%d %H:%M:%S") if self.created_at else None,
+            "updated_at": self.updated_at.strftime("%Y-%m-%d %H:%M:%S") if self.updated_at else None
+        }
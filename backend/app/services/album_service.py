@@ -1,16 +1,23 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
+from ..core.db import count_rows
+from ..core.counting import CountMode, fetch_page
 from ..models.album import Album
 from ..models.image import Image
 from ..models.user import User
+from ..utils.pagination_utils import keyset_page
 from ..utils.security_utils import (
     AlbumPermission, get_album_password_hash, verify_album_password
 )
 
+# 图片集列表的游标排序键（索引见 scripts/create_keyset_indexes.py）
+ALBUM_LIST_KEYS = [(Album.created_at, True), (Album.id, True)]
+
 
 # 创建图片集
-def create_album(
-        db: Session,
+async def create_album(
+        db: AsyncSession,
         user_id: str,
         name: str,
         description: str = None,
@@ -44,57 +51,43 @@ def create_album(
     )
 
     db.add(album)
-    db.commit()
-    db.refresh(album)
+    await db.commit()
+    await db.refresh(album)
 
     return album
 
 
 # 获取图片集列表
-def get_album_list(
-        db: Session,
+async def get_album_list(
+        db: AsyncSession,
         user_id: str = None,
         page: int = 1,
         page_size: int = 10,
-        permission: AlbumPermission = None
+        permission: AlbumPermission = None,
+        cursor: str = None,
+        count_mode: str = CountMode.AUTO
 ) -> tuple:
-    query = db.query(Album).filter(Album.is_deleted == False)
+    query = select(Album).where(Album.is_deleted == False)
 
     # 筛选条件
     if user_id:
-        query = query.filter(Album.user_id == user_id)
+        query = query.where(Album.user_id == user_id)
 
     if permission:
-        query = query.filter(Album.permission == permission)
+        query = query.where(Album.permission == permission)
 
-    # 总数
-    total = query.count()
+    # 游标分页（cursor 为空字符串时取第一页）：不统计总数，返回 (本页数据, 下一页游标)
+    if cursor is not None:
+        return await keyset_page(db, query, ALBUM_LIST_KEYS, cursor, page_size)
 
-    # 分页
-    albums = query.order_by(Album.created_at.desc()).offset((page - 1) * page_size).limit(page_size).all()
+    # 分页（总数按 count_mode 统计）
+    albums, total = await fetch_page(db, query.order_by(Album.created_at.desc()), page, page_size, count_mode)
 
     return albums, total
 
 
-# 获取图片集详情
-def get_album_detail(
-        db: Session,
-        album_id: str,
-        user_id: str = None,
-        password: str = None
-) -> Album:
-    album = db.query(Album).filter(
-        Album.id == album_id,
-        Album.is_deleted == False
-    ).first()
-
-    if not album:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="图片集不存在或已删除"
-        )
-
-    # 权限验证
+# 校验图片集访问权限（图片集已加载时使用，不再查询数据库）
+def check_album_access(album: Album, user_id: str = None, password: str = None):
     if album.permission == AlbumPermission.PRIVATE:
         # 私密图片集仅所有者可访问
         if not user_id or album.user_id != user_id:
@@ -111,12 +104,34 @@ def get_album_detail(
                     detail="图片集密码错误"
                 )
 
+
+# 获取图片集详情
+async def get_album_detail(
+        db: AsyncSession,
+        album_id: str,
+        user_id: str = None,
+        password: str = None
+) -> Album:
+    album = await db.scalar(select(Album).where(
+        Album.id == album_id,
+        Album.is_deleted == False
+    ))
+
+    if not album:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="图片集不存在或已删除"
+        )
+
+    # 权限验证
+    check_album_access(album, user_id, password)
+
     return album
 
 
 # 更新图片集信息
-def update_album(
-        db: Session,
+async def update_album(
+        db: AsyncSession,
         album_id: str,
         user_id: str,
         name: str = None,
@@ -125,7 +140,7 @@ def update_album(
         password: str = None,
         cover_image_id: str = None
 ) -> Album:
-    album = get_album_detail(db, album_id, user_id)
+    album = await get_album_detail(db, album_id, user_id)
 
     # 验证所有权
     if album.user_id != user_id:
@@ -157,10 +172,10 @@ def update_album(
 
     if cover_image_id:
         # 验证封面图片属于该图片集
-        image = db.query(Image).filter(
+        image = await db.scalar(select(Image).where(
             Image.id == cover_image_id,
             Image.album_id == album_id
-        ).first()
+        ))
 
         if not image:
             raise HTTPException(
@@ -170,15 +185,15 @@ def update_album(
 
         album.cover_image_id = cover_image_id
 
-    db.commit()
-    db.refresh(album)
+    await db.commit()
+    await db.refresh(album)
 
     return album
 
 
 # 删除图片集（移到回收站）
-def delete_album(db: Session, album_id: str, user_id: str) -> bool:
-    album = get_album_detail(db, album_id, user_id)
+async def delete_album(db: AsyncSession, album_id: str, user_id: str) -> bool:
+    album = await get_album_detail(db, album_id, user_id)
 
     # 验证所有权
     if album.user_id != user_id:
@@ -188,17 +203,17 @@ def delete_album(db: Session, album_id: str, user_id: str) -> bool:
         )
 
     album.is_deleted = True
-    db.commit()
+    await db.commit()
 
     return True
 
 
 # 恢复回收站图片集
-def restore_album(db: Session, album_id: str, user_id: str) -> Album:
-    album = db.query(Album).filter(
+async def restore_album(db: AsyncSession, album_id: str, user_id: str) -> Album:
+    album = await db.scalar(select(Album).where(
         Album.id == album_id,
         Album.is_deleted == True
-    ).first()
+    ))
 
     if not album:
         raise HTTPException(
@@ -214,37 +229,45 @@ def restore_album(db: Session, album_id: str, user_id: str) -> Album:
         )
 
     album.is_deleted = False
-    db.commit()
-    db.refresh(album)
+    await db.commit()
+    await db.refresh(album)
 
     return album
 
 
 # 获取回收站图片集
-def get_recycle_albums(
-        db: Session,
+async def get_recycle_albums(
+        db: AsyncSession,
         user_id: str,
         page: int = 1,
-        page_size: int = 10
+        page_size: int = 10,
+        count_mode: str = CountMode.AUTO
 ) -> tuple:
-    query = db.query(Album).filter(
+    query = select(Album).where(
         Album.user_id == user_id,
         Album.is_deleted == True
     )
 
-    total = query.count()
-    albums = query.order_by(Album.deleted_at.desc()).offset((page - 1) * page_size).limit(page_size).all()
+    albums, total = await fetch_page(db, query.order_by(Album.deleted_at.desc()), page, page_size, count_mode)
 
     return albums, total
 
 
 # 更新图片集图片数量
-def update_album_image_count(db: Session, album_id: str):
-    album = db.query(Album).filter(Album.id == album_id).first()
+async def update_album_image_count(db: AsyncSession, album_id: str):
+    album = await db.scalar(select(Album).where(Album.id == album_id))
     if album:
-        count = db.query(Image).filter(
+        album.image_count = await count_rows(db, select(Image.id).where(
             Image.album_id == album_id,
             Image.is_deleted == False
-        ).count()
-        album.image_count = count
-        db.commit()
\ No newline at end of file
+        ))
+        await db.commit()
+
+
+# 增量更新图片集图片数量（不做 COUNT 扫描，由调用方提交事务）
+async def increment_album_image_count(db: AsyncSession, album_id: str, delta: int):
+    await db.execute(
+        update(Album).where(Album.id == album_id).values(
+            image_count=Album.image_count + delta
+        ).execution_options(synchronize_session=False)
+    )
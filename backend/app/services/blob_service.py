@@ -0,0 +1,146 @@
+from sqlalchemy import delete, text
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert
+from ..core.storage import get_storage, storage_key
+from ..models.blob import Blob
+
+# 按内容哈希加事务级咨询锁（按哈希排序加锁，避免多个事务交叉等待）
+# text() 语句由读写分离会话路由到主库，会话此后的读也走主库
+LOCK_BLOB_HASHES_SQL = text(
+    "SELECT pg_advisory_xact_lock(hashtext(h)) "
+    "FROM (SELECT DISTINCT unnest(CAST(:hashes AS text[])) AS h ORDER BY 1) AS hashes"
+)
+
+
+# 锁定内容哈希直到事务结束：登记/引用（上传）与清理同一内容的事务互斥，
+# 清理不会删掉并发上传刚写入的文件，上传也不会引用正在被清理的记录
+def lock_blob_hashes(db: Session, file_hashes: list):
+    file_hashes = sorted({h for h in file_hashes if h})
+    if file_hashes:
+        db.execute(LOCK_BLOB_HASHES_SQL, {"hashes": file_hashes})
+
+
+# 引用已有文件（引用计数+1），不存在时返回None
+def acquire_blob(db: Session, file_hash: str) -> Blob:
+    if not file_hash:
+        return None
+
+    updated = db.query(Blob).filter(Blob.hash == file_hash).update(
+        {Blob.ref_count: Blob.ref_count + 1},
+        synchronize_session=False
+    )
+    if not updated:
+        return None
+
+    return db.query(Blob).filter(Blob.hash == file_hash).first()
+
+
+# 登记新文件（引用计数为1，衍生数据待处理）
+def register_blob(
+        db: Session,
+        file_hash: str,
+        file_path: str,
+        size: int = 0,
+        mime_type: str = ""
+) -> Blob:
+    blob = Blob(
+        hash=file_hash,
+        file_path=file_path,
+        thumbnail_path="",
+        size=size,
+        mime_type=mime_type,
+        exif_data={},
+        width=0,
+        height=0,
+        processing_status="pending",
+        ref_count=1
+    )
+    # 在保存点内插入：冲突时只回滚这一条，不影响调用方同一事务中的其他改动
+    try:
+        with db.begin_nested():
+            db.add(blob)
+    except IntegrityError:
+        # 并发上传了相同内容，对方已登记，改为引用已有记录
+        return acquire_blob(db, file_hash)
+
+    return blob
+
+
+# 批量登记/引用文件：单条 INSERT ... ON CONFLICT 语句，新内容插入，已有内容累加引用计数
+# entries: {hash: {"file_path", "size", "mime_type", "ref_count"}}，由调用方提交事务
+def register_blobs(db: Session, entries: dict) -> dict:
+    if not entries:
+        return {}
+
+    rows = [
+        {
+            "hash": file_hash,
+            "file_path": entry["file_path"],
+            "thumbnail_path": "",
+            "size": entry["size"],
+            "mime_type": entry["mime_type"],
+            "exif_data": {},
+            "renditions": [],
+            "width": 0,
+            "height": 0,
+            "processing_status": "pending",
+            "processing_error": "",
+            "ref_count": entry["ref_count"]
+        }
+        for file_hash, entry in entries.items()
+    ]
+    stmt = insert(Blob).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Blob.hash],
+        set_={"ref_count": Blob.ref_count + stmt.excluded.ref_count}
+    )
+    db.execute(stmt)
+
+    blobs = db.query(Blob).filter(Blob.hash.in_(list(entries))).all()
+    return {blob.hash: blob for blob in blobs}
+
+
+# 释放引用（引用计数-1），由调用方提交事务
+def release_blob(db: Session, file_hash: str):
+    if not file_hash:
+        return
+
+    db.query(Blob).filter(
+        Blob.hash == file_hash,
+        Blob.ref_count > 0
+    ).update(
+        {Blob.ref_count: Blob.ref_count - 1},
+        synchronize_session=False
+    )
+
+
+# 删除无引用的blob记录并提交，返回 {哈希: 需要从存储中删除的文件键列表}（原图、缩略图、多分辨率版本）
+# DELETE ... WHERE ref_count <= 0 在行锁下重新判断条件，并发增加了引用的记录不会被删除；只返回实际删除的记录
+# 提交成功后再删除文件（见 image_service.purge_unreferenced_files），事务失败时文件不受影响
+def purge_orphan_blobs(db: Session, file_hashes: list) -> dict:
+    file_hashes = sorted({h for h in file_hashes if h})
+    if not file_hashes:
+        return {}
+
+    lock_blob_hashes(db, file_hashes)
+    rows = db.execute(
+        delete(Blob).where(
+            Blob.hash.in_(file_hashes),
+            Blob.ref_count <= 0
+        ).returning(Blob.hash, Blob.file_path, Blob.thumbnail_path, Blob.renditions)
+    ).all()
+    db.commit()
+
+    purged = {}
+    for file_hash, file_path, thumbnail_path, renditions in rows:
+        paths = [file_path, thumbnail_path] + [r["path"] for r in renditions or []]
+        purged[file_hash] = [storage_key(path) for path in paths if path]
+    return purged
+
+
+# 从存储中删除文件
+def delete_stored_files(keys: list):
+    storage = get_storage()
+    for key in keys:
+        storage.delete(key)
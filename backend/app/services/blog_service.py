@@ -3,17 +3,43 @@ import uuid
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import or_, and_
-from sqlalchemy.orm import Session
-
-from backend.app.models.blog import Blog
-# 现在能正确导入（BlogPost 是 Blog 的别名，Comment 已定义）
-from ..models.blog import BlogPost, Comment
+from sqlalchemy import or_, and_, select, delete, func
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException, status
+
+# BlogPost 是 Blog 的别名
+from ..models.blog import Blog, BlogPost, Comment
+from ..core.counting import CountMode, fetch_offset
+from ..utils.pagination_utils import keyset_page
+
+# 评论连同各级回复一起加载（异步会话中不能在 to_dict 里懒加载）
+COMMENT_CHILDREN_LOADER = selectinload(Comment.children, recursion_depth=-1)
+
+# 博客列表游标分页支持的排序字段（索引见 scripts/create_keyset_indexes.py）
+BLOG_CURSOR_SORT_FIELDS = ("created_at", "updated_at")
+# 评论列表的游标排序键
+COMMENT_LIST_KEYS = [(Comment.created_at, True), (Comment.id, True)]
+
+
+# 批量填充博客的评论数（一次分组统计）
+async def load_comment_counts(db: AsyncSession, blog_posts: list):
+    if not blog_posts:
+        return
+    rows = await db.execute(
+        select(Comment.blog_id, func.count()).where(
+            Comment.blog_id.in_([blog_post.id for blog_post in blog_posts]),
+            Comment.is_deleted == False
+        ).group_by(Comment.blog_id)
+    )
+    counts = dict(rows.all())
+    for blog_post in blog_posts:
+        blog_post.comment_count = counts.get(blog_post.id, 0)
 
 
 # ========== 博客相关服务 ==========
-def create_blog_post(
-        db: Session,
+async def create_blog_post(
+        db: AsyncSession,
         title: str,
         content: str,
         user_id: str,
@@ -38,22 +64,22 @@ def create_blog_post(
         updated_at=datetime.now()
     )
     db.add(blog_post)
-    db.commit()
-    db.refresh(blog_post)
+    await db.commit()
+    await db.refresh(blog_post)
     return blog_post
 
 
-def get_blog_post_by_id(
-        db: Session,
+async def get_blog_post_by_id(
+        db: AsyncSession,
         blog_id: str,
         user_id: Optional[str] = None
 ) -> Optional[BlogPost]:
     """根据ID获取博客"""
-    query = db.query(BlogPost).filter(BlogPost.id == blog_id)
+    query = select(BlogPost).where(BlogPost.id == blog_id)
 
     # 如果不是作者，只能看非私有、非草稿的博客
     if user_id:
-        query = query.filter(
+        query = query.where(
             or_(
                 BlogPost.user_id == user_id,
                 and_(
@@ -63,30 +89,35 @@ def get_blog_post_by_id(
             )
         )
     else:
-        query = query.filter(
+        query = query.where(
             BlogPost.is_private == False,
             BlogPost.is_draft == False
         )
 
-    return query.first()
+    blog_post = await db.scalar(query)
+    if blog_post:
+        await load_comment_counts(db, [blog_post])
+    return blog_post
 
 
-def get_blog_posts(
-        db: Session,
+async def get_blog_posts(
+        db: AsyncSession,
         skip: int = 0,
         limit: int = 10,
         keyword: str = "",
         sort_field: str = "created_at",
         sort_order: str = "desc",
         user_id: Optional[str] = None,
-        is_draft: Optional[bool] = None
+        is_draft: Optional[bool] = None,
+        cursor: Optional[str] = None,
+        count_mode: str = CountMode.AUTO
 ) -> tuple[list[type[Blog]], int]:
-    """获取博客列表"""
-    query = db.query(BlogPost)
+    """获取博客列表（传入 cursor 时为游标分页，返回 (本页数据, 下一页游标)，不统计总数）"""
+    query = select(BlogPost)
 
     # 筛选条件
     if keyword:
-        query = query.filter(
+        query = query.where(
             or_(
                 BlogPost.title.contains(keyword),
                 BlogPost.content.contains(keyword),
@@ -95,20 +126,30 @@ def get_blog_posts(
         )
 
     if user_id:
-        query = query.filter(BlogPost.user_id == user_id)
+        query = query.where(BlogPost.user_id == user_id)
 
     if is_draft is not None:
-        query = query.filter(BlogPost.is_draft == is_draft)
+        query = query.where(BlogPost.is_draft == is_draft)
 
     # 非作者只能看公开博客
     if not user_id:
-        query = query.filter(
+        query = query.where(
             BlogPost.is_private == False,
             BlogPost.is_draft == False
         )
 
-    # 总数
-    total = query.count()
+    # 游标分页（cursor 为空字符串时取第一页）
+    if cursor is not None:
+        if sort_field not in BLOG_CURSOR_SORT_FIELDS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="游标分页仅支持按创建时间或更新时间排序"
+            )
+        descending = sort_order == "desc"
+        keys = [(getattr(BlogPost, sort_field), descending), (BlogPost.id, descending)]
+        blog_posts, next_cursor = await keyset_page(db, query, keys, cursor, limit)
+        await load_comment_counts(db, blog_posts)
+        return blog_posts, next_cursor
 
     # 排序
     if sort_order == "desc":
@@ -116,23 +157,24 @@ def get_blog_posts(
     else:
         query = query.order_by(getattr(BlogPost, sort_field).asc())
 
-    # 分页
-    blog_posts = query.offset(skip).limit(limit).all()
+    # 分页（总数按 count_mode 统计）
+    blog_posts, total = await fetch_offset(db, query, skip, limit, count_mode)
+    await load_comment_counts(db, blog_posts)
 
     return blog_posts, total
 
 
-def update_blog_post(
-        db: Session,
+async def update_blog_post(
+        db: AsyncSession,
         blog_id: str,
         user_id: str,
         **kwargs
 ) -> type[Blog] | None:
     """更新博客"""
-    blog_post = db.query(BlogPost).filter(
+    blog_post = await db.scalar(select(BlogPost).where(
         BlogPost.id == blog_id,
         BlogPost.user_id == user_id
-    ).first()
+    ))
 
     if not blog_post:
         return None
@@ -143,34 +185,32 @@ def update_blog_post(
             setattr(blog_post, key, value)
 
     blog_post.updated_at = datetime.now()
-    db.commit()
-    db.refresh(blog_post)
+    await db.commit()
+    await db.refresh(blog_post)
+    await load_comment_counts(db, [blog_post])
 
     return blog_post
 
 
-def delete_blog_post(
-        db: Session,
+async def delete_blog_post(
+        db: AsyncSession,
         blog_id: str,
         user_id: str
 ) -> bool:
-    """删除博客"""
-    blog_post = db.query(BlogPost).filter(
-        BlogPost.id == blog_id,
-        BlogPost.user_id == user_id
-    ).first()
-
-    if not blog_post:
-        return False
-
-    db.delete(blog_post)
-    db.commit()
-    return True
+    """删除博客（评论由外键 ON DELETE CASCADE 一并删除）"""
+    result = await db.execute(
+        delete(BlogPost).where(
+            BlogPost.id == blog_id,
+            BlogPost.user_id == user_id
+        ).execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount > 0
 
 
 # ========== 评论相关服务 ==========
-def create_comment(
-        db: Session,
+async def create_comment(
+        db: AsyncSession,
         content: str,
         blog_id: str,
         user_id: str,
@@ -187,45 +227,54 @@ def create_comment(
         updated_at=datetime.now()
     )
     db.add(comment)
-    db.commit()
-    db.refresh(comment)
-    return comment
+    await db.commit()
+    return await db.scalar(
+        select(Comment).where(Comment.id == comment.id).options(
+            COMMENT_CHILDREN_LOADER
+        ).execution_options(populate_existing=True)
+    )
 
 
-def get_comments_by_blog_id(
-        db: Session,
+async def get_comments_by_blog_id(
+        db: AsyncSession,
         blog_id: str,
         skip: int = 0,
-        limit: int = 20
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        count_mode: str = CountMode.AUTO
 ) -> tuple[list[type[Comment]], int]:
-    """获取博客评论"""
-    query = db.query(Comment).filter(
+    """获取博客评论（传入 cursor 时为游标分页，返回 (本页数据, 下一页游标)，不统计总数）"""
+    query = select(Comment).where(
         Comment.blog_id == blog_id,
         Comment.is_deleted == False
     )
 
-    total = query.count()
-    comments = query.order_by(Comment.created_at.desc()).offset(skip).limit(limit).all()
+    if cursor is not None:
+        return await keyset_page(db, query.options(COMMENT_CHILDREN_LOADER), COMMENT_LIST_KEYS, cursor, limit)
+
+    comments, total = await fetch_offset(
+        db, query.options(COMMENT_CHILDREN_LOADER).order_by(Comment.created_at.desc()), skip, limit, count_mode
+    )
 
     return comments, total
 
 
-def delete_comment(
-        db: Session,
+async def delete_comment(
+        db: AsyncSession,
         comment_id: str,
         user_id: str
 ) -> bool:
     """删除评论（软删除）"""
-    comment = db.query(Comment).filter(
+    comment = await db.scalar(select(Comment).where(
         Comment.id == comment_id,
         Comment.user_id == user_id
-    ).first()
+    ))
 
     if not comment:
         return False
 
     comment.is_deleted = True
     comment.updated_at = datetime.now()
-    db.commit()
+    await db.commit()
 
     return True
\ No newline at end of file
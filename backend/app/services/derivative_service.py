@@ -0,0 +1,225 @@
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, or_, select, update
+from ..core.config import settings
+from ..core.db import SessionLocal
+from ..core.storage import get_storage, storage_key
+from ..models.blob import Blob
+from ..models.image import Image
+from ..utils.file_utils import process_image_derivatives
+
+logger = logging.getLogger(__name__)
+
+# 衍生数据处理状态
+STATUS_PENDING = "pending"
+STATUS_PROCESSING = "processing"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+# 进程池与并发控制（按需创建，应用关闭时释放）
+_process_pool = None
+_pending_semaphore = None
+# 持有后台任务引用，避免任务被提前回收
+_running_tasks = set()
+
+
+# 获取进程池（CPU密集的解码/缩放在子进程中执行，吞吐随核数增长）
+def get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=settings.DERIVATIVE_WORKERS)
+    return _process_pool
+
+
+# 限制同时提交到进程池的任务数，其余任务在事件循环中排队
+def get_pending_semaphore() -> asyncio.Semaphore:
+    global _pending_semaphore
+    if _pending_semaphore is None:
+        _pending_semaphore = asyncio.Semaphore(settings.DERIVATIVE_MAX_PENDING)
+    return _pending_semaphore
+
+
+# 关闭进程池
+def shutdown_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+# 更新blob及引用它的所有图片的处理状态
+def update_derivative_status(file_hash: str, status: str, error: str = ""):
+    db = SessionLocal()
+    try:
+        db.query(Blob).filter(Blob.hash == file_hash).update(
+            {Blob.processing_status: status, Blob.processing_error: error},
+            synchronize_session=False
+        )
+        db.query(Image).filter(Image.file_hash == file_hash).update(
+            {Image.processing_status: status},
+            synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+# 可领取的任务：待处理的，以及处理中但超过 DERIVATIVE_STALE_SECONDS 未更新的（处理它的进程已退出）
+def claimable_condition():
+    stale_before = datetime.now() - timedelta(seconds=settings.DERIVATIVE_STALE_SECONDS)
+    return or_(
+        Blob.processing_status == STATUS_PENDING,
+        and_(Blob.processing_status == STATUS_PROCESSING, Blob.updated_at < stale_before)
+    )
+
+
+# 列出当前可领取的任务（只读，不领取），返回 [(hash, file_path), ...]
+def list_claimable_derivative_jobs() -> list:
+    db = SessionLocal()
+    try:
+        return [tuple(row) for row in db.execute(select(Blob.hash, Blob.file_path).where(claimable_condition()))]
+    finally:
+        db.close()
+
+
+# 领取待处理任务：一条 UPDATE ... RETURNING 把 blob 置为处理中，多个 worker 同时领取时每个 blob 只会被一个领到
+# file_hashes 为 None 时领取全部，返回 [(hash, file_path), ...]
+def claim_derivative_jobs(file_hashes: list = None) -> list:
+    stmt = update(Blob).where(claimable_condition())
+    if file_hashes is not None:
+        stmt = stmt.where(Blob.hash.in_(file_hashes))
+    stmt = stmt.values(
+        processing_status=STATUS_PROCESSING, updated_at=datetime.now()
+    ).returning(Blob.hash, Blob.file_path)
+
+    db = SessionLocal()
+    try:
+        claimed = [tuple(row) for row in db.execute(stmt)]
+        if claimed:
+            db.query(Image).filter(Image.file_hash.in_([row[0] for row in claimed])).update(
+                {Image.processing_status: STATUS_PROCESSING},
+                synchronize_session=False
+            )
+        db.commit()
+        return claimed
+    finally:
+        db.close()
+
+
+# 刷新处理中任务的 updated_at，表明处理它的进程仍在运行，避免被其他 worker 当作中断任务重新领取
+def touch_derivative_job(file_hash: str):
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(Blob)
+            .where(Blob.hash == file_hash, Blob.processing_status == STATUS_PROCESSING)
+            .values(updated_at=datetime.now())
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+# 任务处理期间定期刷新 updated_at（间隔为中断判定时长的三分之一）
+async def heartbeat_derivative_job(file_hash: str):
+    while True:
+        await asyncio.sleep(settings.DERIVATIVE_STALE_SECONDS / 3)
+        try:
+            await run_in_threadpool(touch_derivative_job, file_hash)
+        except Exception as e:
+            logger.warning(f"刷新衍生数据任务心跳失败: {file_hash}: {e}")
+
+
+# 保存处理结果（一次事务内写回blob及引用它的所有图片）
+def save_derivative_result(file_hash: str, result: dict):
+    thumbnail_path = f"/{result['thumbnail_path']}" if result["thumbnail_path"] else ""
+    renditions = [dict(r, path=f"/{r['path']}") for r in result["renditions"]]
+    derived = {
+        "thumbnail_path": thumbnail_path,
+        "renditions": renditions,
+        "exif_data": result["exif_data"],
+        "width": result["width"],
+        "height": result["height"],
+        "captured_at": result["captured_at"],
+        "phash": result["phash"],
+        "blurhash": result["blurhash"],
+        "dominant_color": result["dominant_color"],
+        "processing_status": STATUS_DONE
+    }
+
+    blob_values = {getattr(Blob, key): value for key, value in derived.items()}
+    blob_values[Blob.processing_error] = ""
+    # 特征向量只存在blob上，相似搜索按blob建索引
+    blob_values[Blob.features] = result["features"]
+    image_values = {getattr(Image, key): value for key, value in derived.items()}
+    if result["mime_type"]:
+        # 以文件头魔数识别的类型为准，不信任客户端声明的 Content-Type
+        blob_values[Blob.mime_type] = result["mime_type"]
+        image_values[Image.file_type] = result["mime_type"]
+
+    db = SessionLocal()
+    try:
+        db.query(Blob).filter(Blob.hash == file_hash).update(blob_values, synchronize_session=False)
+        db.query(Image).filter(Image.file_hash == file_hash).update(image_values, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+# 远端存储：下载原图到临时文件处理，生成的版本上传后删除本地文件（在线程中执行）
+def process_remote_derivatives(file_path: str, rendition_base: str) -> dict:
+    storage = get_storage()
+    with storage.local_copy(storage_key(file_path)) as source_path:
+        result = get_process_pool().submit(
+            process_image_derivatives,
+            source_path,
+            rendition_base,
+            settings.RENDITION_SIZES,
+            settings.RENDITION_FORMATS
+        ).result()
+
+    for rendition in result["renditions"]:
+        storage.put_file(
+            storage_key(rendition["path"]), rendition["path"], f"image/{rendition['format']}", move=True
+        )
+    return result
+
+
+# 执行衍生数据处理任务：取得并发名额后再领取，已被其他 worker 领取则跳过
+# 排队等待名额期间不持有领取状态，领取后由心跳维持，处理时间再长也不会被重复领取
+async def run_derivative_job(file_hash: str, file_path: str, rendition_base: str):
+    async with get_pending_semaphore():
+        if not await run_in_threadpool(claim_derivative_jobs, [file_hash]):
+            return
+        loop = asyncio.get_running_loop()
+        heartbeat = loop.create_task(heartbeat_derivative_job(file_hash))
+        try:
+            if get_storage().local_path(storage_key(file_path)) is None:
+                result = await run_in_threadpool(process_remote_derivatives, file_path, rendition_base)
+            else:
+                result = await loop.run_in_executor(
+                    get_process_pool(),
+                    process_image_derivatives,
+                    file_path.lstrip('/'),
+                    rendition_base,
+                    settings.RENDITION_SIZES,
+                    settings.RENDITION_FORMATS
+                )
+            await run_in_threadpool(save_derivative_result, file_hash, result)
+        except Exception as e:
+            logger.error(f"衍生数据处理失败: {file_hash}: {e}", exc_info=True)
+            await run_in_threadpool(update_derivative_status, file_hash, STATUS_FAILED, str(e))
+        finally:
+            heartbeat.cancel()
+
+
+# 提交衍生数据处理任务（需在事件循环中调用，立即返回）
+def enqueue_derivative_job(file_hash: str, file_path: str, rendition_base: str):
+    task = asyncio.get_running_loop().create_task(
+        run_derivative_job(file_hash, file_path, rendition_base)
+    )
+    _running_tasks.add(task)
+    task.add_done_callback(_running_tasks.discard)
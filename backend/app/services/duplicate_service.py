@@ -0,0 +1,208 @@
+import threading
+from datetime import datetime, timedelta
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException, status
+from ..core.config import settings
+from ..models.blob import Blob
+from ..models.image import Image
+from ..services.album_service import get_album_detail
+
+# 刷新时每批读取的行数
+REFRESH_BATCH_ROWS = 10000
+
+# 默认及最大汉明距离阈值（64位 dHash，<=8 基本为同一画面的不同导出版本）
+DEFAULT_DUPLICATE_THRESHOLD = 8
+MAX_DUPLICATE_THRESHOLD = 16
+
+
+# 汉明距离
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+# BK树：按汉明距离组织的度量树，查询半径 r 内的邻居时利用三角不等式剪枝，只访问少量节点
+class BKTree:
+    def __init__(self):
+        # 节点：[值, {与父节点的距离: 子节点}]
+        self.root = None
+        self.size = 0
+
+    def add(self, value: int) -> bool:
+        if self.root is None:
+            self.root = [value, {}]
+            self.size = 1
+            return True
+
+        node = self.root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                return False
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = [value, {}]
+                self.size += 1
+                return True
+            node = child
+
+    # 返回 [(距离, 值), ...]
+    def search(self, value: int, radius: int) -> list:
+        results = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(value, node[0])
+            if distance <= radius:
+                results.append((distance, node[0]))
+            for child_distance, child in node[1].items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        return results
+
+
+# 全库感知哈希索引（按blob建立，字节相同的图片只占一个节点）
+# 按 Blob.updated_at 增量加载新处理完成的blob；已删除的blob在查询图片时被过滤
+# 锁只保护内存中的树，锁内不做数据库IO；建树与查询都在线程池中执行，不占用事件循环
+class DuplicateIndex:
+    def __init__(self):
+        self.tree = BKTree()
+        self.blobs = {}
+        self.loaded_until = None
+        self.lock = threading.Lock()
+
+    # 增量查询：已加载位置之后有感知哈希的blob
+    # 从已加载位置往前回看一段（INDEX_REFRESH_OVERLAP_SECONDS），补上晚提交的行；重复读到的行按集合去重
+    def delta_query(self):
+        query = select(Blob.hash, Blob.phash, Blob.updated_at).where(Blob.phash.isnot(None))
+        if self.loaded_until:
+            since = self.loaded_until - timedelta(seconds=settings.INDEX_REFRESH_OVERLAP_SECONDS)
+            query = query.where(Blob.updated_at >= since)
+        return query.execution_options(yield_per=REFRESH_BATCH_ROWS)
+
+    # 并入一批增量行 [(哈希, 感知哈希, 更新时间), ...]（纯内存操作）
+    def apply(self, rows):
+        with self.lock:
+            for file_hash, phash, updated_at in rows:
+                value = int(phash, 16)
+                self.tree.add(value)
+                self.blobs.setdefault(value, set()).add(file_hash)
+                if self.loaded_until is None or updated_at > self.loaded_until:
+                    self.loaded_until = updated_at
+
+    # 刷新：在锁外异步分批读取增量，每批交给线程池插入树中
+    async def refresh(self, db: AsyncSession):
+        result = await db.stream(self.delta_query())
+        async for rows in result.partitions():
+            await run_in_threadpool(self.apply, rows)
+
+    # 返回 {blob哈希: 距离}；请求中应在线程池中调用
+    def search(self, phash: str, radius: int) -> dict:
+        with self.lock:
+            matches = {}
+            for distance, value in self.tree.search(int(phash, 16), radius):
+                for file_hash in self.blobs.get(value, ()):
+                    matches[file_hash] = distance
+            return matches
+
+
+duplicate_index = DuplicateIndex()
+
+
+# 校验阈值
+def validate_duplicate_threshold(threshold: int) -> int:
+    if threshold < 0 or threshold > MAX_DUPLICATE_THRESHOLD:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"阈值需在 0-{MAX_DUPLICATE_THRESHOLD} 之间"
+        )
+    return threshold
+
+
+# 查找当前用户图库中与指定图片相似的图片，返回 [(图片, 距离), ...]，按距离升序
+async def find_similar_images(
+        db: AsyncSession,
+        image: Image,
+        user_id: str,
+        threshold: int = DEFAULT_DUPLICATE_THRESHOLD
+) -> list:
+    validate_duplicate_threshold(threshold)
+
+    if not image.phash:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="图片尚未完成处理，暂无法查找相似图片"
+        )
+
+    await duplicate_index.refresh(db)
+    matches = await run_in_threadpool(duplicate_index.search, image.phash, threshold)
+    matches[image.file_hash] = 0
+
+    images = (await db.scalars(select(Image).where(
+        Image.file_hash.in_(list(matches)),
+        Image.user_id == user_id,
+        Image.is_deleted == False,
+        Image.id != image.id
+    ))).all()
+
+    return sorted(
+        ((candidate, matches[candidate.file_hash]) for candidate in images),
+        key=lambda item: (item[1], item[0].created_at or datetime.min)
+    )
+
+
+# 图片集重复报告：将图片集内互为近似重复的图片聚成组（并查集合并所有距离不超过阈值的图片对）
+async def get_album_duplicate_report(
+        db: AsyncSession,
+        album_id: str,
+        user_id: str,
+        threshold: int = DEFAULT_DUPLICATE_THRESHOLD
+) -> list:
+    validate_duplicate_threshold(threshold)
+    await get_album_detail(db, album_id, user_id)
+
+    images = (await db.scalars(select(Image).where(
+        Image.album_id == album_id,
+        Image.is_deleted == False,
+        Image.phash.isnot(None)
+    ))).all()
+
+    # 图片集内单独建树，避免逐对比较
+    tree = BKTree()
+    by_value = {}
+    for image in images:
+        value = int(image.phash, 16)
+        tree.add(value)
+        by_value.setdefault(value, []).append(image)
+
+    parent = {value: value for value in by_value}
+
+    def find(value):
+        while parent[value] != value:
+            parent[value] = parent[parent[value]]
+            value = parent[value]
+        return value
+
+    max_distances = {}
+    for value in by_value:
+        for distance, other in tree.search(value, threshold):
+            root_a, root_b = find(value), find(other)
+            if root_a != root_b:
+                parent[root_b] = root_a
+                max_distances[root_a] = max(
+                    max_distances.get(root_a, 0), max_distances.pop(root_b, 0), distance
+                )
+
+    groups = {}
+    for value, group_images in by_value.items():
+        groups.setdefault(find(value), []).extend(group_images)
+
+    report = [
+        {"images": group_images, "max_distance": max_distances.get(root, 0)}
+        for root, group_images in groups.items()
+        if len(group_images) > 1
+    ]
+    report.sort(key=lambda group: len(group["images"]), reverse=True)
+
+    return report
@@ -1,122 +1,483 @@
 import os
+import uuid
+import asyncio
+from collections import Counter
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from ..core.counting import CountMode, fetch_page
+from ..core.storage import get_storage, storage_key
+from ..utils.pagination_utils import keyset_page
 from ..models.image import Image
 from ..models.album import Album
-from ..services.album_service import get_album_detail, update_album_image_count
+from ..models.blob import Blob
+from ..services.album_service import (
+    get_album_detail, check_album_access, update_album_image_count, increment_album_image_count
+)
 from ..utils.file_utils import (
-    ensure_dir, generate_unique_filename, validate_file_type,
-    validate_file_size, generate_thumbnail, extract_exif_data
+    generate_unique_filename, validate_file_type,
+    validate_file_size, get_file_size_limit, save_upload_stream,
+    FileSizeExceededError, get_blob_path
+)
+from ..services.blob_service import (
+    acquire_blob, register_blob, register_blobs, release_blob, purge_orphan_blobs, delete_stored_files,
+    lock_blob_hashes
+)
+from ..services.derivative_service import (
+    enqueue_derivative_job, list_claimable_derivative_jobs, STATUS_PENDING, STATUS_PROCESSING, STATUS_DONE
 )
 
 # 存储路径配置
 BASE_UPLOAD_DIR = "static/uploads"
 THUMBNAIL_DIR = "static/thumbnails"
+STAGING_DIR = os.path.join(BASE_UPLOAD_DIR, ".staging")
 
+# 批量上传时同时写盘的文件数
+BATCH_UPLOAD_CONCURRENCY = 8
 
-# 上传图片
-def upload_image(
-        db: Session,
-        file: UploadFile,
-        album_id: str,
-        user_id: str
-) -> Image:
-    # 验证文件
-    if not validate_file_type(file.filename):
+# 图片集内图片的游标排序键（索引见 scripts/create_keyset_indexes.py）
+ALBUM_IMAGE_KEYS = [(Image.sort_order, False), (Image.created_at, True), (Image.id, True)]
+
+
+# 验证上传文件（类型、大小）
+def validate_upload_file(filename: str, file_size: int):
+    if not validate_file_type(filename):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="不支持的文件类型"
         )
 
-    if not validate_file_size(file.filename, file.size):
+    if file_size is not None and not validate_file_size(filename, file_size):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="文件大小超过限制"
         )
 
-    # 验证图片集
-    album = get_album_detail(db, album_id, user_id)
+
+# 验证图片集上传权限
+async def check_album_upload_permission(db: AsyncSession, album_id: str, user_id: str) -> Album:
+    album = await get_album_detail(db, album_id, user_id)
     if album.user_id != user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="无权限上传图片到该图片集"
         )
 
-    # 确保目录存在
-    user_dir = os.path.join(BASE_UPLOAD_DIR, user_id)
-    thumbnail_dir = os.path.join(THUMBNAIL_DIR, user_id)
-    ensure_dir(user_dir)
-    ensure_dir(thumbnail_dir)
+    return album
+
+
+# 验证上传请求（文件类型、大小、图片集权限）
+async def validate_upload(
+        db: AsyncSession,
+        filename: str,
+        file_size: int,
+        album_id: str,
+        user_id: str
+):
+    validate_upload_file(filename, file_size)
+    await check_album_upload_permission(db, album_id, user_id)
+
+
+# 将blob已完成的衍生数据同步到引用它的图片
+# 复用的blob可能在图片记录写入前刚处理完，后台任务的批量更新没有覆盖到这些记录
+# 同步函数（迁移脚本也会调用），异步会话中通过 run_sync 执行
+def sync_blob_derivatives(db: Session, file_hashes: list):
+    if not file_hashes:
+        return
+
+    blobs = db.query(Blob).filter(
+        Blob.hash.in_(file_hashes),
+        Blob.processing_status == STATUS_DONE
+    ).all()
+
+    for blob in blobs:
+        db.query(Image).filter(
+            Image.file_hash == blob.hash,
+            Image.processing_status != STATUS_DONE
+        ).update(
+            {
+                Image.thumbnail_path: blob.thumbnail_path,
+                Image.renditions: blob.renditions,
+                Image.file_type: blob.mime_type,
+                Image.captured_at: blob.captured_at,
+                Image.phash: blob.phash,
+                Image.blurhash: blob.blurhash,
+                Image.dominant_color: blob.dominant_color,
+                Image.exif_data: blob.exif_data,
+                Image.width: blob.width,
+                Image.height: blob.height,
+                Image.processing_status: blob.processing_status
+            },
+            synchronize_session=False
+        )
 
-    # 保存文件
-    filename = generate_unique_filename(file.filename)
-    file_path = os.path.join(user_dir, filename)
+    db.commit()
 
-    with open(file_path, "wb") as f:
-        f.write(file.file.read())
 
-    # 生成缩略图
-    thumbnail_filename = f"thumb_{filename.rsplit('.', 1)[0]}.jpg"
-    thumbnail_path = os.path.join(thumbnail_dir, thumbnail_filename)
-    generate_thumbnail(file_path, thumbnail_path)
+# 入库暂存区中已写完的文件（去重、生成缩略图、提取EXIF、创建图片记录）
+async def store_staged_image(
+        db: AsyncSession,
+        staging_path: str,
+        file_size: int,
+        file_hash: str,
+        filename: str,
+        content_type: str,
+        album_id: str,
+        user_id: str
+) -> Image:
+    # 锁定该内容直到提交，期间不会被清理
+    await db.run_sync(lock_blob_hashes, [file_hash])
+    blob = await db.run_sync(acquire_blob, file_hash)
+    if blob:
+        # 重复内容：丢弃暂存文件，复用已有原图、缩略图和EXIF
+        os.remove(staging_path)
+        is_new_blob = False
+    else:
+        ext = os.path.splitext(filename)[1].lower()
+        file_path = get_blob_path(BASE_UPLOAD_DIR, file_hash, ext)
+        await run_in_threadpool(
+            get_storage().put_file, storage_key(file_path), staging_path, content_type or "", True
+        )
 
-    # 提取EXIF信息
-    exif_data = extract_exif_data(file_path)
+        # 原图写入存储即登记，缩略图/EXIF/尺寸由后台进程池生成
+        blob = await db.run_sync(
+            register_blob,
+            file_hash=file_hash,
+            file_path=f"/{file_path}",
+            size=file_size,
+            mime_type=content_type or ""
+        )
+        is_new_blob = True
 
     # 创建图片记录
     image = Image(
-        filename=file.filename,
-        file_path=f"/{file_path}",
-        thumbnail_path=f"/{thumbnail_path}" if os.path.exists(thumbnail_path) else "",
-        file_type=file.content_type or "",
-        file_size=file.size,
+        id=str(uuid.uuid4()),
+        filename=filename,
+        file_path=blob.file_path,
+        thumbnail_path=blob.thumbnail_path,
+        file_type=blob.mime_type or content_type or "",
+        file_size=blob.size,
+        file_hash=file_hash,
         album_id=album_id,
         user_id=user_id,
-        exif_data=exif_data
+        renditions=blob.renditions,
+        captured_at=blob.captured_at,
+        phash=blob.phash,
+        blurhash=blob.blurhash,
+        dominant_color=blob.dominant_color,
+        exif_data=blob.exif_data,
+        width=blob.width,
+        height=blob.height,
+        processing_status=blob.processing_status
     )
 
     db.add(image)
-    db.commit()
-    db.refresh(image)
+    await db.commit()
+    await db.refresh(image)
+
+    if is_new_blob:
+        enqueue_derivative_job(file_hash, blob.file_path, get_blob_path(THUMBNAIL_DIR, file_hash))
+    elif image.processing_status != STATUS_DONE:
+        await db.run_sync(sync_blob_derivatives, [file_hash])
+        await db.refresh(image)
 
     # 更新图片集图片数量
-    update_album_image_count(db, album_id)
+    await update_album_image_count(db, album_id)
+
+    return image
+
+
+# 上传图片
+async def upload_image(
+        db: AsyncSession,
+        file: UploadFile,
+        album_id: str,
+        user_id: str
+) -> Image:
+    await validate_upload(db, file.filename, file.size, album_id, user_id)
+
+    # 先写入暂存区：内容哈希要等整个文件写完才能确定
+    staging_path = os.path.join(STAGING_DIR, generate_unique_filename(file.filename))
+
+    # 分块流式写入（线程池中执行，不阻塞事件循环），超限立即中止
+    try:
+        file_size, file_hash = await run_in_threadpool(
+            save_upload_stream,
+            file.file,
+            staging_path,
+            get_file_size_limit(file.filename)
+        )
+    except FileSizeExceededError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="文件大小超过限制"
+        )
+
+    return await store_staged_image(
+        db,
+        staging_path=staging_path,
+        file_size=file_size,
+        file_hash=file_hash,
+        filename=file.filename,
+        content_type=file.content_type,
+        album_id=album_id,
+        user_id=user_id
+    )
+
+
+# 入库失败（事务已回滚）后删除本批写入存储、但库中没有登记的文件
+# 重新锁定这些内容后在主库上确认：并发请求已提交登记的相同内容保留，正在上传相同内容的请求等删除完成后再写入
+async def discard_unregistered_uploads(db: AsyncSession, uploaded: dict):
+    if not uploaded:
+        return
+    try:
+        await db.run_sync(lock_blob_hashes, list(uploaded))
+        registered = set(await db.scalars(select(Blob.hash).where(Blob.hash.in_(list(uploaded)))))
+        keys = [key for file_hash, key in uploaded.items() if file_hash not in registered]
+        await run_in_threadpool(delete_stored_files, keys)
+    finally:
+        await db.rollback()
+
+
+# 批量入库暂存区中已写完的文件
+# blob 用一条 upsert 登记，图片记录一次性批量插入，图片集数量做一次增量更新，整批一个事务
+# staged: [{"filename", "content_type", "staging_path", "file_size", "file_hash"}, ...]
+async def store_staged_images(
+        db: AsyncSession,
+        staged: list,
+        album_id: str,
+        user_id: str
+) -> list:
+    if not staged:
+        return []
+
+    ref_counts = Counter(item["file_hash"] for item in staged)
+    # 每种内容取批次内的第一个文件，其余相同内容的暂存文件入库后删除
+    first_staged = {}
+    for item in staged:
+        first_staged.setdefault(item["file_hash"], item)
+
+    semaphore = asyncio.Semaphore(BATCH_UPLOAD_CONCURRENCY)
+    # 本批写入存储的文件键（hash -> key），入库失败时清理
+    uploaded = {}
+
+    # 新内容并发写入存储（对象存储时大文件自动分片上传），返回待登记的条目
+    async def persist(file_hashes: list) -> dict:
+        async def put(item: dict):
+            ext = os.path.splitext(item["filename"])[1].lower()
+            file_path = get_blob_path(BASE_UPLOAD_DIR, item["file_hash"], ext)
+            async with semaphore:
+                await run_in_threadpool(
+                    get_storage().put_file, storage_key(file_path), item["staging_path"], item["content_type"] or "", True
+                )
+            uploaded[item["file_hash"]] = storage_key(file_path)
+            return item["file_hash"], {
+                "file_path": f"/{file_path}",
+                "size": item["file_size"],
+                "mime_type": item["content_type"] or "",
+                "ref_count": ref_counts[item["file_hash"]]
+            }
+
+        # 等全部上传结束再抛出错误，失败清理时不会漏掉仍在上传的文件
+        results = await asyncio.gather(*(put(first_staged[file_hash]) for file_hash in file_hashes), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise errors[0]
+        return dict(results)
+
+    try:
+        # 锁定本批内容直到提交（咨询锁，走主库），期间已有记录不会被清理；只上传库中没有的新内容
+        await db.run_sync(lock_blob_hashes, list(first_staged))
+        existing = set(await db.scalars(select(Blob.hash).where(Blob.hash.in_(list(first_staged)))))
+        entries = await persist([file_hash for file_hash in first_staged if file_hash not in existing])
+        for file_hash in existing:
+            entries.setdefault(file_hash, {"file_path": "", "size": 0, "mime_type": "", "ref_count": ref_counts[file_hash]})
+
+        blobs = await db.run_sync(register_blobs, entries)
+
+        images = []
+        for item in staged:
+            blob = blobs[item["file_hash"]]
+            images.append(Image(
+                id=str(uuid.uuid4()),
+                filename=item["filename"],
+                file_path=blob.file_path,
+                thumbnail_path=blob.thumbnail_path,
+                file_type=blob.mime_type or item["content_type"] or "",
+                file_size=blob.size,
+                file_hash=item["file_hash"],
+                album_id=album_id,
+                user_id=user_id,
+                renditions=blob.renditions,
+                captured_at=blob.captured_at,
+                phash=blob.phash,
+                blurhash=blob.blurhash,
+                dominant_color=blob.dominant_color,
+                exif_data=blob.exif_data,
+                width=blob.width,
+                height=blob.height,
+                processing_status=blob.processing_status
+            ))
+
+        db.add_all(images)
+        await increment_album_image_count(db, album_id, len(images))
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        await discard_unregistered_uploads(db, uploaded)
+        raise
+    finally:
+        for item in staged:
+            if os.path.exists(item["staging_path"]):
+                os.remove(item["staging_path"])
+
+    for file_hash, blob in blobs.items():
+        if file_hash not in existing:
+            enqueue_derivative_job(file_hash, blob.file_path, get_blob_path(THUMBNAIL_DIR, file_hash))
+    await db.run_sync(sync_blob_derivatives, [h for h in existing if blobs[h].processing_status != STATUS_DONE])
+
+    # 提交后一次查询取回全部记录（避免逐条刷新）
+    image_ids = [image.id for image in images]
+    loaded = {
+        image.id: image for image in await db.scalars(
+            select(Image).where(Image.id.in_(image_ids)).execution_options(populate_existing=True)
+        )
+    }
+
+    return [loaded[image_id] for image_id in image_ids]
+
+
+# 批量上传图片（图片集只鉴权一次，文件并发流式写入暂存区后整批入库）
+async def upload_images_batch(
+        db: AsyncSession,
+        files: list,
+        album_id: str,
+        user_id: str
+) -> list:
+    for file in files:
+        validate_upload_file(file.filename, file.size)
+    await check_album_upload_permission(db, album_id, user_id)
+
+    semaphore = asyncio.Semaphore(BATCH_UPLOAD_CONCURRENCY)
+
+    async def stage(file: UploadFile) -> dict:
+        staging_path = os.path.join(STAGING_DIR, generate_unique_filename(file.filename))
+        async with semaphore:
+            file_size, file_hash = await run_in_threadpool(
+                save_upload_stream,
+                file.file,
+                staging_path,
+                get_file_size_limit(file.filename)
+            )
+        return {
+            "filename": file.filename,
+            "content_type": file.content_type,
+            "staging_path": staging_path,
+            "file_size": file_size,
+            "file_hash": file_hash
+        }
+
+    results = await asyncio.gather(*(stage(file) for file in files), return_exceptions=True)
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        for result in results:
+            if not isinstance(result, BaseException) and os.path.exists(result["staging_path"]):
+                os.remove(result["staging_path"])
+        if isinstance(errors[0], FileSizeExceededError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="文件大小超过限制"
+            )
+        raise errors[0]
+
+    return await store_staged_images(db, results, album_id, user_id)
+
+
+# 重新提交未完成的衍生数据处理任务（服务重启后恢复）
+# 任务在取得并发名额时才领取：多个 worker 同时启动时各自排队，同一 blob 只由领到它的 worker 处理
+def resume_pending_image_processing() -> int:
+    jobs = list_claimable_derivative_jobs()
+
+    for file_hash, file_path in jobs:
+        enqueue_derivative_job(file_hash, file_path, get_blob_path(THUMBNAIL_DIR, file_hash))
+
+    return len(jobs)
+
+
+# 等待图片衍生数据处理完成（超时返回当前状态）
+async def wait_for_image_processing(
+        db: AsyncSession,
+        image_id: str,
+        user_id: str = None,
+        timeout: float = 0
+) -> Image:
+    image = await get_image_detail(db, image_id, user_id)
+
+    deadline = asyncio.get_running_loop().time() + min(timeout, 30)
+    while image.processing_status in (STATUS_PENDING, STATUS_PROCESSING):
+        if asyncio.get_running_loop().time() >= deadline:
+            break
+        await asyncio.sleep(0.5)
+        await db.refresh(image)
 
     return image
 
 
+# 删除无引用的blob记录，提交后再从存储中删除文件（文件删除在线程池中执行）
+# 删除文件期间重新锁定这些内容：其间已被重新上传登记的跳过，正在上传相同内容的请求等删除完成后再写入
+async def purge_unreferenced_files(db: AsyncSession, file_hashes: list):
+    purged = await db.run_sync(purge_orphan_blobs, file_hashes)
+    if not purged:
+        return
+    try:
+        await db.run_sync(lock_blob_hashes, list(purged))
+        registered = set(await db.scalars(select(Blob.hash).where(Blob.hash.in_(list(purged)))))
+        keys = [key for file_hash, keys in purged.items() if file_hash not in registered for key in keys]
+        await run_in_threadpool(delete_stored_files, keys)
+    finally:
+        # 结束事务释放锁（没有写入；用提交而非回滚，调用方已加载的对象不会过期）
+        await db.commit()
+
+
 # 获取图片集内图片列表
-def get_album_images(
-        db: Session,
+async def get_album_images(
+        db: AsyncSession,
         album_id: str,
         user_id: str = None,
         page: int = 1,
-        page_size: int = 20
+        page_size: int = 20,
+        cursor: str = None,
+        count_mode: str = CountMode.AUTO
 ) -> tuple:
     # 验证图片集权限
-    album = get_album_detail(db, album_id, user_id)
+    album = await get_album_detail(db, album_id, user_id)
 
-    query = db.query(Image).filter(
+    query = select(Image).where(
         Image.album_id == album_id,
         Image.is_deleted == False
     ).order_by(Image.sort_order, Image.created_at.desc())
 
-    total = query.count()
-    images = query.offset((page - 1) * page_size).limit(page_size).all()
+    # 游标分页（瀑布流无限滚动）：不统计总数，返回 (本页数据, 下一页游标)
+    if cursor is not None:
+        return await keyset_page(db, query, ALBUM_IMAGE_KEYS, cursor, page_size)
+
+    images, total = await fetch_page(db, query, page, page_size, count_mode)
 
     return images, total
 
 
 # 获取图片详情
-def get_image_detail(
-        db: Session,
+async def get_image_detail(
+        db: AsyncSession,
         image_id: str,
         user_id: str = None
 ) -> Image:
-    image = db.query(Image).filter(
+    image = await db.scalar(select(Image).where(
         Image.id == image_id,
         Image.is_deleted == False
-    ).first()
+    ))
 
     if not image:
         raise HTTPException(
@@ -125,14 +486,41 @@ def get_image_detail(
         )
 
     # 验证权限
-    album = get_album_detail(db, image.album_id, user_id)
+    album = await get_album_detail(db, image.album_id, user_id)
 
     return image
 
 
+# 获取批量下载的图片（一次查询取回图片及所属图片集，按请求顺序返回）
+async def get_images_for_download(
+        db: AsyncSession,
+        image_ids: list,
+        user_id: str = None
+) -> list:
+    rows = (await db.execute(select(Image, Album).join(Album, Image.album_id == Album.id).where(
+        Image.id.in_(image_ids),
+        Image.is_deleted == False,
+        Album.is_deleted == False
+    ))).all()
+
+    images = {}
+    for image, album in rows:
+        check_album_access(album, user_id)
+        images[image.id] = image
+
+    missing = [image_id for image_id in image_ids if image_id not in images]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="图片不存在或已删除"
+        )
+
+    return [images[image_id] for image_id in dict.fromkeys(image_ids)]
+
+
 # 更新图片排序
-def update_image_sort(
-        db: Session,
+async def update_image_sort(
+        db: AsyncSession,
         image_ids: list,
         user_id: str
 ) -> bool:
@@ -140,11 +528,11 @@ def update_image_sort(
         return False
 
     # 验证所有图片属于当前用户
-    images = db.query(Image).filter(
+    images = (await db.scalars(select(Image).where(
         Image.id.in_(image_ids),
         Image.user_id == user_id,
         Image.is_deleted == False
-    ).all()
+    ))).all()
 
     if len(images) != len(image_ids):
         raise HTTPException(
@@ -157,18 +545,18 @@ def update_image_sort(
         image = next(img for img in images if img.id == image_id)
         image.sort_order = index
 
-    db.commit()
+    await db.commit()
 
     return True
 
 
 # 删除图片
-def delete_image(
-        db: Session,
+async def delete_image(
+        db: AsyncSession,
         image_id: str,
         user_id: str
 ) -> bool:
-    image = get_image_detail(db, image_id, user_id)
+    image = await get_image_detail(db, image_id, user_id)
 
     # 验证所有权
     if image.user_id != user_id:
@@ -178,17 +566,21 @@ def delete_image(
         )
 
     image.is_deleted = True
-    db.commit()
+    await db.run_sync(release_blob, image.file_hash)
+    await db.commit()
+
+    # 清理不再被引用的文件
+    await purge_unreferenced_files(db, [image.file_hash])
 
     # 更新图片集图片数量
-    update_album_image_count(db, image.album_id)
+    await update_album_image_count(db, image.album_id)
 
     return True
 
 
 # 批量删除图片
-def batch_delete_images(
-        db: Session,
+async def batch_delete_images(
+        db: AsyncSession,
         image_ids: list,
         user_id: str
 ) -> bool:
@@ -196,11 +588,11 @@ def batch_delete_images(
         return False
 
     # 验证所有图片属于当前用户
-    images = db.query(Image).filter(
+    images = (await db.scalars(select(Image).where(
         Image.id.in_(image_ids),
         Image.user_id == user_id,
         Image.is_deleted == False
-    ).all()
+    ))).all()
 
     if not images:
         raise HTTPException(
@@ -212,12 +604,16 @@ def batch_delete_images(
     album_ids = set()
     for image in images:
         image.is_deleted = True
+        await db.run_sync(release_blob, image.file_hash)
         album_ids.add(image.album_id)
 
-    db.commit()
+    await db.commit()
+
+    # 清理不再被引用的文件
+    await purge_unreferenced_files(db, [image.file_hash for image in images])
 
     # 更新图片集图片数量
     for album_id in album_ids:
-        update_album_image_count(db, album_id)
+        await update_album_image_count(db, album_id)
 
     return True
\ No newline at end of file
@@ -0,0 +1,198 @@
+import os
+import asyncio
+import hashlib
+import threading
+from fastapi import HTTPException, status
+from ..core.config import settings
+from ..core.storage import get_storage, storage_key
+from ..models.image import Image
+from ..services.derivative_service import get_process_pool
+from ..utils.file_utils import (
+    RENDITION_EXTENSIONS, ensure_dir, get_blob_path, render_image_variant
+)
+
+# 单边最大渲染尺寸
+MAX_RENDER_SIZE = 4096
+RENDER_FITS = ("contain", "cover")
+RENDER_MEDIA_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp"}
+
+
+# 磁盘LRU缓存：按字节预算淘汰最久未访问（mtime 最早）的文件，命中时更新 mtime
+# 容量按目录扫描统计，包含其他 worker 进程写入的文件，多进程共享同一目录时总量也不超过 max_bytes。
+# 扫描不在每次写入时进行：本进程新写入的字节累计达到 max_bytes / scan_parts 时扫描并淘汰一次，
+# 两次扫描之间最多超出约 worker 数 × max_bytes / scan_parts
+class DiskLRUCache:
+    def __init__(self, root: str, max_bytes: int, scan_parts: int = 20):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.scan_interval_bytes = max(1, max_bytes // scan_parts)
+        # 上次扫描后本进程写入的字节数（None 表示尚未扫描过，首次写入即扫描）
+        self.written_bytes = None
+        self.lock = threading.Lock()
+        self.evict_lock = threading.Lock()
+
+    # 扫描缓存目录，按 mtime 从旧到新返回 [(mtime, path, size), ...]
+    def scan(self) -> list:
+        ensure_dir(self.root)
+        files = []
+        for dir_path, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    continue
+                path = os.path.join(dir_path, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, path, stat.st_size))
+        return sorted(files)
+
+    def get(self, path: str) -> bool:
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # 未缓存或已被淘汰（可能是其他进程淘汰的）
+            return False
+        return True
+
+    def add(self, path: str):
+        size = os.path.getsize(path)
+        with self.lock:
+            if self.written_bytes is not None and self.written_bytes + size < self.scan_interval_bytes:
+                self.written_bytes += size
+                return
+            self.written_bytes = 0
+        self.evict()
+
+    # 超出预算时从最旧的文件开始删除（保留最新的一个）；本进程已有线程在淘汰时跳过
+    def evict(self):
+        if not self.evict_lock.acquire(blocking=False):
+            return
+        try:
+            files = self.scan()
+            total_bytes = sum(size for _, _, size in files)
+            for _, path, size in files[:-1]:
+                if total_bytes <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total_bytes -= size
+        finally:
+            self.evict_lock.release()
+
+
+render_cache = DiskLRUCache(settings.RENDER_CACHE_DIR, settings.RENDER_CACHE_MAX_BYTES)
+
+# 进行中的渲染：同一版本的并发请求共享一次渲染
+_inflight_renders = {}
+
+
+# 根据 fmt 参数和 Accept 请求头确定输出格式
+def negotiate_render_format(fmt: str = None, accept: str = "") -> str:
+    if fmt and fmt != "auto":
+        if fmt not in RENDER_MEDIA_TYPES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="不支持的输出格式"
+            )
+        return fmt
+
+    return "webp" if "image/webp" in (accept or "") else "jpeg"
+
+
+# 选择渲染源：能覆盖目标输出尺寸的最小预生成版本，没有则用原图
+def select_render_source(image: Image, width: int, height: int, fit: str) -> str:
+    if image.width and image.height:
+        ratios = [r for r in (width / image.width, height / image.height) if r]
+        scale = min(1, max(ratios) if fit == "cover" else min(ratios))
+        need_width, need_height = int(image.width * scale), int(image.height * scale)
+    else:
+        need_width, need_height = width, height
+
+    candidates = [
+        rendition for rendition in image.renditions or []
+        if rendition["width"] >= need_width and rendition["height"] >= need_height
+    ]
+    if candidates:
+        return min(candidates, key=lambda r: r["width"] * r["height"])["path"].lstrip('/')
+
+    # RAW原图无法直接解码，退回最大的预生成版本（来自内嵌预览）
+    if image.file_type == "image/raw" and image.renditions:
+        return max(image.renditions, key=lambda r: r["width"] * r["height"])["path"].lstrip('/')
+
+    return image.file_path.lstrip('/')
+
+
+# 远端存储：下载渲染源到临时文件后渲染（在线程中执行，渲染仍在进程池中进行）
+def render_from_storage(source_key: str, output_path: str, width: int, height: int, fit: str, fmt: str):
+    with get_storage().local_copy(source_key) as source_path:
+        get_process_pool().submit(
+            render_image_variant, source_path, output_path, width, height, fit, fmt
+        ).result()
+
+
+# 渲染（或从缓存获取）指定尺寸的版本，返回缓存文件路径（渲染缓存始终在本地磁盘）
+async def render_image(
+        image: Image,
+        width: int = 0,
+        height: int = 0,
+        fit: str = "contain",
+        fmt: str = "jpeg"
+) -> str:
+    if width < 0 or height < 0 or (not width and not height):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="请指定有效的宽度或高度"
+        )
+    if fit not in RENDER_FITS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="不支持的裁剪方式"
+        )
+    width = min(width, MAX_RENDER_SIZE)
+    height = min(height, MAX_RENDER_SIZE)
+
+    key = hashlib.sha256(
+        f"{image.file_hash or image.file_path}:{width}:{height}:{fit}:{fmt}".encode()
+    ).hexdigest()
+    output_path = get_blob_path(render_cache.root, key, f".{RENDITION_EXTENSIONS[fmt]}")
+
+    loop = asyncio.get_running_loop()
+    if await loop.run_in_executor(None, render_cache.get, output_path):
+        return output_path
+
+    future = _inflight_renders.get(key)
+    if future is None:
+        storage = get_storage()
+        source_key = storage_key(select_render_source(image, width, height, fit))
+        source_path = storage.local_path(source_key)
+        if not await loop.run_in_executor(None, storage.exists, source_key):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="图片文件不存在"
+            )
+
+        if source_path is None:
+            future = asyncio.ensure_future(loop.run_in_executor(
+                None, render_from_storage, source_key, output_path, width, height, fit, fmt
+            ))
+        else:
+            future = asyncio.ensure_future(loop.run_in_executor(
+                get_process_pool(),
+                render_image_variant,
+                source_path,
+                output_path,
+                width,
+                height,
+                fit,
+                fmt
+            ))
+        _inflight_renders[key] = future
+        future.add_done_callback(lambda _: _inflight_renders.pop(key, None))
+
+    await asyncio.shield(future)
+    await loop.run_in_executor(None, render_cache.add, output_path)
+
+    return output_path
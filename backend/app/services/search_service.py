@@ -1,14 +1,25 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, func, String
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import or_, and_, func, select, String
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException, status
 from ..models.album import Album
 from ..models.image import Image
+from ..models.blob import Blob
 from ..models.blog import BlogPost
+from ..core.counting import CountMode, fetch_page
+from ..services.image_service import get_image_detail
+from ..services.similarity_service import feature_index
 from ..utils.security_utils import AlbumPermission
 
+# 相似搜索时多取的候选倍数（部分候选会被权限过滤掉）
+SIMILAR_OVERFETCH = 4
+MAX_SIMILAR_LIMIT = 100
+
 
 # 全文搜索
-def full_text_search(
-        db: Session,
+async def full_text_search(
+        db: AsyncSession,
         keyword: str,
         type: str = None,
         user_id: str = None,
@@ -24,7 +35,7 @@ def full_text_search(
 
     # 搜索图片集
     if type is None or type == "album":
-        album_query = db.query(Album).filter(
+        album_query = select(Album).where(
             Album.is_deleted == False,
             or_(
                 Album.name.ilike(f"%{keyword}%"),
@@ -34,16 +45,16 @@ def full_text_search(
 
         # 权限过滤
         if not user_id:
-            album_query = album_query.filter(Album.permission == AlbumPermission.PUBLIC)
+            album_query = album_query.where(Album.permission == AlbumPermission.PUBLIC)
         else:
-            album_query = album_query.filter(
+            album_query = album_query.where(
                 or_(
                     Album.user_id == user_id,
                     Album.permission == AlbumPermission.PUBLIC
                 )
             )
 
-        albums = album_query.all()
+        albums = (await db.scalars(album_query)).all()
         for album in albums:
             results.append({
                 "type": "album",
@@ -57,7 +68,7 @@ def full_text_search(
 
     # 搜索图片
     if type is None or type == "image":
-        image_query = db.query(Image).join(Album).filter(
+        image_query = select(Image).join(Album).where(
             Image.is_deleted == False,
             Album.is_deleted == False,
             or_(
@@ -68,16 +79,16 @@ def full_text_search(
 
         # 权限过滤
         if not user_id:
-            image_query = image_query.filter(Album.permission == AlbumPermission.PUBLIC)
+            image_query = image_query.where(Album.permission == AlbumPermission.PUBLIC)
         else:
-            image_query = image_query.filter(
+            image_query = image_query.where(
                 or_(
                     Album.user_id == user_id,
                     Album.permission == AlbumPermission.PUBLIC
                 )
             )
 
-        images = image_query.all()
+        images = (await db.scalars(image_query)).all()
         for image in images:
             results.append({
                 "type": "image",
@@ -93,7 +104,7 @@ def full_text_search(
 
     # 搜索博客
     if type is None or type == "blog":
-        blog_query = db.query(BlogPost).filter(
+        blog_query = select(BlogPost).where(
             BlogPost.is_draft == False,
             or_(
                 BlogPost.title.ilike(f"%{keyword}%"),
@@ -103,16 +114,16 @@ def full_text_search(
 
         # 权限过滤
         if not user_id:
-            blog_query = blog_query.filter(BlogPost.is_private == False)
+            blog_query = blog_query.where(BlogPost.is_private == False)
         else:
-            blog_query = blog_query.filter(
+            blog_query = blog_query.where(
                 or_(
                     BlogPost.user_id == user_id,
                     BlogPost.is_private == False
                 )
             )
 
-        blogs = blog_query.all()
+        blogs = (await db.scalars(blog_query)).all()
         for blog in blogs:
             results.append({
                 "type": "blog",
@@ -136,8 +147,8 @@ def full_text_search(
 
 
 # 高级搜索
-def advanced_search(
-        db: Session,
+async def advanced_search(
+        db: AsyncSession,
         keyword: str = None,
         type: str = None,
         start_time: str = None,
@@ -150,18 +161,21 @@ def advanced_search(
         page: int = 1,
         page_size: int = 10,
         sort: str = "created_at",
-        order: str = "desc"
+        order: str = "desc",
+        count_mode: str = CountMode.AUTO
 ) -> tuple:
     results = []
     total = 0
+    # 混合搜索的总数只取本页结果数，各类型不必计数
+    section_mode = count_mode if type else CountMode.HAS_MORE
 
     # 搜索图片集
     if type is None or type == "album":
-        album_query = db.query(Album).filter(Album.is_deleted == False)
+        album_query = select(Album).where(Album.is_deleted == False)
 
         # 关键词过滤
         if keyword:
-            album_query = album_query.filter(
+            album_query = album_query.where(
                 or_(
                     Album.name.ilike(f"%{keyword}%"),
                     Album.description.ilike(f"%{keyword}%")
@@ -170,19 +184,19 @@ def advanced_search(
 
         # 时间过滤
         if start_time:
-            album_query = album_query.filter(Album.created_at >= start_time)
+            album_query = album_query.where(Album.created_at >= start_time)
         if end_time:
-            album_query = album_query.filter(Album.created_at <= end_time)
+            album_query = album_query.where(Album.created_at <= end_time)
 
         # 权限过滤
         if permission:
-            album_query = album_query.filter(Album.permission == permission)
+            album_query = album_query.where(Album.permission == permission)
 
         # 用户权限过滤
         if not user_id:
-            album_query = album_query.filter(Album.permission == AlbumPermission.PUBLIC)
+            album_query = album_query.where(Album.permission == AlbumPermission.PUBLIC)
         else:
-            album_query = album_query.filter(
+            album_query = album_query.where(
                 or_(
                     Album.user_id == user_id,
                     Album.permission == AlbumPermission.PUBLIC
@@ -196,11 +210,8 @@ def advanced_search(
             else:
                 album_query = album_query.order_by(Album.created_at.asc())
 
-        # 总数
-        album_total = album_query.count()
-
-        # 分页
-        albums = album_query.offset((page - 1) * page_size).limit(page_size).all()
+        # 分页及总数
+        albums, album_total = await fetch_page(db, album_query, page, page_size, section_mode)
 
         for album in albums:
             results.append({
@@ -218,14 +229,14 @@ def advanced_search(
 
     # 搜索图片
     if type is None or type == "image":
-        image_query = db.query(Image).join(Album).filter(
+        image_query = select(Image).join(Album).where(
             Image.is_deleted == False,
             Album.is_deleted == False
         )
 
         # 关键词过滤
         if keyword:
-            image_query = image_query.filter(
+            image_query = image_query.where(
                 or_(
                     Image.filename.ilike(f"%{keyword}%"),
                     func.cast(Image.exif_data["camera_model"], String).ilike(f"%{keyword}%")
@@ -234,29 +245,29 @@ def advanced_search(
 
         # 时间过滤
         if start_time:
-            image_query = image_query.filter(Image.created_at >= start_time)
+            image_query = image_query.where(Image.created_at >= start_time)
         if end_time:
-            image_query = image_query.filter(Image.created_at <= end_time)
+            image_query = image_query.where(Image.created_at <= end_time)
 
         # 权限过滤
         if permission:
-            image_query = image_query.filter(Album.permission == permission)
+            image_query = image_query.where(Album.permission == permission)
 
         # 文件类型过滤
         if file_type and len(file_type) > 0:
-            image_query = image_query.filter(Image.file_type.in_(file_type))
+            image_query = image_query.where(Image.file_type.in_(file_type))
 
         # 相机型号过滤
         if exif_camera:
-            image_query = image_query.filter(
+            image_query = image_query.where(
                 func.cast(Image.exif_data["camera_model"], String).ilike(f"%{exif_camera}%")
             )
 
         # 用户权限过滤
         if not user_id:
-            image_query = image_query.filter(Album.permission == AlbumPermission.PUBLIC)
+            image_query = image_query.where(Album.permission == AlbumPermission.PUBLIC)
         else:
-            image_query = image_query.filter(
+            image_query = image_query.where(
                 or_(
                     Album.user_id == user_id,
                     Album.permission == AlbumPermission.PUBLIC
@@ -270,11 +281,8 @@ def advanced_search(
             else:
                 image_query = image_query.order_by(Image.created_at.asc())
 
-        # 总数
-        image_total = image_query.count()
-
-        # 分页
-        images = image_query.offset((page - 1) * page_size).limit(page_size).all()
+        # 分页及总数
+        images, image_total = await fetch_page(db, image_query, page, page_size, section_mode)
 
         for image in images:
             results.append({
@@ -294,11 +302,11 @@ def advanced_search(
 
     # 搜索博客
     if type is None or type == "blog":
-        blog_query = db.query(BlogPost).filter(BlogPost.is_draft == False)
+        blog_query = select(BlogPost).where(BlogPost.is_draft == False)
 
         # 关键词过滤
         if keyword:
-            blog_query = blog_query.filter(
+            blog_query = blog_query.where(
                 or_(
                     BlogPost.title.ilike(f"%{keyword}%"),
                     BlogPost.content.ilike(f"%{keyword}%")
@@ -307,20 +315,20 @@ def advanced_search(
 
         # 时间过滤
         if start_time:
-            blog_query = blog_query.filter(BlogPost.created_at >= start_time)
+            blog_query = blog_query.where(BlogPost.created_at >= start_time)
         if end_time:
-            blog_query = blog_query.filter(BlogPost.created_at <= end_time)
+            blog_query = blog_query.where(BlogPost.created_at <= end_time)
 
         # 标签过滤
         if tags and len(tags) > 0:
             for tag in tags:
-                blog_query = blog_query.filter(BlogPost.tags.any(tag))
+                blog_query = blog_query.where(BlogPost.tags.any(tag))
 
         # 权限过滤
         if not user_id:
-            blog_query = blog_query.filter(BlogPost.is_private == False)
+            blog_query = blog_query.where(BlogPost.is_private == False)
         else:
-            blog_query = blog_query.filter(
+            blog_query = blog_query.where(
                 or_(
                     BlogPost.user_id == user_id,
                     BlogPost.is_private == False
@@ -339,11 +347,8 @@ def advanced_search(
             else:
                 blog_query = blog_query.order_by(BlogPost.view_count.asc())
 
-        # 总数
-        blog_total = blog_query.count()
-
-        # 分页
-        blogs = blog_query.offset((page - 1) * page_size).limit(page_size).all()
+        # 分页及总数
+        blogs, blog_total = await fetch_page(db, blog_query, page, page_size, section_mode)
 
         for blog in blogs:
             results.append({
@@ -363,4 +368,72 @@ def advanced_search(
     if type is None:
         total = len(results)
 
-    return results, total
\ No newline at end of file
+    return results, total
+
+
+# 相似图片搜索（以图搜图）：按视觉特征向量余弦相似度取 top-k，权限过滤同全文搜索
+async def similarity_search(
+        db: AsyncSession,
+        image_id: str,
+        user_id: str = None,
+        limit: int = 20
+) -> list:
+    if limit <= 0 or limit > MAX_SIMILAR_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"数量需在 1-{MAX_SIMILAR_LIMIT} 之间"
+        )
+
+    image = await get_image_detail(db, image_id, user_id)
+    features = await db.scalar(select(Blob.features).where(Blob.hash == image.file_hash))
+    if features is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="图片尚未完成处理，暂无法搜索相似图片"
+        )
+
+    await feature_index.refresh(db)
+    candidates = dict(await run_in_threadpool(
+        feature_index.search,
+        np.frombuffer(features, dtype=np.float32),
+        (limit + 1) * SIMILAR_OVERFETCH
+    ))
+
+    image_query = select(Image).join(Album).where(
+        Image.file_hash.in_(list(candidates)),
+        Image.id != image.id,
+        Image.is_deleted == False,
+        Album.is_deleted == False
+    )
+
+    # 权限过滤
+    if not user_id:
+        image_query = image_query.where(Album.permission == AlbumPermission.PUBLIC)
+    else:
+        image_query = image_query.where(
+            or_(
+                Album.user_id == user_id,
+                Album.permission == AlbumPermission.PUBLIC
+            )
+        )
+
+    images = sorted(
+        (await db.scalars(image_query)).all(), key=lambda item: candidates[item.file_hash], reverse=True
+    )
+
+    results = []
+    for item in images[:limit]:
+        results.append({
+            "type": "image",
+            "id": item.id,
+            "filename": item.filename,
+            "file_type": item.file_type,
+            "file_size": item.file_size,
+            "album_id": item.album_id,
+            "album_name": item.album.name,
+            "thumbnail_path": item.thumbnail_path,
+            "score": round(candidates[item.file_hash], 4),
+            "created_at": item.created_at
+        })
+
+    return results
@@ -0,0 +1,186 @@
+import os
+import json
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.config import settings
+from ..models.blob import Blob
+from ..utils.file_utils import FEATURE_DIM, ensure_dir
+
+# 分块计算相似度的行数（控制临时内存，每块约 FEATURE_DIM * 4 * 行数 字节）
+SCORE_BLOCK_ROWS = 256 * 1024
+
+META_FILENAME = "meta.json"
+# 增量矩阵的初始行数，写满后容量翻倍
+DELTA_INITIAL_ROWS = 1024
+# 刷新时每批读取的行数
+REFRESH_BATCH_ROWS = 10000
+
+
+# 特征索引：磁盘上的特征矩阵快照（内存映射，多个worker共享页缓存）+ 快照之后新增的增量
+# 快照由 build_feature_index 定期重建；增量按 Blob.updated_at 从数据库加载
+# 锁只保护内存中的数据，锁内不做数据库/文件IO；并入增量与相似度计算都在线程池中执行，不占用事件循环
+class FeatureIndex:
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self.vectors = np.zeros((0, FEATURE_DIM), dtype=np.float32)
+        self.hashes = np.zeros(0, dtype="S64")
+        self.meta_mtime = None
+        self.reset_delta()
+        self.loaded_until = None
+        self.lock = threading.Lock()
+
+    # 增量预分配为矩阵，前 delta_count 行有效；查询直接取切片视图，不再每次拼接
+    def reset_delta(self):
+        self.delta_vectors = np.zeros((DELTA_INITIAL_ROWS, FEATURE_DIM), dtype=np.float32)
+        self.delta_hashes = np.zeros(DELTA_INITIAL_ROWS, dtype="S64")
+        self.delta_count = 0
+        self.delta_rows = {}
+
+    # 追加（或更新）一行增量；容量不足时换成翻倍的新矩阵，正在查询的旧视图不受影响
+    def add_delta(self, file_hash: str, vector: np.ndarray):
+        row = self.delta_rows.get(file_hash)
+        if row is None:
+            if self.delta_count == len(self.delta_vectors):
+                capacity = max(DELTA_INITIAL_ROWS, len(self.delta_vectors) * 2)
+                vectors = np.zeros((capacity, FEATURE_DIM), dtype=np.float32)
+                hashes = np.zeros(capacity, dtype="S64")
+                vectors[:self.delta_count] = self.delta_vectors[:self.delta_count]
+                hashes[:self.delta_count] = self.delta_hashes[:self.delta_count]
+                self.delta_vectors, self.delta_hashes = vectors, hashes
+            row = self.delta_count
+            self.delta_hashes[row] = file_hash.encode()
+            self.delta_rows[file_hash] = row
+            self.delta_count += 1
+        self.delta_vectors[row] = vector
+
+    # 快照有更新时重新映射（旧增量随之丢弃，由快照覆盖）；在锁外读取文件，锁内只切换引用
+    def reload_snapshot(self):
+        meta_path = os.path.join(self.index_dir, META_FILENAME)
+        try:
+            meta_mtime = os.path.getmtime(meta_path)
+        except FileNotFoundError:
+            return
+        if meta_mtime == self.meta_mtime:
+            return
+
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        vectors = np.load(os.path.join(self.index_dir, meta["vectors"]), mmap_mode="r")
+        hashes = np.load(os.path.join(self.index_dir, meta["hashes"]), mmap_mode="r")
+
+        with self.lock:
+            self.vectors, self.hashes = vectors, hashes
+            self.meta_mtime = meta_mtime
+            self.reset_delta()
+            self.loaded_until = datetime.fromisoformat(meta["built_until"])
+
+    # 增量查询：已加载位置之后有特征向量的blob
+    # 从已加载位置往前回看一段（INDEX_REFRESH_OVERLAP_SECONDS），补上晚提交的行；重复读到的行覆盖原增量行
+    def delta_query(self):
+        query = select(Blob.hash, Blob.features, Blob.updated_at).where(Blob.features.isnot(None))
+        if self.loaded_until:
+            since = self.loaded_until - timedelta(seconds=settings.INDEX_REFRESH_OVERLAP_SECONDS)
+            query = query.where(Blob.updated_at >= since)
+        return query.execution_options(yield_per=REFRESH_BATCH_ROWS)
+
+    # 并入一批增量行 [(哈希, 特征, 更新时间), ...]（纯内存操作）
+    def apply(self, rows):
+        with self.lock:
+            for file_hash, features, updated_at in rows:
+                self.add_delta(file_hash, np.frombuffer(features, dtype=np.float32))
+                if self.loaded_until is None or updated_at > self.loaded_until:
+                    self.loaded_until = updated_at
+
+    # 刷新：在锁外异步分批读取增量，每批交给线程池并入
+    async def refresh(self, db: AsyncSession):
+        await run_in_threadpool(self.reload_snapshot)
+        result = await db.stream(self.delta_query())
+        async for rows in result.partitions():
+            await run_in_threadpool(self.apply, rows)
+
+    # 余弦相似度 top-k（向量均已L2归一化，点积即余弦），返回 [(blob哈希, 相似度), ...]
+    # 计算量与库大小成正比，请求中应在线程池中调用
+    def search(self, query: np.ndarray, k: int) -> list:
+        with self.lock:
+            matrices = [
+                (self.vectors, self.hashes),
+                (self.delta_vectors[:self.delta_count], self.delta_hashes[:self.delta_count])
+            ]
+
+        candidates = []
+        for vectors, hashes in matrices:
+            for start in range(0, len(vectors), SCORE_BLOCK_ROWS):
+                scores = vectors[start:start + SCORE_BLOCK_ROWS] @ query
+                top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+                candidates.extend((float(scores[i]), hashes[start + i].decode()) for i in top)
+
+        results = {}
+        for score, file_hash in sorted(candidates, reverse=True):
+            if file_hash and file_hash not in results:
+                results[file_hash] = score
+                if len(results) == k:
+                    break
+
+        return list(results.items())
+
+
+feature_index = FeatureIndex(settings.FEATURE_INDEX_DIR)
+
+
+# 重建特征矩阵快照：流式写入内存映射文件，写完后切换 meta.json 指向新文件
+# 文件名带版本号，已映射旧文件的进程不受影响，下次刷新时切换到新快照
+def build_feature_index(db: Session, index_dir: str = settings.FEATURE_INDEX_DIR) -> int:
+    ensure_dir(index_dir)
+    built_until = datetime.now()
+    version = built_until.strftime("%Y%m%d%H%M%S%f")
+
+    count = db.query(func.count(Blob.hash)).filter(Blob.features.isnot(None)).scalar() or 0
+    vectors_name, hashes_name = f"vectors-{version}.npy", f"hashes-{version}.npy"
+    vectors = np.lib.format.open_memmap(
+        os.path.join(index_dir, vectors_name), mode="w+", dtype=np.float32, shape=(count, FEATURE_DIM)
+    )
+    hashes = np.lib.format.open_memmap(
+        os.path.join(index_dir, hashes_name), mode="w+", dtype="S64", shape=(count,)
+    )
+
+    rows = db.query(Blob.hash, Blob.features).filter(
+        Blob.features.isnot(None)
+    ).order_by(Blob.hash).limit(count).yield_per(10000)
+    written = 0
+    for file_hash, features in rows:
+        vectors[written] = np.frombuffer(features, dtype=np.float32)
+        hashes[written] = file_hash.encode()
+        written += 1
+    vectors.flush()
+    hashes.flush()
+    del vectors, hashes
+
+    meta_path = os.path.join(index_dir, META_FILENAME)
+    old_files = []
+    if os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            old_meta = json.load(f)
+        old_files = [old_meta["vectors"], old_meta["hashes"]]
+
+    tmp_path = f"{meta_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "vectors": vectors_name,
+            "hashes": hashes_name,
+            "count": written,
+            "built_until": built_until.isoformat()
+        }, f)
+    os.replace(tmp_path, meta_path)
+
+    for name in old_files:
+        try:
+            os.remove(os.path.join(index_dir, name))
+        except FileNotFoundError:
+            pass
+
+    return written
@@ -0,0 +1,311 @@
+import os
+import re
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from ..core.config import settings
+from ..core.db import AsyncSessionLocal
+from ..models.image import Image
+from ..models.upload_session import UploadSession
+from ..services.image_service import STAGING_DIR, validate_upload, store_staged_image
+from ..utils.file_utils import (
+    UPLOAD_CHUNK_SIZE, allocate_file, write_file_range, hash_file
+)
+
+# 会话文件目录（位于暂存区内，完成后可直接原子移动到正式存储）
+SESSION_DIR = os.path.join(STAGING_DIR, "sessions")
+
+# 会话有效期
+SESSION_EXPIRE_HOURS = 24
+
+logger = logging.getLogger(__name__)
+
+CONTENT_RANGE_PATTERN = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+
+
+# 会话文件路径
+def get_session_file_path(session_id: str) -> str:
+    return os.path.join(SESSION_DIR, f"{session_id}.part")
+
+
+# 合并字节区间（半开区间，相邻或重叠的区间合并为一个）
+def merge_byte_ranges(ranges: list) -> list:
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+# 计算缺失的字节区间
+def get_missing_ranges(ranges: list, total_size: int) -> list:
+    missing = []
+    cursor = 0
+    for start, end in ranges:
+        if start > cursor:
+            missing.append([cursor, start])
+        cursor = max(cursor, end)
+    if cursor < total_size:
+        missing.append([cursor, total_size])
+    return missing
+
+
+# 解析 Content-Range 请求头，返回半开区间 (start, end)
+def parse_content_range(content_range: str, total_size: int) -> tuple:
+    match = CONTENT_RANGE_PATTERN.match((content_range or "").strip())
+    if not match:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Content-Range 格式错误，应为 bytes start-end/total"
+        )
+
+    start, last = int(match.group(1)), int(match.group(2))
+    total = match.group(3)
+    if start > last or last >= total_size or (total != "*" and int(total) != total_size):
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="字节区间超出文件范围"
+        )
+
+    return start, last + 1
+
+
+# 会话状态（附带缺失区间，客户端重试时只需补传这些区间）
+def format_upload_session(session: UploadSession) -> dict:
+    data = session.to_dict()
+    data["missing_ranges"] = get_missing_ranges(session.received_ranges or [], session.total_size)
+    data["chunk_size"] = UPLOAD_CHUNK_SIZE
+    return data
+
+
+# 创建上传会话
+async def create_upload_session(
+        db: AsyncSession,
+        album_id: str,
+        user_id: str,
+        filename: str,
+        total_size: int,
+        content_type: str = ""
+) -> UploadSession:
+    if total_size is None or total_size <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="文件大小无效"
+        )
+
+    await validate_upload(db, filename, total_size, album_id, user_id)
+
+    session = UploadSession(
+        id=str(uuid.uuid4()),
+        filename=filename,
+        content_type=content_type or "",
+        total_size=total_size,
+        received_ranges=[],
+        received_bytes=0,
+        status="uploading",
+        album_id=album_id,
+        user_id=user_id,
+        expires_at=datetime.now() + timedelta(hours=SESSION_EXPIRE_HOURS)
+    )
+
+    await run_in_threadpool(allocate_file, get_session_file_path(session.id), total_size)
+
+    db.add(session)
+    await db.commit()
+    await db.refresh(session)
+
+    return session
+
+
+# 获取上传会话
+async def get_upload_session(
+        db: AsyncSession,
+        session_id: str,
+        user_id: str,
+        for_update: bool = False
+) -> UploadSession:
+    query = select(UploadSession).where(UploadSession.id == session_id)
+    if for_update:
+        # 行锁：多个worker并发写同一会话时串行化区间合并（重新读取最新的已接收区间）
+        query = query.with_for_update().execution_options(populate_existing=True)
+    session = await db.scalar(query)
+
+    if not session or session.expires_at < datetime.now():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="上传会话不存在或已过期"
+        )
+
+    if session.user_id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="无权限访问该上传会话"
+        )
+
+    return session
+
+
+# 写入一个字节区间（区间可按任意顺序、由任意worker上传）
+async def write_upload_range(
+        db: AsyncSession,
+        session_id: str,
+        user_id: str,
+        content_range: str,
+        stream
+) -> UploadSession:
+    session = await get_upload_session(db, session_id, user_id)
+    if session.status != "uploading":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="上传会话已完成"
+        )
+
+    start, end = parse_content_range(content_range, session.total_size)
+    file_path = get_session_file_path(session.id)
+
+    # 攒满一个分块再写盘，写盘在线程池中执行
+    offset = start
+    buffer = bytearray()
+    async for chunk in stream:
+        if offset + len(buffer) + len(chunk) > end:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="请求体长度超过 Content-Range 声明的区间"
+            )
+        buffer.extend(chunk)
+        if len(buffer) >= UPLOAD_CHUNK_SIZE:
+            await run_in_threadpool(write_file_range, file_path, offset, bytes(buffer))
+            offset += len(buffer)
+            buffer.clear()
+    if buffer:
+        await run_in_threadpool(write_file_range, file_path, offset, bytes(buffer))
+        offset += len(buffer)
+
+    if offset != end:
+        # 区间不完整（连接中断等），不记录，客户端重传该区间即可
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="请求体长度与 Content-Range 不一致"
+        )
+
+    # 区间写入完成后再登记
+    session = await get_upload_session(db, session_id, user_id, for_update=True)
+    ranges = merge_byte_ranges((session.received_ranges or []) + [[start, end]])
+    session.received_ranges = ranges
+    session.received_bytes = sum(e - s for s, e in ranges)
+    await db.commit()
+    await db.refresh(session)
+
+    return session
+
+
+# 完成上传，进入常规图片入库流程
+async def complete_upload_session(
+        db: AsyncSession,
+        session_id: str,
+        user_id: str
+) -> Image:
+    session = await get_upload_session(db, session_id, user_id, for_update=True)
+
+    if session.status == "completed":
+        # 幂等：重复提交直接返回已生成的图片
+        image = await db.scalar(select(Image).where(Image.id == session.image_id))
+        if image:
+            return image
+
+    if session.status != "uploading":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="上传会话正在处理中"
+        )
+
+    missing = get_missing_ranges(session.received_ranges or [], session.total_size)
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "文件尚未上传完整", "missing_ranges": missing}
+        )
+
+    # 重新校验权限（会话创建后图片集可能已变更）
+    await validate_upload(db, session.filename, session.total_size, session.album_id, user_id)
+
+    # 标记为处理中后释放行锁，防止并发重复提交
+    session.status = "completing"
+    await db.commit()
+
+    try:
+        file_path = get_session_file_path(session.id)
+        file_size, file_hash = await run_in_threadpool(hash_file, file_path)
+
+        image = await store_staged_image(
+            db,
+            staging_path=file_path,
+            file_size=file_size,
+            file_hash=file_hash,
+            filename=session.filename,
+            content_type=session.content_type,
+            album_id=session.album_id,
+            user_id=user_id
+        )
+    except Exception:
+        await db.rollback()
+        session.status = "uploading"
+        await db.commit()
+        raise
+
+    session.status = "completed"
+    session.image_id = image.id
+    await db.commit()
+
+    return image
+
+
+# 取消上传会话
+async def abort_upload_session(db: AsyncSession, session_id: str, user_id: str) -> bool:
+    session = await get_upload_session(db, session_id, user_id)
+
+    file_path = get_session_file_path(session.id)
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+    await db.delete(session)
+    await db.commit()
+
+    return True
+
+
+# 清理过期会话及其临时文件
+async def purge_expired_upload_sessions(db: AsyncSession) -> int:
+    sessions = (await db.scalars(select(UploadSession).where(
+        UploadSession.expires_at < datetime.now()
+    ))).all()
+
+    for session in sessions:
+        file_path = get_session_file_path(session.id)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        await db.delete(session)
+
+    await db.commit()
+
+    return len(sessions)
+
+
+# 后台定期清理过期会话，单次失败只记录日志，下个周期重试
+async def purge_expired_upload_sessions_periodically():
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                purged = await purge_expired_upload_sessions(db)
+            if purged:
+                logger.info(f"清理 {purged} 个过期上传会话")
+        except Exception as e:
+            logger.error(f"清理过期上传会话失败: {e}")
+        await asyncio.sleep(settings.UPLOAD_SESSION_PURGE_INTERVAL)
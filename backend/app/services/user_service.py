@@ -1,5 +1,7 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
+from ..core.counting import CountMode, fetch_page
 from ..models.user import User
 from ..utils.security_utils import (
     validate_username,
@@ -8,8 +10,8 @@ from ..utils.security_utils import (
 
 
 # 创建用户
-def create_user(
-        db: Session,
+async def create_user(
+        db: AsyncSession,
         username: str,
         email: str,
         password: str
@@ -36,14 +38,14 @@ def create_user(
         )
 
     # 检查用户名是否已存在
-    if db.query(User).filter(User.username == username).first():
+    if await db.scalar(select(User.id).where(User.username == username)):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="用户名已存在"
         )
 
     # 检查邮箱是否已存在
-    if db.query(User).filter(User.email == email).first():
+    if await db.scalar(select(User.id).where(User.email == email)):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="邮箱已存在"
@@ -58,15 +60,15 @@ def create_user(
     )
 
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
 
     return user
 
 
 # 获取用户信息
-def get_user_by_id(db: Session, user_id: str) -> User:
-    user = db.query(User).filter(User.id == user_id).first()
+async def get_user_by_id(db: AsyncSession, user_id: str) -> User:
+    user = await db.scalar(select(User).where(User.id == user_id))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -76,24 +78,24 @@ def get_user_by_id(db: Session, user_id: str) -> User:
 
 
 # 获取用户信息（用户名/邮箱）
-def get_user_by_credentials(db: Session, username: str) -> User:
-    user = db.query(User).filter(
+async def get_user_by_credentials(db: AsyncSession, username: str) -> User:
+    user = await db.scalar(select(User).where(
         (User.username == username) | (User.email == username)
-    ).first()
+    ).limit(1))
     return user
 
 
 # 更新用户信息
-def update_user_profile(
-        db: Session,
+async def update_user_profile(
+        db: AsyncSession,
         user_id: str,
         username: str = None,
         profile: str = None
 ) -> User:
-    user = get_user_by_id(db, user_id)
+    user = await get_user_by_id(db, user_id)
 
     if username and username != user.username:
-        if db.query(User).filter(User.username == username).first():
+        if await db.scalar(select(User.id).where(User.username == username)):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="用户名已存在"
@@ -103,73 +105,71 @@ def update_user_profile(
     if profile is not None:
         user.profile = profile
 
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
 
     return user
 
 
 # 更新用户头像
-def update_user_avatar(db: Session, user_id: str, avatar_url: str) -> User:
-    user = get_user_by_id(db, user_id)
+async def update_user_avatar(db: AsyncSession, user_id: str, avatar_url: str) -> User:
+    user = await get_user_by_id(db, user_id)
     user.avatar_url = avatar_url
 
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
 
     return user
 
 
 # 管理员获取所有用户
-def get_all_users(
-        db: Session,
+async def get_all_users(
+        db: AsyncSession,
         page: int = 1,
         page_size: int = 10,
         keyword: str = None,
         role: str = None,
-        is_active: bool = None
+        is_active: bool = None,
+        count_mode: str = CountMode.AUTO
 ) -> tuple:
-    query = db.query(User)
+    query = select(User)
 
     # 筛选条件
     if keyword:
-        query = query.filter(
+        query = query.where(
             (User.username.ilike(f"%{keyword}%")) |
             (User.email.ilike(f"%{keyword}%"))
         )
 
     if role:
-        query = query.filter(User.role == role)
+        query = query.where(User.role == role)
 
     if is_active is not None:
-        query = query.filter(User.is_active == is_active)
+        query = query.where(User.is_active == is_active)
 
-    # 总数
-    total = query.count()
-
-    # 分页
-    users = query.offset((page - 1) * page_size).limit(page_size).all()
+    # 分页（总数按 count_mode 统计，无筛选条件时大表用估算值）
+    users, total = await fetch_page(db, query, page, page_size, count_mode)
 
     return users, total
 
 
 # 管理员更新用户角色
-def update_user_role(db: Session, user_id: str, role: str) -> User:
-    user = get_user_by_id(db, user_id)
+async def update_user_role(db: AsyncSession, user_id: str, role: str) -> User:
+    user = await get_user_by_id(db, user_id)
     user.role = role
 
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
 
     return user
 
 
 # 管理员禁用/启用用户
-def toggle_user_active(db: Session, user_id: str, is_active: bool) -> User:
-    user = get_user_by_id(db, user_id)
+async def toggle_user_active(db: AsyncSession, user_id: str, is_active: bool) -> User:
+    user = await get_user_by_id(db, user_id)
     user.is_active = is_active
 
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
 
     return user
\ No newline at end of file
@@ -0,0 +1,222 @@
+import os
+import uuid
+import asyncio
+import logging
+import zipfile
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException, status, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from ..core.config import settings
+from ..core.db import AsyncSessionLocal
+from ..models.zip_import import ZipImport
+from ..services.image_service import (
+    STAGING_DIR, check_album_upload_permission, store_staged_images
+)
+from ..utils.file_utils import (
+    generate_unique_filename, get_file_mime_type, get_file_size_limit,
+    save_upload_stream, list_zip_image_members, FileSizeExceededError
+)
+
+logger = logging.getLogger(__name__)
+
+# ZIP压缩包暂存目录
+ZIP_STAGING_DIR = os.path.join(STAGING_DIR, "zip")
+
+# 并行解压的成员数（每路各自打开一个 ZipFile 句柄）
+ZIP_IMPORT_CONCURRENCY = 4
+# 每攒够多少张图片入库一次（同时刷新进度）
+ZIP_IMPORT_BATCH_SIZE = 20
+# 最多记录的失败明细条数
+ZIP_IMPORT_MAX_ERRORS = 50
+
+# 持有后台任务引用，避免任务被提前回收
+_running_imports = set()
+
+
+# 将单个成员直接解压写入暂存区（边解压边计算哈希，不经过中间解压目录）
+def stage_zip_member(zip_ref: zipfile.ZipFile, file_info: zipfile.ZipInfo) -> dict:
+    filename = os.path.basename(file_info.filename)
+    staging_path = os.path.join(STAGING_DIR, generate_unique_filename(filename))
+
+    with zip_ref.open(file_info) as src:
+        file_size, file_hash = save_upload_stream(src, staging_path, get_file_size_limit(filename))
+
+    return {
+        "filename": filename,
+        "content_type": get_file_mime_type(filename),
+        "staging_path": staging_path,
+        "file_size": file_size,
+        "file_hash": file_hash
+    }
+
+
+# 上传ZIP并启动导入任务（压缩包只落盘一次，成员在后台流式入库）
+async def start_zip_import(
+        db: AsyncSession,
+        file: UploadFile,
+        album_id: str,
+        user_id: str
+) -> ZipImport:
+    if not file.filename or not file.filename.lower().endswith(".zip"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="请上传ZIP格式的压缩包"
+        )
+
+    await check_album_upload_permission(db, album_id, user_id)
+
+    archive_path = os.path.join(ZIP_STAGING_DIR, generate_unique_filename(file.filename))
+    await run_in_threadpool(save_upload_stream, file.file, archive_path)
+
+    try:
+        with zipfile.ZipFile(archive_path) as zip_ref:
+            members, skipped = list_zip_image_members(zip_ref)
+    except zipfile.BadZipFile:
+        os.remove(archive_path)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="无效的ZIP文件"
+        )
+
+    if not members:
+        os.remove(archive_path)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="压缩包中没有支持的图片"
+        )
+
+    # 按目录中记录的解压后大小限制总量（防止压缩炸弹），解压时每个成员最多读出记录的大小
+    if sum(member.file_size for member in members) > settings.ZIP_IMPORT_MAX_TOTAL_SIZE:
+        os.remove(archive_path)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="压缩包解压后的总大小超过限制"
+        )
+
+    zip_import = ZipImport(
+        id=str(uuid.uuid4()),
+        filename=file.filename,
+        status="pending",
+        total=len(members),
+        processed=0,
+        skipped=skipped,
+        failed=0,
+        errors=[],
+        album_id=album_id,
+        user_id=user_id
+    )
+    db.add(zip_import)
+    await db.commit()
+    await db.refresh(zip_import)
+
+    task = asyncio.get_running_loop().create_task(
+        run_zip_import(zip_import.id, archive_path, [m.filename for m in members], album_id, user_id)
+    )
+    _running_imports.add(task)
+    task.add_done_callback(_running_imports.discard)
+
+    return zip_import
+
+
+# 执行导入：多路并行解压成员，分批入库并更新进度
+async def run_zip_import(
+        import_id: str,
+        archive_path: str,
+        member_names: list,
+        album_id: str,
+        user_id: str
+):
+    db = AsyncSessionLocal()
+    queue = asyncio.Queue()
+    for name in member_names:
+        queue.put_nowait(name)
+
+    pending = []
+    progress = {"processed": 0, "failed": 0, "errors": []}
+    store_lock = asyncio.Lock()
+
+    def record_failure(name: str, error: str):
+        progress["failed"] += 1
+        if len(progress["errors"]) < ZIP_IMPORT_MAX_ERRORS:
+            progress["errors"].append({"file": name, "error": error})
+
+    async def save_progress(import_status: str = None):
+        zip_import = await db.scalar(select(ZipImport).where(ZipImport.id == import_id))
+        zip_import.processed = progress["processed"]
+        zip_import.failed = progress["failed"]
+        zip_import.errors = list(progress["errors"])
+        if import_status:
+            zip_import.status = import_status
+        await db.commit()
+
+    # 入库当前已暂存的成员（入库在事件循环中执行，衍生数据任务随之提交）
+    async def flush():
+        async with store_lock:
+            batch = pending[:]
+            pending.clear()
+            if not batch:
+                return
+            # 失败时 store_staged_images 已回滚，并清理了暂存文件和本批写入存储的文件
+            try:
+                await store_staged_images(db, batch, album_id, user_id)
+                progress["processed"] += len(batch)
+            except Exception as e:
+                logger.error(f"ZIP导入入库失败: {import_id}: {e}", exc_info=True)
+                for item in batch:
+                    record_failure(item["filename"], "入库失败")
+            await save_progress()
+
+    async def lane():
+        zip_ref = await run_in_threadpool(zipfile.ZipFile, archive_path)
+        try:
+            while not queue.empty():
+                name = queue.get_nowait()
+                try:
+                    file_info = zip_ref.getinfo(name)
+                    pending.append(await run_in_threadpool(stage_zip_member, zip_ref, file_info))
+                except FileSizeExceededError:
+                    record_failure(name, "文件大小超过限制")
+                except (zipfile.BadZipFile, zipfile.LargeZipFile, OSError, EOFError, RuntimeError) as e:
+                    record_failure(name, str(e) or "解压失败")
+
+                if len(pending) >= ZIP_IMPORT_BATCH_SIZE:
+                    await flush()
+        finally:
+            zip_ref.close()
+
+    try:
+        await save_progress("processing")
+        await asyncio.gather(*(lane() for _ in range(ZIP_IMPORT_CONCURRENCY)))
+        await flush()
+        await save_progress("done")
+    except Exception as e:
+        logger.error(f"ZIP导入失败: {import_id}: {e}", exc_info=True)
+        await db.rollback()
+        for item in pending:
+            if os.path.exists(item["staging_path"]):
+                os.remove(item["staging_path"])
+        await save_progress("failed")
+    finally:
+        if os.path.exists(archive_path):
+            os.remove(archive_path)
+        await db.close()
+
+
+# 获取导入任务进度
+async def get_zip_import(db: AsyncSession, import_id: str, user_id: str) -> ZipImport:
+    zip_import = await db.scalar(select(ZipImport).where(ZipImport.id == import_id))
+
+    if not zip_import:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="导入任务不存在"
+        )
+
+    if zip_import.user_id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="无权限访问该导入任务"
+        )
+
+    return zip_import
@@ -1,9 +1,17 @@
 import os
 import uuid
+import shutil
+import hashlib
+import struct
+import tempfile
 import mimetypes
+import ntpath
 import zipfile
+from datetime import datetime
+from io import BytesIO
 from pathlib import Path
-from PIL import Image
+import numpy as np
+from PIL import Image, ImageOps
 import exifread
 
 # 支持的文件类型
@@ -19,6 +27,88 @@ FILE_SIZE_LIMITS = {
     'raw': 200 * 1024 * 1024  # 200MB
 }
 
+# 多分辨率版本：长边像素与输出格式
+RENDITION_SIZES = (200, 640, 1280, 2048)
+RENDITION_FORMATS = ("jpeg", "webp")
+RENDITION_EXTENSIONS = {"jpeg": "jpg", "webp": "webp"}
+RENDITION_SAVE_OPTIONS = {
+    "jpeg": {"format": "JPEG", "quality": 85, "progressive": True},
+    "webp": {"format": "WEBP", "quality": 80, "method": 4}
+}
+
+# 元数据解析最多读取的文件头字节数（JPEG/PNG 的EXIF和尺寸信息都在文件头部）
+METADATA_HEADER_BYTES = 512 * 1024
+
+# 视觉特征向量：HSV联合直方图（色相/饱和度/明度分箱）+ 亮度缩略网格，float32
+FEATURE_HSV_BINS = (8, 3, 2)
+FEATURE_GRID_SIZE = 8
+FEATURE_DIM = FEATURE_HSV_BINS[0] * FEATURE_HSV_BINS[1] * FEATURE_HSV_BINS[2] + FEATURE_GRID_SIZE ** 2
+
+# BlurHash 占位图：横纵分量数（4x3 编码后约 28 个字符）及 base83 字符表
+BLURHASH_COMPONENTS = (4, 3)
+BASE83_CHARACTERS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+# 文件头魔数 -> MIME类型
+MAGIC_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff")
+]
+
+# EXIF标签 -> 字段名
+EXIF_MAPPING = {
+    'Image Make': 'camera_make',
+    'Image Model': 'camera_model',
+    'EXIF DateTimeOriginal': 'capture_time',
+    'EXIF ExifImageWidth': 'width',
+    'EXIF ExifImageLength': 'height',
+    'EXIF ISOSpeedRatings': 'iso',
+    'EXIF FNumber': 'aperture',
+    'EXIF ExposureTime': 'exposure_time',
+    'EXIF FocalLength': 'focal_length'
+}
+
+# 需要交换宽高的EXIF方向值（旋转90°/270°）
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+# EXIF方向值 -> 转正所需的变换
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90
+}
+
+# RAW内嵌预览：最多遍历的IFD数量与预览大小上限
+RAW_MAX_IFDS = 64
+RAW_PREVIEW_MAX_BYTES = 64 * 1024 * 1024
+
+# TIFF字段类型 -> (struct格式, 字节数)
+TIFF_TYPE_FORMATS = {
+    3: ("H", 2),  # SHORT
+    4: ("I", 4),  # LONG
+    13: ("I", 4)  # IFD
+}
+
+# 分片目录层级及每级前缀长度（十六进制字符数）
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2
+
+# 流式写入上传文件时的分块大小（字节）
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+# 打包下载时直接存储（不再压缩）的格式：本身已压缩，deflate 只浪费CPU
+ZIP_STORED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'raw', 'cr2', 'nef', 'arw'}
+
+
+# 文件超过大小限制
+class FileSizeExceededError(Exception):
+    pass
+
 
 # 确保目录存在
 def ensure_dir(dir_path: str):
@@ -31,6 +121,28 @@ def generate_unique_filename(original_filename: str) -> str:
     return f"{uuid.uuid4()}{ext}"
 
 
+# 分片目录：按键的十六进制前缀分两级，每级256个子目录，单目录文件数保持在可控范围
+def get_sharded_path(base_dir: str, key: str, filename: str = "") -> str:
+    shards = [key[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(SHARD_LEVELS)]
+    return os.path.join(base_dir, *shards, filename or key)
+
+
+# 判断路径是否已是分片布局（<base_dir>/xx/xx/文件名）
+def is_sharded_path(path: str, base_dir: str) -> bool:
+    relative_path = os.path.relpath(path.lstrip('/'), base_dir)
+    parts = relative_path.replace(os.sep, "/").split("/")
+    return (
+        len(parts) == SHARD_LEVELS + 1
+        and all(len(part) == SHARD_WIDTH and all(c in "0123456789abcdef" for c in part) for part in parts[:-1])
+        and parts[-1].startswith("".join(parts[:-1]))
+    )
+
+
+# 内容寻址文件路径：<base_dir>/<hash[0:2]>/<hash[2:4]>/<hash><ext>
+def get_blob_path(base_dir: str, file_hash: str, ext: str = "") -> str:
+    return get_sharded_path(base_dir, file_hash, f"{file_hash}{ext}")
+
+
 # 获取文件MIME类型
 def get_file_mime_type(file_path: str) -> str:
     mime_type, _ = mimetypes.guess_type(file_path)
@@ -48,77 +160,669 @@ def validate_file_type(filename: str, file_type: str = None) -> bool:
     return False
 
 
-# 验证文件大小
-def validate_file_size(filename: str, file_size: int) -> bool:
+# 获取文件大小上限（不支持的类型返回0）
+def get_file_size_limit(filename: str) -> int:
     ext = os.path.splitext(filename)[1].lower().lstrip('.')
 
     if ext in ['jpg', 'jpeg']:
-        return file_size <= FILE_SIZE_LIMITS['jpg']
+        return FILE_SIZE_LIMITS['jpg']
     elif ext in ['raw', 'cr2', 'nef', 'arw']:
-        return file_size <= FILE_SIZE_LIMITS['raw']
+        return FILE_SIZE_LIMITS['raw']
 
-    return False
+    return 0
+
+
+# 验证文件大小
+def validate_file_size(filename: str, file_size: int) -> bool:
+    return file_size <= get_file_size_limit(filename)
+
+
+# 流式保存上传文件
+# 按固定分块从 src 读取并写入同目录临时文件，边写边计算SHA-256和字节数；
+# 超过 max_size 立即中止并删除临时文件，成功后原子重命名为 dest_path。
+# 返回 (文件大小, SHA-256十六进制摘要)
+def save_upload_stream(
+        src,
+        dest_path: str,
+        max_size: int = None,
+        chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> tuple:
+    dest_dir = os.path.dirname(dest_path) or "."
+    ensure_dir(dest_dir)
+
+    if hasattr(src, "seek"):
+        src.seek(0)
+
+    hasher = hashlib.sha256()
+    total = 0
+    fd, tmp_path = tempfile.mkstemp(dir=dest_dir, prefix=".upload_", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    break
+                total += len(chunk)
+                if max_size is not None and total > max_size:
+                    raise FileSizeExceededError(f"文件大小超过限制: {max_size} 字节")
+                hasher.update(chunk)
+                out.write(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return total, hasher.hexdigest()
+
+
+# 为文件在新位置建立硬链接（跨设备时复制），迁移期间新旧路径同时可读；目标已存在时视为已完成
+def link_or_copy_file(src_path: str, dest_path: str):
+    ensure_dir(os.path.dirname(dest_path) or ".")
+    if os.path.exists(dest_path):
+        return
+    try:
+        os.link(src_path, dest_path)
+    except FileExistsError:
+        pass
+    except OSError:
+        tmp_path = f"{dest_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            shutil.copy2(src_path, tmp_path)
+            os.replace(tmp_path, dest_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+# 预分配指定大小的文件（稀疏文件，供分片按偏移写入）
+def allocate_file(file_path: str, size: int):
+    ensure_dir(os.path.dirname(file_path) or ".")
+    with open(file_path, "ab") as f:
+        f.truncate(size)
+
+
+# 在指定偏移处写入数据
+def write_file_range(file_path: str, offset: int, data: bytes):
+    with open(file_path, "r+b") as f:
+        f.seek(offset)
+        f.write(data)
+
+
+# 分块计算文件的大小和SHA-256
+def hash_file(file_path: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> tuple:
+    hasher = hashlib.sha256()
+    total = 0
+    with open(file_path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            total += len(chunk)
+            hasher.update(chunk)
+
+    return total, hasher.hexdigest()
+
+
+# 计算等比缩放后的输出尺寸（contain 放入框内，cover 填满框；不放大）
+def get_scaled_size(source_size: tuple, box: tuple, fit: str = "contain") -> tuple:
+    width, height = source_size
+    box_width, box_height = box[0] or width, box[1] or height
+    ratios = (box_width / width, box_height / height)
+    scale = min(1, max(ratios) if fit == "cover" else min(ratios))
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+# 按目标尺寸打开图片并解码为RGB（按EXIF方向转正）
+# JPEG 走 DCT 缩放解码（draft）：选择结果仍不小于目标尺寸的最大缩小比例（1/2、1/4、1/8），
+# 大幅减少需要解码的像素；调用方再用高质量重采样缩放到最终尺寸
+# source 可以是路径或已打开的文件对象；orientation 用于覆盖图片自带的方向（如RAW内嵌预览）
+def load_image_scaled(source, box: tuple = None, fit: str = "contain", orientation: int = None) -> Image.Image:
+    with Image.open(source) as img:
+        orientation = orientation or img.getexif().get(0x0112, 1)
+        if box and img.format == "JPEG":
+            if orientation in TRANSPOSED_ORIENTATIONS:
+                box = (box[1], box[0])
+            img.draft("RGB", get_scaled_size(img.size, box, fit))
+        img = img.convert("RGB")
+
+    if orientation in ORIENTATION_TRANSPOSE:
+        img = img.transpose(ORIENTATION_TRANSPOSE[orientation])
+
+    return img
 
 
 # 生成缩略图
 def generate_thumbnail(image_path: str, output_path: str, size: tuple = (200, 200)) -> str:
     try:
-        with Image.open(image_path) as img:
-            img.thumbnail(size)
-            img.save(output_path, 'JPEG', quality=85)
+        img = load_image_scaled(image_path, size)
+        img.thumbnail(size, Image.LANCZOS)
+        img.save(output_path, 'JPEG', quality=85)
         return output_path
     except Exception as e:
         print(f"生成缩略图失败: {e}")
         return ""
 
 
+# 根据文件头魔数识别MIME类型（TIFF结构的RAW按扩展名归为 image/raw）
+def detect_mime_type(header: bytes, filename: str = "") -> str:
+    for signature, mime_type in MAGIC_SIGNATURES:
+        if header.startswith(signature):
+            ext = os.path.splitext(filename)[1].lower().lstrip('.')
+            if mime_type == "image/tiff" and (header[8:10] == b"CR" or ext in SUPPORTED_IMAGE_TYPES['image/raw']):
+                return "image/raw"
+            return mime_type
+
+    return ""
+
+
+# 解析EXIF拍摄时间（"YYYY:MM:DD HH:MM:SS"）
+def parse_exif_datetime(value: str):
+    try:
+        return datetime.strptime(value.strip(), "%Y:%m:%d %H:%M:%S")
+    except (ValueError, AttributeError):
+        return None
+
+
+# 单次读取提取图片元数据：MIME（魔数）、像素尺寸、方向、EXIF字段、拍摄时间
+# JPEG/PNG 只解析前 METADATA_HEADER_BYTES 字节；TIFF结构（含RAW）直接在文件上按IFD偏移跳读，
+# 且不解析厂商私有 MakerNote，避免大文件被整体读入。
+# source 可以是路径或已打开的二进制文件对象
+def extract_image_metadata(source, filename: str = "") -> dict:
+    metadata = {
+        "mime_type": "",
+        "width": 0,
+        "height": 0,
+        "orientation": 1,
+        "exif_data": {},
+        "captured_at": None
+    }
+
+    f = open(source, "rb") if isinstance(source, str) else source
+    try:
+        f.seek(0)
+        header = f.read(METADATA_HEADER_BYTES)
+        metadata["mime_type"] = detect_mime_type(header, filename or getattr(f, "name", ""))
+
+        # TIFF结构的元数据可能位于文件任意位置，其他格式在文件头内
+        is_tiff = metadata["mime_type"] in ("image/tiff", "image/raw")
+        if is_tiff:
+            f.seek(0)
+        reader = f if is_tiff else BytesIO(header)
+
+        try:
+            tags = exifread.process_file(reader, details=False)
+        except Exception as e:
+            print(f"提取EXIF信息失败: {e}")
+            tags = {}
+
+        for tag, key in EXIF_MAPPING.items():
+            if tag in tags:
+                metadata["exif_data"][key] = str(tags[tag])
+
+        if 'Image Orientation' in tags:
+            metadata["orientation"] = tags['Image Orientation'].values[0] or 1
+            metadata["exif_data"]["orientation"] = metadata["orientation"]
+        metadata["captured_at"] = parse_exif_datetime(metadata["exif_data"].get("capture_time"))
+
+        # 像素尺寸：Pillow 打开时只解析文件头；RAW的首个IFD通常是缩小的预览，以EXIF记录的尺寸为准
+        exif_width = int(metadata["exif_data"].get("width", 0) or 0)
+        exif_height = int(metadata["exif_data"].get("height", 0) or 0)
+        if metadata["mime_type"] == "image/raw" and exif_width and exif_height:
+            width, height = exif_width, exif_height
+        else:
+            try:
+                reader.seek(0)
+                with Image.open(reader) as img:
+                    width, height = img.size
+            except Exception:
+                width, height = exif_width, exif_height
+
+        # 按显示方向给出宽高
+        if metadata["orientation"] in TRANSPOSED_ORIENTATIONS:
+            width, height = height, width
+        metadata["width"], metadata["height"] = width, height
+    except Exception as e:
+        print(f"提取图片元数据失败: {e}")
+    finally:
+        if isinstance(source, str):
+            f.close()
+
+    return metadata
+
+
 # 提取EXIF信息
 def extract_exif_data(image_path: str) -> dict:
-    exif_data = {}
-    try:
-        with open(image_path, 'rb') as f:
-            tags = exifread.process_file(f)
-
-            # 提取关键EXIF信息
-            exif_mapping = {
-                'Image Make': 'camera_make',
-                'Image Model': 'camera_model',
-                'EXIF DateTimeOriginal': 'capture_time',
-                'EXIF ExifImageWidth': 'width',
-                'EXIF ExifImageLength': 'height',
-                'EXIF ISOSpeedRatings': 'iso',
-                'EXIF FNumber': 'aperture',
-                'EXIF ExposureTime': 'exposure_time',
-                'EXIF FocalLength': 'focal_length'
-            }
-
-            for tag, key in exif_mapping.items():
-                if tag in tags:
-                    exif_data[key] = str(tags[tag])
+    return extract_image_metadata(image_path)["exif_data"]
+
+
+# 读取TIFF字段值（值不超过4字节时内联在条目中，否则存放在偏移处）
+def read_tiff_values(f, endian: str, field_type: int, count: int, value: bytes) -> list:
+    if field_type not in TIFF_TYPE_FORMATS or count > RAW_MAX_IFDS:
+        return []
+
+    fmt, size = TIFF_TYPE_FORMATS[field_type]
+    if count * size <= 4:
+        data = value[:count * size]
+    else:
+        f.seek(struct.unpack(endian + "I", value)[0])
+        data = f.read(count * size)
+        if len(data) < count * size:
+            return []
+
+    return list(struct.unpack(f"{endian}{count}{fmt}", data))
+
 
+# 判断JPEG数据能否被Pillow解码（基线/渐进式；排除RAW数据常用的无损JPEG）
+def is_decodable_jpeg(data: bytes) -> bool:
+    if data[:2] != b"\xff\xd8":
+        return False
+
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return False
+        marker = data[pos + 1]
+        if marker in (0xC0, 0xC1, 0xC2):
+            return True
+        if 0xC3 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            return False
+        pos += 2 + struct.unpack(">H", data[pos + 2:pos + 4])[0]
+
+    return False
+
+
+# 提取TIFF结构RAW（CR2/NEF/ARW等）中最大的可解码内嵌JPEG预览，找不到返回None
+# 遍历IFD链及SubIFD，收集 JPEGInterchangeFormat 及 JPEG 压缩的单条带数据，只读取候选预览本身
+def extract_raw_preview(f) -> bytes:
+    f.seek(0)
+    header = f.read(8)
+    if header[:2] == b"II":
+        endian = "<"
+    elif header[:2] == b"MM":
+        endian = ">"
+    else:
+        return None
+
+    magic, first_ifd = struct.unpack(endian + "HI", header[2:8])
+    if magic != 42:
+        return None
+
+    candidates = []
+    pending = [first_ifd]
+    visited = set()
+    while pending and len(visited) < RAW_MAX_IFDS:
+        offset = pending.pop()
+        if not offset or offset in visited:
+            continue
+        visited.add(offset)
+
+        f.seek(offset)
+        raw_count = f.read(2)
+        if len(raw_count) < 2:
+            continue
+        count = struct.unpack(endian + "H", raw_count)[0]
+        entries = f.read(count * 12)
+        raw_next = f.read(4)
+        if len(entries) < count * 12:
+            continue
+        if len(raw_next) == 4:
+            pending.append(struct.unpack(endian + "I", raw_next)[0])
+
+        tags = {}
+        for i in range(count):
+            tag, field_type, value_count, value = struct.unpack(endian + "HHI4s", entries[i * 12:(i + 1) * 12])
+            tags[tag] = (field_type, value_count, value)
+
+        def values(tag):
+            return read_tiff_values(f, endian, *tags[tag]) if tag in tags else []
+
+        # SubIFDs
+        pending.extend(values(0x014A))
+
+        # JPEGInterchangeFormat / JPEGInterchangeFormatLength
+        jpeg_offset, jpeg_length = values(0x0201), values(0x0202)
+        if jpeg_offset and jpeg_length:
+            candidates.append((jpeg_offset[0], jpeg_length[0]))
+
+        # JPEG 压缩的单条带（Compression=6/7, StripOffsets/StripByteCounts）
+        compression = values(0x0103)
+        strip_offsets, strip_counts = values(0x0111), values(0x0117)
+        if compression and compression[0] in (6, 7) and len(strip_offsets) == 1 and len(strip_counts) == 1:
+            candidates.append((strip_offsets[0], strip_counts[0]))
+
+    for offset, length in sorted(set(candidates), key=lambda c: c[1], reverse=True):
+        if length <= 0 or length > RAW_PREVIEW_MAX_BYTES:
+            continue
+        f.seek(offset)
+        data = f.read(length)
+        if len(data) == length and is_decodable_jpeg(data):
+            return data
+
+    return None
+
+
+# 获取图片像素尺寸（只解析文件头，不解码像素）
+def get_image_dimensions(image_path) -> tuple:
+    try:
+        with Image.open(image_path) as img:
+            return img.size
     except Exception as e:
-        print(f"提取EXIF信息失败: {e}")
+        print(f"读取图片尺寸失败: {e}")
+        return 0, 0
 
-    return exif_data
 
+# 多分辨率版本文件路径：<base_path>_<长边>.<扩展名>
+def get_rendition_path(base_path: str, size: int, fmt: str) -> str:
+    return f"{base_path}_{size}.{RENDITION_EXTENSIONS[fmt]}"
 
-# 解压ZIP文件
-def extract_zip_file(zip_path: str, extract_dir: str) -> list:
-    extracted_files = []
+
+# 生成多分辨率版本（只解码一次原图，从大到小逐级缩放）
+# 不放大：超过原图尺寸的档位跳过，但至少生成最小一档。
+# 返回 [{"size", "width", "height", "format", "path", "bytes"}, ...]
+# image_path 可以是路径或已打开的文件对象；已知原图尺寸时通过 source_size 传入，省去一次文件头解析
+def generate_renditions(
+        image_path,
+        base_path: str,
+        sizes: tuple = RENDITION_SIZES,
+        formats: tuple = RENDITION_FORMATS,
+        source_size: tuple = None,
+        orientation: int = None
+) -> list:
+    renditions = []
+    ensure_dir(os.path.dirname(base_path) or ".")
 
     try:
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            for file_info in zip_ref.infolist():
-                # 跳过目录和恶意路径
-                if file_info.is_dir() or '..' in file_info.filename:
-                    continue
+        if not source_size or not all(source_size):
+            source_size = get_image_dimensions(image_path)
+            if hasattr(image_path, "seek"):
+                image_path.seek(0)
+        long_edge = max(source_size)
+        sorted_sizes = sorted(sizes, reverse=True)
+        targets = [size for size in sorted_sizes if size <= long_edge] or sorted_sizes[-1:]
+
+        # 只按最大一档解码，更小的档位都从它缩出
+        current = load_image_scaled(image_path, (targets[0], targets[0]), orientation=orientation)
 
-                # 验证文件类型
-                if validate_file_type(file_info.filename):
-                    zip_ref.extract(file_info, extract_dir)
-                    extracted_files.append(os.path.join(extract_dir, file_info.filename))
+        for size in targets:
+            # 以上一档（更大的）结果为源继续缩小，避免每档都从原图缩放
+            if max(current.size) > size:
+                current = current.copy()
+                current.thumbnail((size, size), Image.LANCZOS)
 
+            for fmt in formats:
+                output_path = get_rendition_path(base_path, size, fmt)
+                try:
+                    current.save(output_path, **RENDITION_SAVE_OPTIONS[fmt])
+                except Exception as e:
+                    print(f"生成{fmt}版本失败: {e}")
+                    continue
+                renditions.append({
+                    "size": size,
+                    "width": current.width,
+                    "height": current.height,
+                    "format": fmt,
+                    "path": output_path,
+                    "bytes": os.path.getsize(output_path)
+                })
     except Exception as e:
-        print(f"解压ZIP文件失败: {e}")
+        print(f"生成多分辨率版本失败: {e}")
+
+    return renditions
+
+
+# 按需渲染指定尺寸的版本，供进程池调用
+# fit=contain 等比缩放到框内；fit=cover 等比缩放后居中裁剪填满框。结果原子写入 output_path
+def render_image_variant(
+        image_path: str,
+        output_path: str,
+        width: int = 0,
+        height: int = 0,
+        fit: str = "contain",
+        fmt: str = "jpeg"
+) -> str:
+    ensure_dir(os.path.dirname(output_path) or ".")
+
+    img = load_image_scaled(image_path, (width, height), fit if width and height else "contain")
+
+    if fit == "cover" and width and height:
+        img = ImageOps.fit(img, (width, height), Image.LANCZOS)
+    else:
+        img.thumbnail((width or img.width, height or img.height), Image.LANCZOS)
+
+    tmp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        img.save(tmp_path, **RENDITION_SAVE_OPTIONS[fmt])
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return output_path
+
+
+# 计算感知哈希（dHash）：缩成 9x8 灰度图，逐行比较相邻像素亮度，得到64位指纹（16位十六进制）
+# 对缩放、重新压缩不敏感，汉明距离越小越相似
+def compute_dhash(img: Image.Image) -> str:
+    pixels = img.convert("L").resize((9, 8), Image.LANCZOS).tobytes()
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+
+    return f"{value:016x}"
+
+
+# 计算视觉特征向量（颜色分布 + 亮度布局），L2归一化后用点积即可得到余弦相似度
+def compute_feature_vector(img: Image.Image) -> bytes:
+    hsv = np.asarray(img.convert("RGB").resize((64, 64), Image.BILINEAR).convert("HSV"), dtype=np.uint16)
+    h_bins, s_bins, v_bins = FEATURE_HSV_BINS
+    bins = (hsv[..., 0] * h_bins >> 8) * s_bins * v_bins + (hsv[..., 1] * s_bins >> 8) * v_bins + (hsv[..., 2] * v_bins >> 8)
+    histogram = np.bincount(bins.ravel(), minlength=h_bins * s_bins * v_bins).astype(np.float32)
+    histogram = np.sqrt(histogram)
+
+    grid = np.asarray(img.convert("L").resize((FEATURE_GRID_SIZE, FEATURE_GRID_SIZE), Image.BOX), dtype=np.float32).ravel()
+    grid -= grid.mean()
+
+    parts = []
+    for part in (histogram, grid):
+        norm = np.linalg.norm(part)
+        parts.append(part / norm if norm else part)
+    vector = np.concatenate(parts)
+    norm = np.linalg.norm(vector)
+
+    return (vector / norm if norm else vector).astype(np.float32).tobytes()
+
+
+# base83 编码（BlurHash 使用）
+def encode_base83(value: int, length: int) -> str:
+    return "".join(
+        BASE83_CHARACTERS[(value // 83 ** (length - i)) % 83]
+        for i in range(1, length + 1)
+    )
+
+
+# 线性RGB -> sRGB（0-255）
+def linear_to_srgb(value: float) -> int:
+    value = min(max(value, 0.0), 1.0)
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+# 计算 BlurHash：在 32x32 缩略图上做低频余弦分解，客户端可解码为任意尺寸的模糊占位图
+def compute_blurhash(img: Image.Image, components: tuple = BLURHASH_COMPONENTS) -> str:
+    x_components, y_components = components
+    pixels = np.asarray(img.convert("RGB").resize((32, 32), Image.BILINEAR), dtype=np.float32) / 255
+    linear = np.where(pixels <= 0.04045, pixels / 12.92, ((pixels + 0.055) / 1.055) ** 2.4)
+    height, width = linear.shape[:2]
+
+    factors = []
+    for j in range(y_components):
+        cos_y = np.cos(np.pi * j * np.arange(height) / height)
+        for i in range(x_components):
+            cos_x = np.cos(np.pi * i * np.arange(width) / width)
+            basis = np.outer(cos_y, cos_x)[..., None]
+            normalisation = 1 if i == 0 and j == 0 else 2
+            factors.append(normalisation * (basis * linear).sum(axis=(0, 1)) / (width * height))
+
+    dc, ac = factors[0], factors[1:]
+    result = encode_base83((x_components - 1) + (y_components - 1) * 9, 1)
+
+    if ac:
+        actual_max = float(max(np.abs(factor).max() for factor in ac))
+        quantised_max = int(max(0, min(82, np.floor(actual_max * 166 - 0.5))))
+        max_value = (quantised_max + 1) / 166
+        result += encode_base83(quantised_max, 1)
+    else:
+        max_value = 1
+        result += encode_base83(0, 1)
+
+    r, g, b = (linear_to_srgb(float(channel)) for channel in dc)
+    result += encode_base83((r << 16) + (g << 8) + b, 4)
+
+    for factor in ac:
+        quantised = [
+            int(max(0, min(18, np.floor(np.sign(v) * abs(v / max_value) ** 0.5 * 9 + 9.5))))
+            for v in factor
+        ]
+        result += encode_base83(quantised[0] * 19 * 19 + quantised[1] * 19 + quantised[2], 2)
+
+    return result
+
+
+# 计算主色调（中位切分量化为5色，取像素最多的颜色），返回 #rrggbb
+def compute_dominant_color(img: Image.Image) -> str:
+    palette_img = img.convert("RGB").resize((64, 64), Image.BILINEAR).quantize(colors=5, method=Image.Quantize.MEDIANCUT)
+    palette = palette_img.getpalette()
+    _, index = max(palette_img.getcolors())
+    r, g, b = palette[index * 3:index * 3 + 3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+# 生成衍生数据（元数据、多分辨率版本、感知哈希、特征向量、占位图及主色调），供进程池调用
+# 原图只打开一次：先从文件头提取元数据，再解码生成各档版本（RAW取内嵌预览）；缩略图取最小一档的JPEG版本
+# 感知哈希、特征向量、BlurHash 及主色调均从最小一档版本计算，不再解码原图
+def process_image_derivatives(
+        image_path: str,
+        rendition_base: str,
+        sizes: tuple = RENDITION_SIZES,
+        formats: tuple = RENDITION_FORMATS
+) -> dict:
+    with open(image_path, "rb") as f:
+        metadata = extract_image_metadata(f, image_path)
+
+        # RAW 不做去马赛克解码，直接用相机内嵌的JPEG预览生成各档版本
+        source, source_size = f, (metadata["width"], metadata["height"])
+        if metadata["mime_type"] == "image/raw":
+            preview = extract_raw_preview(f)
+            source, source_size = (BytesIO(preview), None) if preview else (f, None)
+
+        f.seek(0)
+        renditions = generate_renditions(
+            source, rendition_base, sizes, formats,
+            source_size=source_size,
+            orientation=metadata["orientation"]
+        )
+
+    jpeg_renditions = [r for r in renditions if r["format"] == "jpeg"]
+    metadata["thumbnail_path"] = min(jpeg_renditions, key=lambda r: r["size"])["path"] if jpeg_renditions else ""
+    metadata["renditions"] = renditions
+
+    metadata["phash"] = None
+    metadata["features"] = None
+    metadata["blurhash"] = ""
+    metadata["dominant_color"] = ""
+    if renditions:
+        try:
+            with Image.open(min(renditions, key=lambda r: r["bytes"])["path"]) as img:
+                img = img.convert("RGB")
+            metadata["phash"] = compute_dhash(img)
+            metadata["features"] = compute_feature_vector(img)
+            metadata["blurhash"] = compute_blurhash(img)
+            metadata["dominant_color"] = compute_dominant_color(img)
+        except Exception as e:
+            print(f"计算感知哈希/特征向量/占位图失败: {e}")
+
+    return metadata
+
+
+# 列出ZIP中可导入的图片成员，返回 (图片成员列表, 跳过的成员数)
+# 跳过目录、路径穿越/绝对路径、加密成员、macOS资源文件及不支持的类型
+def list_zip_image_members(zip_ref: zipfile.ZipFile) -> tuple:
+    members = []
+    skipped = 0
+
+    for file_info in zip_ref.infolist():
+        if file_info.is_dir():
+            continue
+
+        name = file_info.filename
+        if '..' in name or name.startswith(('/', '\\')) or file_info.flag_bits & 0x1:
+            skipped += 1
+            continue
+
+        # macOS 打包时附带的资源文件
+        if name.startswith('__MACOSX/') or os.path.basename(name).startswith('._'):
+            skipped += 1
+            continue
+
+        if not validate_file_type(name):
+            skipped += 1
+            continue
+
+        members.append(file_info)
+
+    return members, skipped
+
+
+# 只追加写入的缓冲区，供 ZipFile 写入不可 seek 的流，每写完一块即取出发送
+class ZipStreamBuffer:
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data) -> int:
+        if data:
+            self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> list:
+        chunks, self.chunks = self.chunks, []
+        return chunks
+
+
+# 包内文件名：客户端提供的文件名只取最后一段（去掉目录、盘符及 ..），解压时不会写到目标目录之外
+# 取不到有效文件名时使用 fallback
+def safe_archive_name(filename: str, fallback: str) -> str:
+    name = ntpath.splitdrive(os.path.basename((filename or "").replace("\\", "/")))[1]
+    return fallback if name in ("", ".", "..") else name
+
+
+# 边读文件边生成ZIP数据流（不落临时文件，内存占用与文件总大小无关）
+# entries: [(包内文件名, 文件大小, 修改时间戳, 返回文件内容块迭代器的函数), ...]
+def iter_zip_stream(entries: list):
+    buffer = ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, "w", allowZip64=True) as zip_ref:
+        for arcname, file_size, mtime, read_file in entries:
+            zinfo = zipfile.ZipInfo(arcname, datetime.fromtimestamp(mtime).timetuple()[:6])
+            zinfo.file_size = file_size
+            zinfo.external_attr = 0o644 << 16
+            ext = os.path.splitext(arcname)[1].lower().lstrip('.')
+            zinfo.compress_type = zipfile.ZIP_STORED if ext in ZIP_STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
 
-    return extracted_files
\ No newline at end of file
+            # 已知文件大小，超过4GB时 zipfile 会自动写入 ZIP64 头
+            with zip_ref.open(zinfo, "w") as dest:
+                for chunk in read_file():
+                    dest.write(chunk)
+                    yield from buffer.drain()
+            yield from buffer.drain()
+    # 中央目录
+    yield from buffer.drain()
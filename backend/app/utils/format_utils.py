@@ -1,5 +1,6 @@
 from datetime import datetime
 from typing import Any
+from ..utils.security_utils import sign_media_url
 
 
 # 格式化日期时间
@@ -28,12 +29,45 @@ def format_pagination_response(
         page: int,
         page_size: int
 ) -> dict:
+    pagination = count_info(total, page, page_size)
     return {
         "items": items,
-        "total": total,
+        "total": int(total),
         "page": page,
         "page_size": page_size,
-        "total_pages": (total + page_size - 1) // page_size
+        "total_pages": pagination["total_pages"],
+        "has_more": pagination["has_more"],
+        "count_strategy": pagination["count_strategy"]
+    }
+
+
+# 总数的计数策略（见 core/counting.py）：estimate 为估算值；has_more 模式下总数只是已知下限，页数只算到下一页
+def count_info(total: int, page: int, page_size: int) -> dict:
+    has_more = getattr(total, "has_more", None)
+    if has_more is None:
+        return {
+            "total_pages": (total + page_size - 1) // page_size,
+            "has_more": page * page_size < total,
+            "count_strategy": getattr(total, "strategy", "exact")
+        }
+    return {
+        "total_pages": page + 1 if has_more else page,
+        "has_more": has_more,
+        "count_strategy": total.strategy
+    }
+
+
+# 游标分页响应格式化（next_cursor 为 None 表示没有下一页）
+def format_cursor_response(
+        items: list,
+        next_cursor: str,
+        page_size: int
+) -> dict:
+    return {
+        "items": items,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
+        "page_size": page_size
     }
 
 
@@ -53,4 +87,29 @@ def model_to_dict(model: Any, exclude: list = None) -> dict:
             else:
                 result[column.name] = value
 
-    return result
\ No newline at end of file
+    return result
+
+
+# 生成 srcset 字符串，按格式分组：{"jpeg": "/a_200.jpg 200w, ...", "webp": ...}
+def format_srcset(renditions: list, sign_urls: bool = False) -> dict:
+    groups = {}
+    for rendition in sorted(renditions or [], key=lambda r: r["width"]):
+        path = sign_media_url(rendition["path"]) if sign_urls else rendition["path"]
+        groups.setdefault(rendition["format"], []).append(f"{path} {rendition['width']}w")
+
+    return {fmt: ", ".join(items) for fmt, items in groups.items()}
+
+
+# 图片转字典（附带 srcset；sign_urls 时文件地址替换为带过期时间的签名URL）
+def image_to_dict(image: Any, exclude: list = None, sign_urls: bool = False) -> dict:
+    result = model_to_dict(image, exclude)
+    result["srcset"] = format_srcset(image.renditions, sign_urls)
+    if sign_urls:
+        for key in ("file_path", "thumbnail_path"):
+            if result.get(key):
+                result[key] = sign_media_url(result[key])
+        result["renditions"] = [
+            dict(rendition, path=sign_media_url(rendition["path"]))
+            for rendition in image.renditions or []
+        ]
+    return result
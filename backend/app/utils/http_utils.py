@@ -0,0 +1,248 @@
+import os
+import re
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import quote
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from ..core.config import settings
+from ..core.storage import get_storage, storage_key
+
+# 各类资源的缓存策略（接口均需登录，只允许浏览器私有缓存）
+CACHE_CONTROL_POLICIES = {
+    # 原图：内容按哈希寻址不会变，但权限可能变化，过期后需重新校验
+    "original": "private, max-age=86400, must-revalidate",
+    # 缩略图、多分辨率版本：由原图派生，可长期缓存
+    "thumbnail": "private, max-age=604800",
+    "rendition": "private, max-age=604800"
+}
+
+# 单次请求最多允许的区间数，超过则忽略 Range 返回完整文件
+MAX_RANGES = 16
+
+# 分段读取文件的块大小
+RANGE_CHUNK_SIZE = 64 * 1024
+
+RANGE_PATTERN = re.compile(r"^\s*(\d*)\s*-\s*(\d*)\s*$")
+
+
+# 生成强 ETag：有内容哈希时直接使用，否则由修改时间和大小构成
+def make_etag(mtime: float, file_size: int, content_hash: str = None) -> str:
+    if content_hash:
+        return f'"{content_hash}"'
+    return f'"{int(mtime * 1_000_000_000):x}-{file_size:x}"'
+
+
+# 判断条件请求是否命中（If-None-Match 优先于 If-Modified-Since）
+def is_not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+    return False
+
+
+# 解析 Range 请求头，返回合并后的半开区间列表；无法满足时抛出 416
+# 返回 None 表示忽略 Range（格式不支持或区间过多），按完整文件响应
+def parse_range_header(range_header: str, file_size: int) -> list:
+    unit, _, specs = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or not specs:
+        return None
+
+    ranges = []
+    for spec in specs.split(","):
+        match = RANGE_PATTERN.match(spec)
+        if not match:
+            return None
+        first, last = match.groups()
+        if not first:
+            # 后缀区间：最后 N 个字节
+            if not last:
+                return None
+            start, end = max(file_size - int(last), 0), file_size
+        else:
+            start = int(first)
+            end = min(int(last) + 1, file_size) if last else file_size
+            if last and int(last) < start:
+                return None
+        if start < end:
+            ranges.append([start, end])
+
+    if not ranges:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="请求的字节区间无法满足",
+            headers={"Content-Range": f"bytes */{file_size}"}
+        )
+
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    if len(merged) > MAX_RANGES:
+        return None
+
+    return merged
+
+
+# 读取文件的指定区间
+def iter_file_range(file_path: str, start: int, end: int):
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+# 多区间响应体（multipart/byteranges），read_range(start, end) 返回区间内容的迭代器
+def iter_multipart_ranges(read_range, ranges: list, file_size: int, media_type: str, boundary: str):
+    for start, end in ranges:
+        yield (
+            f"--{boundary}\r\n"
+            f"Content-Type: {media_type}\r\n"
+            f"Content-Range: bytes {start}-{end - 1}/{file_size}\r\n\r\n"
+        ).encode()
+        yield from read_range(start, end)
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode()
+
+
+# Content-Disposition（非ASCII文件名按 RFC 5987 编码）
+def content_disposition(filename: str, disposition: str = "attachment") -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{disposition}; filename*=utf-8''{quoted}"
+    return f'{disposition}; filename="{filename}"'
+
+
+# 文件在 nginx internal location 下的路径；不在媒体根目录内时返回 None
+def get_accel_redirect_path(file_path: str) -> str:
+    relative_path = os.path.relpath(os.path.abspath(file_path), os.path.abspath(settings.MEDIA_ROOT))
+    if relative_path.startswith(".."):
+        return None
+    return settings.MEDIA_ACCEL_PREFIX.rstrip("/") + "/" + quote(relative_path.replace(os.sep, "/"))
+
+
+# 交给 nginx 发送文件（sendfile），Range、条件请求及 ETag 均由 nginx 处理
+def accel_redirect_response(accel_path: str, media_type: str, headers: dict) -> Response:
+    return Response(
+        media_type=media_type,
+        headers={"X-Accel-Redirect": accel_path, **headers}
+    )
+
+
+# 返回文件响应：x-accel 模式下只返回 X-Accel-Redirect，由 nginx 发送文件
+# 否则由应用直接发送，支持 ETag/Last-Modified 校验（304）、单区间及多区间 Range 请求（206）
+# use_storage=True 时按存储后端读取（对象存储上的文件以区间请求流式转发）；False 表示本地文件（如渲染缓存）
+async def media_file_response(
+        request: Request,
+        file_path: str,
+        media_type: str,
+        cache_policy: str,
+        content_hash: str = None,
+        filename: str = None,
+        headers: dict = None,
+        use_storage: bool = True
+) -> Response:
+    storage = get_storage() if use_storage else None
+    key = storage_key(file_path) if use_storage else None
+    if storage:
+        file_path = storage.local_path(key)
+
+    if settings.MEDIA_DELIVERY == "x-accel" and file_path:
+        accel_path = get_accel_redirect_path(file_path)
+        if accel_path:
+            accel_headers = {"Cache-Control": CACHE_CONTROL_POLICIES[cache_policy], **(headers or {})}
+            if filename:
+                accel_headers["Content-Disposition"] = content_disposition(filename)
+            return accel_redirect_response(accel_path, media_type, accel_headers)
+
+    try:
+        if file_path:
+            stat_result = os.stat(file_path)
+            file_size, mtime = stat_result.st_size, stat_result.st_mtime
+        else:
+            remote_stat = await run_in_threadpool(storage.stat, key)
+            file_size, mtime = remote_stat["size"], remote_stat["mtime"]
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="图片文件不存在"
+        )
+
+    if file_path:
+        def read_range(start: int, end: int):
+            return iter_file_range(file_path, start, end)
+    else:
+        def read_range(start: int, end: int):
+            return storage.iter_range(key, start, end, RANGE_CHUNK_SIZE)
+
+    etag = make_etag(mtime, file_size, content_hash)
+    response_headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(mtime, usegmt=True),
+        "Cache-Control": CACHE_CONTROL_POLICIES[cache_policy],
+        "Accept-Ranges": "bytes",
+        **(headers or {})
+    }
+    if filename:
+        response_headers["Content-Disposition"] = content_disposition(filename)
+
+    if is_not_modified(request, etag, mtime):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=response_headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # If-Range 与当前版本不一致时忽略 Range，返回完整的新文件
+    if range_header and (not if_range or if_range.strip() in (etag, response_headers["Last-Modified"])):
+        ranges = parse_range_header(range_header, file_size)
+        if ranges and len(ranges) == 1:
+            start, end = ranges[0]
+            response_headers["Content-Range"] = f"bytes {start}-{end - 1}/{file_size}"
+            response_headers["Content-Length"] = str(end - start)
+            return StreamingResponse(
+                read_range(start, end),
+                status_code=status.HTTP_206_PARTIAL_CONTENT,
+                media_type=media_type,
+                headers=response_headers
+            )
+        if ranges:
+            boundary = uuid.uuid4().hex
+            return StreamingResponse(
+                iter_multipart_ranges(read_range, ranges, file_size, media_type, boundary),
+                status_code=status.HTTP_206_PARTIAL_CONTENT,
+                media_type=f"multipart/byteranges; boundary={boundary}",
+                headers=response_headers
+            )
+
+    if range_header or not file_path:
+        # Range 被忽略时不能交给 FileResponse（它会自行处理 Range 请求头）
+        response_headers["Content-Length"] = str(file_size)
+        return StreamingResponse(
+            read_range(0, file_size),
+            media_type=media_type,
+            headers=response_headers
+        )
+
+    return FileResponse(
+        path=file_path,
+        media_type=media_type,
+        headers=response_headers,
+        stat_result=stat_result
+    )
@@ -0,0 +1,100 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException, status
+from sqlalchemy import DateTime, and_, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+# 游标分页（keyset）：按排序键记住上一页最后一行，下一页从该位置往后取，不使用 OFFSET
+# 排序键为 [(列, 是否降序), ...]，最后一列须唯一（一般为 id），对应的组合索引须与排序一致
+# 游标是排序键名与取值的 base64 编码，客户端只需原样回传
+
+
+def invalid_cursor():
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="无效的分页游标"
+    )
+
+
+def encode_cursor(keys: list, row) -> str:
+    values = []
+    for column, _ in keys:
+        value = getattr(row, column.key)
+        values.append(value.isoformat() if isinstance(value, datetime) else value)
+    payload = {"k": [column.key for column, _ in keys], "v": values}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+# 解析游标，排序键不一致（如切换了排序字段）时视为无效
+def decode_cursor(keys: list, cursor: str) -> list:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if payload["k"] != [column.key for column, _ in keys] or len(payload["v"]) != len(keys):
+            raise ValueError
+        return [
+            datetime.fromisoformat(value) if isinstance(column.type, DateTime) and value is not None else value
+            for (column, _), value in zip(keys, payload["v"])
+        ]
+    except (ValueError, KeyError, TypeError):
+        raise invalid_cursor()
+
+
+# 严格位于游标之后的条件：同方向的连续列用行比较 (a, b) < (va, vb)，可直接在索引上定位
+def after_condition(keys: list, values: list):
+    columns = [column for column, _ in keys]
+    if len(columns) == 1:
+        return columns[0] < values[0] if keys[0][1] else columns[0] > values[0]
+    return tuple_(*columns) < tuple_(*values) if keys[0][1] else tuple_(*columns) > tuple_(*values)
+
+
+# 按方向把排序键切成连续的组，如 [sort_order 升序] [created_at 降序, id 降序]
+def split_direction_groups(keys: list) -> list:
+    groups = []
+    for key in keys:
+        if groups and groups[-1][-1][1] == key[1]:
+            groups[-1].append(key)
+        else:
+            groups.append([key])
+    return groups
+
+
+# 游标之后的查询分支，按结果顺序排列
+# 排序方向混合时（如 sort_order 升序、created_at 降序）无法用一个行比较表达，
+# 拆成“前面各组相等 + 当前组严格之后”的若干分支，每个分支都是一次索引定位
+def cursor_branches(query, keys: list, values: list) -> list:
+    groups = split_direction_groups(keys)
+    branches = []
+    offset = sum(len(group) for group in groups)
+    for index in range(len(groups) - 1, -1, -1):
+        offset -= len(groups[index])
+        group_values = values[offset:offset + len(groups[index])]
+        equal_prefix = [column == value for (column, _), value in zip(keys[:offset], values[:offset])]
+        branches.append(query.where(and_(*equal_prefix, after_condition(groups[index], group_values))))
+    return branches
+
+
+# 取一页：返回 (本页数据, 下一页游标)，没有更多数据时游标为 None
+# 每页至多执行与方向分组数相同的查询（通常只需第一个分支），耗时与页码无关
+async def keyset_page(
+        db: AsyncSession,
+        query,
+        keys: list,
+        cursor: str = None,
+        page_size: int = 20
+) -> tuple:
+    ordering = [column.desc() if descending else column.asc() for column, descending in keys]
+    query = query.order_by(None).order_by(*ordering)
+    branches = cursor_branches(query, keys, decode_cursor(keys, cursor)) if cursor else [query]
+
+    rows = []
+    for branch in branches:
+        rows.extend((await db.scalars(branch.limit(page_size + 1 - len(rows)))).all())
+        if len(rows) > page_size:
+            break
+
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, encode_cursor(keys, rows[-1])
+    return rows, None
@@ -1,6 +1,16 @@
 import enum
 import re
+import time
+import base64
+import hashlib
+import hmac
+import logging
+import secrets
 from passlib.context import CryptContext
+from ..core.config import settings
+from ..core.storage import storage_key
+
+logger = logging.getLogger(__name__)
 
 
 # 角色枚举
@@ -32,6 +42,52 @@ def get_album_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+# 检查签名媒体URL密钥（应用启动时调用）：不能与 JWT 的 SECRET_KEY 共用，否则任一处泄露即可同时伪造令牌和媒体URL
+# 列表接口总会签发媒体URL，且 nginx 的 /media/ 按同一密钥校验（与 MEDIA_DELIVERY 无关），未配置时拒绝启动；
+# 只有显式设置 MEDIA_URL_SECRET_DEV_RANDOM 时才使用进程内随机密钥（多 worker 之间、重启前后签发的URL互不通用）
+def check_media_url_secret():
+    if settings.MEDIA_URL_SECRET and settings.MEDIA_URL_SECRET == settings.SECRET_KEY:
+        raise RuntimeError("MEDIA_URL_SECRET 不能与 SECRET_KEY 相同")
+    if settings.MEDIA_URL_SECRET:
+        return
+    if not settings.MEDIA_URL_SECRET_DEV_RANDOM:
+        raise RuntimeError(
+            "未配置 MEDIA_URL_SECRET（需与 nginx 的 media_url_secret.conf 一致）；"
+            "本地单进程开发可设置 MEDIA_URL_SECRET_DEV_RANDOM=1 使用临时随机密钥"
+        )
+
+    settings.MEDIA_URL_SECRET = secrets.token_urlsafe(32)
+    logger.warning("MEDIA_URL_SECRET_DEV_RANDOM 已开启，使用临时随机密钥签名媒体URL（仅适合本地单进程开发）")
+
+
+# 计算媒体URL签名（与 nginx secure_link_md5 "$secure_link_expires$uri 密钥" 一致）
+def get_media_url_signature(uri: str, expires: int) -> str:
+    if not settings.MEDIA_URL_SECRET:
+        raise RuntimeError("未配置 MEDIA_URL_SECRET")
+    digest = hashlib.md5(f"{expires}{uri} {settings.MEDIA_URL_SECRET}".encode()).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+# 生成带过期时间的签名媒体URL（path 为 /static/... 形式的文件路径）
+# 过期时间按有效期取整，同一时间窗口内URL不变，浏览器缓存可复用
+def sign_media_url(path: str) -> str:
+    if not path:
+        return path
+
+    uri = settings.MEDIA_SIGNED_PREFIX.rstrip("/") + "/" + storage_key(path)
+    window = settings.MEDIA_URL_EXPIRE_SECONDS
+    expires = (int(time.time()) // window + 2) * window
+
+    return f"{uri}?md5={get_media_url_signature(uri, expires)}&expires={expires}"
+
+
+# 校验签名媒体URL（未经 nginx 时由应用校验）
+def verify_media_url(uri: str, signature: str, expires: int) -> bool:
+    if not signature or expires < time.time():
+        return False
+    return hmac.compare_digest(get_media_url_signature(uri, expires), signature)
+
+
 # 敏感词过滤
 def filter_sensitive_words(text: str) -> str:
     # 示例敏感词列表，实际项目应从配置/数据库加载
@@ -5,7 +5,10 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import os
 import logging
-from app.core.db import init_database
+import asyncio
+from app.core.db import init_database, async_engine, replica_set
+from app.core.db_routing import ReadYourWritesMiddleware
+from app.core.config import settings
 # 加载环境变量
 from dotenv import load_dotenv
 
@@ -22,9 +25,33 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     # 启动前
     logger.info("🚀 FastAPI application starting up...")
+    from app.utils.security_utils import check_media_url_secret
+    check_media_url_secret()
     init_database()  # 调用重构后的初始化函数
+
+    # 恢复重启前未完成的缩略图/EXIF处理任务
+    from app.services.image_service import resume_pending_image_processing
+    resumed = resume_pending_image_processing()
+    logger.info(f"重新提交 {resumed} 个图片处理任务")
+
+    # 只读副本：先检查一次延迟，之后在后台定期检查
+    replica_monitor = None
+    if replica_set.replicas:
+        await replica_set.check()
+        replica_monitor = asyncio.create_task(replica_set.monitor())
+
+    # 定期清理过期的分片上传会话及其临时文件
+    from app.services.upload_session_service import purge_expired_upload_sessions_periodically
+    upload_session_purger = asyncio.create_task(purge_expired_upload_sessions_periodically())
+
     yield
     # 关闭后
+    upload_session_purger.cancel()
+    if replica_monitor:
+        replica_monitor.cancel()
+    from app.services.derivative_service import shutdown_process_pool
+    shutdown_process_pool()
+    await async_engine.dispose()
     logger.info("🛑 FastAPI application shutting down...")
 
 # 创建应用
@@ -43,6 +70,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 读写分离：写入后的一段时间内该客户端的读请求走主库
+if replica_set.replicas:
+    app.add_middleware(ReadYourWritesMiddleware)
+
 # 延迟导入路由
 from app.api import auth_api, album_api, image_api, blog_api, search_api, admin_api
 
@@ -50,9 +81,11 @@ from app.api import auth_api, album_api, image_api, blog_api, search_api, admin_
 app.include_router(auth_api.router, prefix="/api/auth", tags=["认证"])
 app.include_router(album_api.router, prefix="/api/albums", tags=["图片集"])
 app.include_router(image_api.router, prefix="/api/images", tags=["图片"])
+app.include_router(image_api.upload_router, prefix="/api/upload", tags=["上传"])
 app.include_router(blog_api.router, prefix="/api/blogs", tags=["博客"])
 app.include_router(search_api.router, prefix="/api/search", tags=["搜索"])
 app.include_router(admin_api.router, prefix="/api/admin", tags=["管理员"])
+app.include_router(image_api.media_router, prefix=settings.MEDIA_SIGNED_PREFIX.rstrip("/"), tags=["媒体文件"])
 
 
 # 根路由
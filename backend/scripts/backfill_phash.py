@@ -0,0 +1,81 @@
+# backend/scripts/backfill_phash.py - 为已处理完成但缺少感知哈希/特征向量/占位图的图片补算
+# 从最小一档预生成版本计算，不解码原图。可重复执行，只处理上述字段有缺失的blob。
+#
+# 用法（在 backend 目录下执行）：
+#   python -m scripts.backfill_phash [--batch 500]
+import argparse
+
+from PIL import Image as PILImage
+from sqlalchemy import or_
+
+from app.core.db import SessionLocal
+from app.models.blob import Blob
+from app.models.image import Image
+from app.utils.file_utils import (
+    compute_dhash, compute_feature_vector, compute_blurhash, compute_dominant_color
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="补算感知哈希、特征向量与占位图")
+    parser.add_argument("--batch", type=int, default=500, help="每批处理的blob数")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    done = failed = 0
+    last_hash = ""
+    try:
+        while True:
+            blobs = db.query(Blob).filter(
+                or_(
+                    Blob.phash.is_(None),
+                    Blob.features.is_(None),
+                    Blob.blurhash.is_(None),
+                    Blob.blurhash == ""
+                ),
+                Blob.processing_status == "done",
+                Blob.hash > last_hash
+            ).order_by(Blob.hash).limit(args.batch).all()
+            if not blobs:
+                break
+
+            for blob in blobs:
+                last_hash = blob.hash
+                if not blob.renditions:
+                    failed += 1
+                    continue
+                smallest = min(blob.renditions, key=lambda r: r["bytes"])
+                try:
+                    with PILImage.open(smallest["path"].lstrip('/')) as img:
+                        img = img.convert("RGB")
+                    phash = compute_dhash(img)
+                    features = compute_feature_vector(img)
+                    blurhash = compute_blurhash(img)
+                    dominant_color = compute_dominant_color(img)
+                except Exception as e:
+                    print(f"{blob.hash}: {e}")
+                    failed += 1
+                    continue
+
+                blob.phash = phash
+                blob.features = features
+                blob.blurhash = blurhash
+                blob.dominant_color = dominant_color
+                db.query(Image).filter(Image.file_hash == blob.hash).update(
+                    {
+                        Image.phash: phash,
+                        Image.blurhash: blurhash,
+                        Image.dominant_color: dominant_color
+                    },
+                    synchronize_session=False
+                )
+                done += 1
+
+            db.commit()
+            print(f"已补算 {done} 个，失败 {failed} 个")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
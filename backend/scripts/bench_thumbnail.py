@@ -0,0 +1,121 @@
+# backend/scripts/bench_thumbnail.py - 缩略图生成基准测试
+# 对比全分辨率解码与 DCT 缩放解码（draft）两条路径的耗时和峰值内存。
+#
+# 用法（在 backend 目录下执行）：
+#   python -m scripts.bench_thumbnail [图片目录] [--size 200] [--repeat 3]
+# 未指定目录时生成 24MP / 50MP 的测试 JPEG。
+# 每条路径在独立子进程中运行，峰值内存取子进程的 ru_maxrss（仅支持类 Unix 系统）。
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+# 相机常见分辨率
+CAMERA_SIZES = {
+    "24MP": (6000, 4000),
+    "50MP": (8688, 5792)
+}
+
+
+# 生成测试图片（带噪声渐变，避免被过度压缩）
+def make_sample_images(output_dir: str) -> list:
+    paths = []
+    for name, size in CAMERA_SIZES.items():
+        path = os.path.join(output_dir, f"sample_{name}.jpg")
+        if not os.path.exists(path):
+            noise = Image.effect_noise((size[0] // 8, size[1] // 8), 64).resize(size)
+            gradient = Image.linear_gradient("L").resize(size)
+            Image.merge("RGB", (noise, gradient, noise)).save(path, "JPEG", quality=92)
+        paths.append(path)
+    return paths
+
+
+# 全分辨率解码路径（优化前）
+def thumbnail_full_decode(image_path: str, output_path: str, size: tuple):
+    with Image.open(image_path) as img:
+        img = img.convert("RGB")
+    img.thumbnail(size, Image.LANCZOS)
+    img.save(output_path, "JPEG", quality=85)
+
+
+# DCT 缩放解码路径（file_utils.generate_thumbnail）
+def thumbnail_draft_decode(image_path: str, output_path: str, size: tuple):
+    from app.utils.file_utils import generate_thumbnail
+    generate_thumbnail(image_path, output_path, size)
+
+
+MODES = {
+    "full": thumbnail_full_decode,
+    "draft": thumbnail_draft_decode
+}
+
+
+# 子进程：运行一种路径并输出耗时
+def run_worker(mode: str, paths: list, size: int, repeat: int):
+    output_path = os.path.join(tempfile.gettempdir(), f"bench_thumb_{mode}.jpg")
+    timings = {}
+    for path in paths:
+        elapsed = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            MODES[mode](path, output_path, (size, size))
+            elapsed.append(time.perf_counter() - start)
+        timings[os.path.basename(path)] = min(elapsed)
+
+    print(json.dumps({
+        "timings": timings,
+        "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="缩略图解码路径基准测试")
+    parser.add_argument("image_dir", nargs="?", help="JPEG 图片目录")
+    parser.add_argument("--size", type=int, default=200, help="缩略图长边像素")
+    parser.add_argument("--repeat", type=int, default=3, help="每张图重复次数（取最小值）")
+    parser.add_argument("--worker", choices=list(MODES), help=argparse.SUPPRESS)
+    parser.add_argument("--paths", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, json.loads(args.paths), args.size, args.repeat)
+        return
+
+    if args.image_dir:
+        paths = sorted(
+            os.path.join(args.image_dir, name) for name in os.listdir(args.image_dir)
+            if name.lower().endswith((".jpg", ".jpeg"))
+        )
+    else:
+        paths = make_sample_images(tempfile.gettempdir())
+
+    results = {}
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, "-m", "scripts.bench_thumbnail",
+             "--worker", mode, "--paths", json.dumps(paths),
+             "--size", str(args.size), "--repeat", str(args.repeat)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'图片':<24}{'全解码(s)':>12}{'draft(s)':>12}{'加速':>8}")
+    for name in results["full"]["timings"]:
+        full = results["full"]["timings"][name]
+        draft = results["draft"]["timings"][name]
+        print(f"{name:<24}{full:>12.3f}{draft:>12.3f}{full / draft:>7.1f}x")
+
+    # Linux 上 ru_maxrss 单位为 KB，macOS 为字节
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    for mode, result in results.items():
+        print(f"峰值内存 {mode}: {result['max_rss'] / unit:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
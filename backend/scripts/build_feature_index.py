@@ -0,0 +1,23 @@
+# backend/scripts/build_feature_index.py - 重建相似搜索特征矩阵快照
+# 快照之后新增的图片由各进程按需增量加载，定期（如每天）重建一次即可。
+#
+# 用法（在 backend 目录下执行）：
+#   python -m scripts.build_feature_index
+import time
+
+from app.core.db import SessionLocal
+from app.services.similarity_service import build_feature_index
+
+
+def main():
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        count = build_feature_index(db)
+        print(f"已写入 {count} 个特征向量，耗时 {time.perf_counter() - start:.1f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
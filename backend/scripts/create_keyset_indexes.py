@@ -0,0 +1,60 @@
+# backend/scripts/create_keyset_indexes.py - 创建游标分页所需的组合索引
+# 索引列顺序与各列表的排序键一致（等值筛选列在前），翻到任意一页都是一次索引定位。
+# 使用 CREATE INDEX CONCURRENTLY，不阻塞线上读写；可重复执行，已存在的索引跳过，
+# 上次中断留下的无效索引会先删除再重建。
+#
+# 用法（在 backend 目录下执行）：
+#   python -m scripts.create_keyset_indexes [--dry-run]
+import argparse
+
+from sqlalchemy import text
+
+from app.core.db import engine
+
+# (索引名, 表名, 列定义)
+KEYSET_INDEXES = [
+    # 图片集列表：user_id 等值 + (created_at, id) 降序
+    ("ix_albums_user_created_id", "albums", "user_id, created_at DESC, id DESC"),
+    # 不按用户筛选的图片集列表（公开图片集、搜索）：(created_at, id) 降序
+    ("ix_albums_created_id", "albums", "created_at DESC, id DESC"),
+    # 图片集内图片：album_id 等值 + sort_order 升序 + (created_at, id) 降序
+    ("ix_images_album_sort_created_id", "images", "album_id, sort_order, created_at DESC, id DESC"),
+    # 博客列表：公开列表按创建/更新时间，作者列表按 user_id 等值 + 创建时间（升序时反向扫描同一索引）
+    ("ix_blogs_created_id", "blogs", "created_at DESC, id DESC"),
+    ("ix_blogs_updated_id", "blogs", "updated_at DESC, id DESC"),
+    ("ix_blogs_user_created_id", "blogs", "user_id, created_at DESC, id DESC"),
+    # 博客评论：blog_id 等值 + (created_at, id) 降序
+    ("ix_comments_blog_created_id", "comments", "blog_id, created_at DESC, id DESC"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="创建游标分页索引")
+    parser.add_argument("--dry-run", action="store_true", help="只打印将执行的语句")
+    args = parser.parse_args()
+
+    # CONCURRENTLY 不能在事务中执行
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, table, columns in KEYSET_INDEXES:
+            valid = conn.execute(text(
+                "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = :name"
+            ), {"name": name}).scalar()
+
+            if valid:
+                print(f"已存在: {name}")
+                continue
+
+            statements = []
+            if valid is False:
+                statements.append(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            statements.append(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})")
+
+            for statement in statements:
+                print(statement)
+                if not args.dry_run:
+                    conn.execute(text(statement))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# backend/scripts/load_test_db_latency.py - 慢查询下的接口延迟压测
+# 用一个独立连接对 albums 表加排他锁，使所有涉及图片集的查询被卡住；
+# 同时并发请求与 albums 无关的博客列表接口，对比加锁前后博客接口的延迟分布。
+# 同步会话下被卡住的请求会占住事件循环，博客接口延迟接近加锁时长；
+# 异步会话下只有图片集请求在等待，博客接口延迟应与基线接近。
+#
+# 用法（在 backend 目录下执行，服务建议以单 worker 启动）：
+#   python -m scripts.load_test_db_latency --username admin --password ****** \
+#       [--base-url http://localhost:8000] [--concurrency 16] [--duration 10] [--lock-seconds 8]
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+
+from app.core.config import settings
+
+# 被锁住的接口（查询 albums）与观察延迟的接口（不涉及 albums）
+BLOCKED_PATH = "/api/albums/?page=1&page_size=10"
+PROBE_PATH = "/api/blogs/?page=1&size=10"
+
+
+def request_json(url: str, token: str = None, body: dict = None, timeout: float = 60) -> dict:
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, headers=headers, method="POST" if data else "GET")
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read() or b"{}")
+
+
+def login(base_url: str, username: str, password: str) -> str:
+    result = request_json(f"{base_url}/api/auth/login", body={"username": username, "password": password})
+    return result["data"]["token"]
+
+
+# 在截止时间前循环请求，返回每次请求的耗时（毫秒）与失败次数
+def hammer(url: str, token: str, deadline: float) -> tuple:
+    latencies, errors = [], 0
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            request_json(url, token)
+            latencies.append((time.perf_counter() - start) * 1000)
+        except (urllib.error.URLError, OSError):
+            errors += 1
+    return latencies, errors
+
+
+def run_phase(base_url: str, token: str, concurrency: int, duration: float, blocked_workers: int = 0) -> tuple:
+    deadline = time.monotonic() + duration
+    with ThreadPoolExecutor(max_workers=concurrency + blocked_workers) as executor:
+        probes = [executor.submit(hammer, f"{base_url}{PROBE_PATH}", token, deadline) for _ in range(concurrency)]
+        for _ in range(blocked_workers):
+            executor.submit(hammer, f"{base_url}{BLOCKED_PATH}", token, deadline)
+        latencies, errors = [], 0
+        for future in probes:
+            worker_latencies, worker_errors = future.result()
+            latencies.extend(worker_latencies)
+            errors += worker_errors
+    return latencies, errors
+
+
+# 独立连接持有 albums 表排他锁，持续 seconds 秒后回滚释放
+def hold_album_lock(seconds: float, locked: threading.Event):
+    conn = psycopg2.connect(settings.DATABASE_URI)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("LOCK TABLE albums IN ACCESS EXCLUSIVE MODE")
+            locked.set()
+            time.sleep(seconds)
+        conn.rollback()
+    finally:
+        conn.close()
+
+
+def report(name: str, latencies: list, errors: int):
+    if not latencies:
+        print(f"{name:<10} 无成功请求（失败 {errors} 次）")
+        return
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(
+        f"{name:<10} 请求 {len(latencies):>6}  失败 {errors:>4}  "
+        f"p50 {quantiles[49]:>8.1f}ms  p95 {quantiles[94]:>8.1f}ms  "
+        f"p99 {quantiles[98]:>8.1f}ms  max {latencies[-1]:>8.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="慢查询下的接口延迟压测")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="服务地址")
+    parser.add_argument("--username", required=True, help="登录用户名")
+    parser.add_argument("--password", required=True, help="登录密码")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发请求博客列表的线程数")
+    parser.add_argument("--blocked", type=int, default=4, help="并发请求图片集列表（被锁住）的线程数")
+    parser.add_argument("--duration", type=float, default=10, help="每阶段持续秒数")
+    parser.add_argument("--lock-seconds", type=float, default=8, help="albums 表加锁秒数")
+    args = parser.parse_args()
+
+    base_url = args.base_url.rstrip("/")
+    token = login(base_url, args.username, args.password)
+
+    print("基线（无锁）...")
+    baseline = run_phase(base_url, token, args.concurrency, args.duration)
+
+    print(f"albums 表加锁 {args.lock_seconds} 秒...")
+    locked = threading.Event()
+    locker = threading.Thread(target=hold_album_lock, args=(args.lock_seconds, locked), daemon=True)
+    locker.start()
+    locked.wait()
+    contended = run_phase(base_url, token, args.concurrency, args.duration, args.blocked)
+    locker.join()
+
+    print()
+    report("基线", *baseline)
+    report("加锁期间", *contended)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+# backend/scripts/migrate_sharded_layout.py - 将旧的按用户平铺目录迁移到分片的内容寻址布局
+# 旧布局：static/uploads/<user_id>/<文件>、static/thumbnails/<user_id>/<文件>
+# 新布局：static/uploads/xx/xx/<sha256><ext>（与新上传一致，相同内容只存一份）
+#
+# 可在服务运行时执行（在线迁移）：
+#   1. 先为原图在新位置建立硬链接，新旧路径同时可读
+#   2. 按批登记blob并改写 Image 路径列，一批一个事务
+#   3. 提交前把待删除的旧文件写入日志，提交后再删除；中断后重新执行会先按日志清理，再继续迁移剩余记录
+#   4. 新文件的缩略图生成前，图片继续使用旧缩略图；衍生数据完成后旧缩略图不再被引用，才按日志删除
+# 新登记的文件默认在本脚本内生成缩略图及多分辨率版本；--defer-derivatives 时留给服务启动时的后台任务处理，
+# 旧缩略图留在日志中，后台任务完成后重新执行本脚本即可清理
+#
+# 用法（在 backend 目录下执行）：
+#   python -m scripts.migrate_sharded_layout [--batch 200] [--defer-derivatives] [--dry-run]
+import argparse
+import os
+from collections import Counter
+
+from sqlalchemy import or_
+
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.models.blob import Blob
+from app.models.image import Image
+from app.services.blob_service import lock_blob_hashes, register_blobs
+from app.services.derivative_service import (
+    STATUS_PENDING, STATUS_DONE, STATUS_FAILED, save_derivative_result, update_derivative_status
+)
+from app.services.image_service import (
+    BASE_UPLOAD_DIR, THUMBNAIL_DIR, STAGING_DIR, sync_blob_derivatives
+)
+from app.utils.file_utils import (
+    ensure_dir, get_blob_path, hash_file, is_sharded_path, link_or_copy_file,
+    process_image_derivatives
+)
+
+# 待删除旧文件日志
+JOURNAL_PATH = os.path.join(STAGING_DIR, "migrate_sharded_layout.journal")
+
+
+# 按日志删除已迁移的旧文件，返回删除数
+# 仍被引用的路径（衍生数据尚未生成的图片还在用的旧缩略图）保留在日志中，下次再清理
+def replay_journal(db) -> int:
+    if not os.path.exists(JOURNAL_PATH):
+        return 0
+
+    with open(JOURNAL_PATH, encoding="utf-8") as f:
+        paths = list(dict.fromkeys(line.strip() for line in f if line.strip()))
+
+    removed = 0
+    kept = []
+    for path in paths:
+        referenced = db.query(Image.id).filter(
+            or_(Image.file_path == f"/{path}", Image.thumbnail_path == f"/{path}")
+        ).first()
+        if referenced:
+            kept.append(path)
+            continue
+        if os.path.exists(path):
+            os.remove(path)
+            removed += 1
+
+    if kept:
+        # 先写临时文件再替换，中途中断不会丢失日志
+        tmp_path = f"{JOURNAL_PATH}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(f"{path}\n" for path in kept)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, JOURNAL_PATH)
+    else:
+        os.remove(JOURNAL_PATH)
+    return removed
+
+
+# 记录本批待删除的旧文件（提交前落盘）
+def write_journal(paths: list):
+    ensure_dir(os.path.dirname(JOURNAL_PATH))
+    with open(JOURNAL_PATH, "a", encoding="utf-8") as f:
+        f.writelines(f"{path}\n" for path in paths)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# 迁移一批图片，返回 (已迁移数, 缺失文件数, 新登记的blob列表)
+def migrate_batch(db, images: list, dry_run: bool = False) -> tuple:
+    staged = []
+    missing = 0
+    for image in images:
+        src_path = (image.file_path or "").lstrip('/')
+        if not src_path or not os.path.exists(src_path):
+            print(f"文件不存在，跳过: {image.id} {image.file_path}")
+            missing += 1
+            continue
+
+        file_size, file_hash = hash_file(src_path)
+        ext = os.path.splitext(src_path)[1].lower()
+        dest_path = get_blob_path(BASE_UPLOAD_DIR, file_hash, ext)
+        staged.append((image, src_path, dest_path, file_size, file_hash))
+
+    if dry_run or not staged:
+        return len(staged), missing, []
+
+    ref_counts = Counter(item[4] for item in staged)
+    # 与在线上传/清理互斥，直到本批提交
+    lock_blob_hashes(db, list(ref_counts))
+    existing = {
+        file_hash for (file_hash,) in
+        db.query(Blob.hash).filter(Blob.hash.in_(list(ref_counts))).all()
+    }
+
+    entries = {}
+    for image, src_path, dest_path, file_size, file_hash in staged:
+        if file_hash in existing or file_hash in entries:
+            continue
+        link_or_copy_file(src_path, dest_path)
+        entries[file_hash] = {
+            "file_path": f"/{dest_path}",
+            "size": file_size,
+            "mime_type": image.file_type or "",
+            "ref_count": ref_counts[file_hash]
+        }
+    for file_hash in existing:
+        entries[file_hash] = {"file_path": "", "size": 0, "mime_type": "", "ref_count": ref_counts[file_hash]}
+
+    blobs = register_blobs(db, entries)
+
+    old_paths = []
+    for image, src_path, dest_path, file_size, file_hash in staged:
+        blob = blobs[file_hash]
+        old_paths.append(src_path)
+        legacy_thumbnail = image.thumbnail_path and not is_sharded_path(image.thumbnail_path, THUMBNAIL_DIR)
+        if legacy_thumbnail:
+            old_paths.append(image.thumbnail_path.lstrip('/'))
+
+        image.file_path = blob.file_path
+        image.file_hash = file_hash
+        image.file_size = blob.size
+        # 新缩略图尚未生成时保留旧缩略图，生成完成后由 save_derivative_result / sync_blob_derivatives 改写
+        if blob.processing_status == STATUS_DONE or not legacy_thumbnail:
+            image.thumbnail_path = blob.thumbnail_path
+        image.renditions = blob.renditions
+        image.processing_status = blob.processing_status
+
+    write_journal(old_paths)
+    db.commit()
+
+    sync_blob_derivatives(db, [h for h in existing if blobs[h].processing_status != STATUS_DONE])
+
+    new_blobs = [(file_hash, blobs[file_hash].file_path) for file_hash in entries if file_hash not in existing]
+    return len(staged), missing, new_blobs
+
+
+# 生成衍生数据（缩略图、多分辨率版本、元数据）
+def process_new_blobs(new_blobs: list):
+    for file_hash, file_path in new_blobs:
+        try:
+            result = process_image_derivatives(
+                file_path.lstrip('/'),
+                get_blob_path(THUMBNAIL_DIR, file_hash),
+                settings.RENDITION_SIZES,
+                settings.RENDITION_FORMATS
+            )
+            save_derivative_result(file_hash, result)
+        except Exception as e:
+            print(f"生成衍生数据失败: {file_hash}: {e}")
+            update_derivative_status(file_hash, STATUS_FAILED, str(e))
+
+
+# 删除迁移后留下的空用户目录
+def remove_empty_legacy_dirs():
+    for base_dir in (BASE_UPLOAD_DIR, THUMBNAIL_DIR):
+        if not os.path.isdir(base_dir):
+            continue
+        for name in os.listdir(base_dir):
+            path = os.path.join(base_dir, name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            # 只删除空目录，分片目录和仍有文件的目录会失败并被跳过
+            try:
+                os.rmdir(path)
+            except OSError:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="迁移到分片目录布局")
+    parser.add_argument("--batch", type=int, default=200, help="每批迁移的图片数")
+    parser.add_argument("--defer-derivatives", action="store_true", help="不在脚本内生成衍生数据，留给服务后台任务")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不移动文件、不改数据库")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    migrated = missing = 0
+    last_id = ""
+    try:
+        removed = replay_journal(db)
+        if removed:
+            print(f"按日志清理了上次中断遗留的 {removed} 个旧文件")
+
+        while True:
+            # 仍指向旧布局的记录；按 id 递增分批，重新执行时已迁移的记录不会再被选中
+            images = db.query(Image).filter(
+                Image.id > last_id,
+                or_(
+                    Image.file_hash.is_(None),
+                    Image.file_hash == "",
+                    ~Image.file_path.like(f"/{BASE_UPLOAD_DIR}/__/__/%")
+                )
+            ).order_by(Image.id).limit(args.batch).all()
+            if not images:
+                break
+            last_id = images[-1].id
+
+            count, batch_missing, new_blobs = migrate_batch(db, images, args.dry_run)
+            migrated += count
+            missing += batch_missing
+
+            if new_blobs and not args.defer_derivatives:
+                process_new_blobs(new_blobs)
+            if not args.dry_run:
+                # 原图已改用新路径，可立即删除；旧缩略图在衍生数据完成后才不再被引用
+                replay_journal(db)
+
+            print(f"已迁移 {migrated} 张，缺失 {missing} 张")
+
+        if not args.dry_run:
+            remove_empty_legacy_dirs()
+            if args.defer_derivatives:
+                pending = db.query(Blob).filter(Blob.processing_status == STATUS_PENDING).count()
+                print(f"{pending} 个文件的衍生数据将在服务启动时生成")
+            if os.path.exists(JOURNAL_PATH):
+                print("部分旧缩略图仍在使用，衍生数据生成完成后重新执行本脚本即可清理")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
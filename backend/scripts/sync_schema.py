@@ -0,0 +1,112 @@
+# backend/scripts/sync_schema.py - 按模型补齐数据库表结构（新增的表、列与索引）
+# 以 app/models 中的模型定义为准：缺少的表整表创建；已有的表追加缺少的列与索引。
+# 新增的 NOT NULL 列先以可空列追加，按 LEGACY_COLUMNS 从旧列回填后再设为 NOT NULL；
+# 模型中已不存在的旧列保留数据，只去掉 NOT NULL（新插入的行不再写入这些列）。
+# 可重复执行，已存在的表/列/索引跳过。
+# 应在 scripts.create_keyset_indexes 之前执行（部分索引依赖这里新增的列）。
+#
+# 用法（在 backend 目录下执行）：
+#   python -m scripts.sync_schema [--dry-run]
+import argparse
+
+from sqlalchemy import inspect, literal
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from app.core.db import engine
+# 外键引用的表（生成建表语句时需要解析）
+from app.models import album, user  # noqa: F401
+from app.models.blob import Blob
+from app.models.image import Image
+from app.models.upload_session import UploadSession
+from app.models.zip_import import ZipImport
+
+# 需要同步的表（按外键依赖顺序）
+SYNC_TABLES = [Blob.__table__, Image.__table__, UploadSession.__table__, ZipImport.__table__]
+
+# 新列 -> 旧列（按顺序取第一个非空值）：旧版模型的 name/url/size/mime_type，以及 init-db.sql 的 file_url
+LEGACY_COLUMNS = {
+    "images": {
+        "filename": ("name",),
+        "file_path": ("url", "file_url"),
+        "file_size": ("size",),
+        "file_type": ("mime_type",)
+    }
+}
+
+
+def quote(name: str) -> str:
+    return engine.dialect.identifier_preparer.quote(name)
+
+
+# 追加列的 DDL：模型里的标量默认值同时作为数据库默认值，已有行据此填充；NOT NULL 在回填后另行设置
+def add_column_sql(table, column) -> str:
+    dialect = engine.dialect
+    sql = (
+        f"ALTER TABLE {table.fullname} ADD COLUMN IF NOT EXISTS "
+        f"{quote(column.name)} {column.type.compile(dialect=dialect)}"
+    )
+    default = column.default
+    if default is not None and default.is_scalar and not isinstance(default.arg, (list, dict)):
+        sql += f" DEFAULT {literal(default.arg).compile(dialect=dialect, compile_kwargs={'literal_binds': True})}"
+    return sql
+
+
+# 追加一列：可空追加 -> 从旧列回填 -> 设为 NOT NULL（没有默认值也没有旧列可回填时，表中已有数据会使最后一步失败）
+def add_column_statements(table, column, existing: dict) -> list:
+    statements = [add_column_sql(table, column)]
+    sources = [name for name in LEGACY_COLUMNS.get(table.name, {}).get(column.name, ()) if name in existing]
+    if sources:
+        # 列刚追加，已有行都是默认值（或 NULL）；旧列为 NULL 的行保留该值
+        values = [f"CAST({quote(name)} AS {column.type.compile(dialect=engine.dialect)})" for name in sources]
+        statements.append(
+            f"UPDATE {table.fullname} SET {quote(column.name)} = "
+            f"COALESCE({', '.join(values + [quote(column.name)])})"
+        )
+    if not column.nullable:
+        statements.append(f"ALTER TABLE {table.fullname} ALTER COLUMN {quote(column.name)} SET NOT NULL")
+    return statements
+
+
+def schema_statements(conn) -> list:
+    inspector = inspect(conn)
+    statements = []
+    for table in SYNC_TABLES:
+        if not inspector.has_table(table.name, schema=table.schema):
+            statements.append(str(CreateTable(table).compile(dialect=engine.dialect)).strip())
+            statements.extend(
+                str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+                for index in table.indexes
+            )
+            continue
+
+        existing = {column["name"]: column for column in inspector.get_columns(table.name, schema=table.schema)}
+        for column in table.columns:
+            if column.name not in existing:
+                statements.extend(add_column_statements(table, column, existing))
+        # 模型已不再写入的旧列去掉 NOT NULL，否则新插入的行违反约束
+        statements.extend(
+            f"ALTER TABLE {table.fullname} ALTER COLUMN {quote(name)} DROP NOT NULL"
+            for name, column in existing.items()
+            if name not in table.columns and not column["nullable"]
+        )
+        statements.extend(
+            str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+            for index in table.indexes
+        )
+    return statements
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按模型补齐表结构")
+    parser.add_argument("--dry-run", action="store_true", help="只打印将执行的语句")
+    args = parser.parse_args()
+
+    with engine.begin() as conn:
+        for statement in schema_statements(conn):
+            print(statement)
+            if not args.dry_run:
+                conn.exec_driver_sql(statement)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models.base import Base
+# 注册全部模型（关系按类路径字符串解析）
+from app.models import user, album, image, blob, blog, upload_session, zip_import  # noqa: F401
+
+
+# 内存 SQLite 数据库，模型的 public schema 以附加库模拟
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite://",
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False}
+    )
+
+    @event.listens_for(engine, "connect")
+    def attach_public_schema(dbapi_connection, connection_record):
+        dbapi_connection.execute("ATTACH DATABASE ':memory:' AS public")
+
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine, autoflush=False)
+    engine.dispose()
+
+
+# 以同步会话执行异步会话接口（测试库为 SQLite，不使用异步驱动）
+class AsyncSessionAdapter:
+    def __init__(self, session):
+        self.session = session
+
+    async def execute(self, statement, params=None):
+        return self.session.execute(statement, params)
+
+    async def scalars(self, statement, params=None):
+        return self.session.scalars(statement, params)
+
+    async def scalar(self, statement, params=None):
+        return self.session.scalar(statement, params)
+
+    async def stream(self, statement, params=None):
+        result = self.session.execute(statement, params)
+
+        class AsyncResult:
+            async def partitions(self, size=None):
+                for partition in result.partitions(size):
+                    yield partition
+
+        return AsyncResult()
+
+
+@pytest.fixture
+def async_db(session_factory):
+    session = session_factory()
+    yield AsyncSessionAdapter(session)
+    session.close()
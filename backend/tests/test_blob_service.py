@@ -0,0 +1,30 @@
+from app.models.blob import Blob
+from app.services import blob_service
+from app.services.blob_service import purge_orphan_blobs
+
+
+def test_purge_only_deletes_unreferenced_blobs(session_factory, monkeypatch):
+    # 咨询锁是 PostgreSQL 函数，SQLite 测试库跳过
+    monkeypatch.setattr(blob_service, "lock_blob_hashes", lambda db, file_hashes: None)
+    db = session_factory()
+    db.add_all([
+        Blob(
+            hash="a" * 64,
+            file_path=f"/static/uploads/aa/aa/{'a' * 64}.jpg",
+            thumbnail_path=f"/static/thumbnails/aa/aa/{'a' * 64}.jpg",
+            renditions=[{"path": f"/static/thumbnails/aa/aa/{'a' * 64}_640.webp", "width": 640, "format": "webp"}],
+            ref_count=0
+        ),
+        Blob(hash="b" * 64, file_path=f"/static/uploads/bb/bb/{'b' * 64}.jpg", ref_count=1)
+    ])
+    db.commit()
+
+    purged = purge_orphan_blobs(db, ["a" * 64, "b" * 64, "c" * 64, ""])
+
+    assert purged == {"a" * 64: [
+        f"uploads/aa/aa/{'a' * 64}.jpg",
+        f"thumbnails/aa/aa/{'a' * 64}.jpg",
+        f"thumbnails/aa/aa/{'a' * 64}_640.webp"
+    ]}
+    assert db.get(Blob, "a" * 64) is None
+    assert db.get(Blob, "b" * 64).ref_count == 1
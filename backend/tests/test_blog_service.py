@@ -0,0 +1,30 @@
+from sqlalchemy import select
+
+from app.models.blog import Blog, Comment
+from app.models.user import User
+from app.services.blog_service import COMMENT_CHILDREN_LOADER
+
+
+def test_comment_children_loader_loads_all_reply_levels(session_factory):
+    db = session_factory()
+    db.add(User(id="user-1", username="alice", email="alice@example.com", hashed_password="x"))
+    db.add(Blog(id="blog-1", title="hello", user_id="user-1"))
+    db.add_all([
+        Comment(id="c1", content="root", blog_id="blog-1", user_id="user-1"),
+        Comment(id="c2", content="reply", blog_id="blog-1", user_id="user-1", parent_id="c1"),
+        Comment(id="c3", content="nested reply", blog_id="blog-1", user_id="user-1", parent_id="c2")
+    ])
+    db.commit()
+    db.close()
+
+    db = session_factory()
+    root = db.scalars(
+        select(Comment).where(Comment.parent_id.is_(None)).options(COMMENT_CHILDREN_LOADER)
+    ).unique().one()
+    # 加载后关闭会话，各级回复已在内存中，to_dict 不再触发懒加载
+    db.close()
+
+    data = root.to_dict()
+    assert [child["id"] for child in data["children"]] == ["c2"]
+    assert [child["id"] for child in data["children"][0]["children"]] == ["c3"]
+    assert data["children"][0]["children"][0]["children"] == []
@@ -0,0 +1,48 @@
+import numpy as np
+from PIL import Image
+
+from app.utils.file_utils import BASE83_CHARACTERS, compute_blurhash, compute_dominant_color
+
+# 参考实现（woltapp/blurhash 的 Python 移植）对相同输入的编码结果
+SOLID_HASH = "L5M^#v|zfQ|z|zo2fQo2fQfQfQfQ"
+GRADIENT_HASH = "L#HV9w00xuWBofWBj[fQfQfQfQfQ"
+NOISE_HASH = "L3F68}^PZ$_4~W$JrxXeNI%AO*#j"
+
+
+def decode_base83(text: str) -> int:
+    value = 0
+    for char in text:
+        value = value * 83 + BASE83_CHARACTERS.index(char)
+    return value
+
+
+def test_solid_colour_hash():
+    blurhash = compute_blurhash(Image.new("RGB", (120, 80), (200, 30, 90)))
+
+    # 1 位尺寸标志 + 1 位 AC 最大值 + 4 位 DC + 每个 AC 2 位
+    assert len(blurhash) == 1 + 1 + 4 + 2 * (4 * 3 - 1)
+    assert decode_base83(blurhash[0]) == (4 - 1) + (3 - 1) * 9
+    assert decode_base83(blurhash[2:6]) == (200 << 16) + (30 << 8) + 90
+    # 按整数像素位置采样的余弦和不为零，纯色图的奇数阶 AC 分量也有少量取值
+    assert blurhash == SOLID_HASH
+
+
+def test_component_count_is_encoded():
+    blurhash = compute_blurhash(Image.new("RGB", (32, 32), (0, 0, 0)), components=(3, 2))
+    assert decode_base83(blurhash[0]) == (3 - 1) + (2 - 1) * 9
+    assert len(blurhash) == 6 + 2 * (3 * 2 - 1)
+
+
+def test_matches_reference_encoder():
+    row = np.linspace(0, 255, 64, dtype=np.uint8)
+    gradient = np.repeat(np.tile(row, (64, 1))[..., None], 3, axis=2)
+    noise = np.random.default_rng(7).integers(0, 256, (48, 64, 3), dtype=np.uint8)
+
+    assert compute_blurhash(Image.fromarray(gradient)) == GRADIENT_HASH
+    assert compute_blurhash(Image.fromarray(noise)) == NOISE_HASH
+
+
+def test_dominant_color_picks_the_majority_colour():
+    img = Image.new("RGB", (100, 100), (10, 120, 200))
+    img.paste((250, 250, 250), (0, 0, 20, 100))
+    assert compute_dominant_color(img) == "#0a78c8"
@@ -0,0 +1,99 @@
+import asyncio
+
+from sqlalchemy import create_engine, select, update
+
+from app.core import db_routing
+from app.core.counting import ESTIMATE_SQL
+from app.core.db_routing import Replica, ReplicaSet, RoutingSession, parse_lsn
+from app.models.blob import Blob
+
+
+# 异步引擎替身：connect() 返回的连接按给定结果回答副本状态查询
+class FakeAsyncEngine:
+    def __init__(self, status_row=None, error: Exception = None):
+        self.status_row = status_row
+        self.error = error
+        self.sync_engine = create_engine("sqlite://")
+
+    def connect(self):
+        engine = self
+
+        class Connection:
+            async def __aenter__(self):
+                if engine.error:
+                    raise engine.error
+                return self
+
+            async def __aexit__(self, *args):
+                return False
+
+            async def execute(self, statement):
+                class Result:
+                    def one(self):
+                        return engine.status_row
+                return Result()
+
+        return Connection()
+
+
+def make_replica(name: str, replay_lsn: str, replay_age: float) -> Replica:
+    return Replica(name, FakeAsyncEngine((True, replay_lsn, replay_age)))
+
+
+def test_lagging_replica_is_skipped(monkeypatch):
+    monkeypatch.setattr(db_routing.settings, "DB_REPLICA_MAX_LAG_SECONDS", 5)
+    primary_lsn = parse_lsn("0/3000000")
+    fresh = make_replica("fresh", "0/3000000", 120.0)
+    lagging = make_replica("lagging", "0/2000000", 30.0)
+    broken = Replica("broken", FakeAsyncEngine(error=ConnectionError("refused")))
+
+    async def check_all():
+        for replica in (fresh, lagging, broken):
+            await replica.check(primary_lsn)
+
+    asyncio.run(check_all())
+
+    # 已追平主库时不计延迟，即使最后一次回放已是很久之前
+    assert fresh.healthy and fresh.lag_seconds == 0.0
+    assert not lagging.healthy and lagging.lag_bytes == 0x1000000
+    assert not broken.healthy and broken.error == "refused"
+
+    replica_set = ReplicaSet(None, [lagging, fresh, broken])
+    assert {replica_set.choose().name for _ in range(4)} == {"fresh"}
+
+    fresh.healthy = False
+    assert replica_set.choose() is None
+
+
+def test_session_reads_from_one_replica_until_it_writes():
+    replicas = [make_replica(f"replica{index}", "0/0", 0.0) for index in range(2)]
+    for replica in replicas:
+        replica.healthy = True
+    replica_set = ReplicaSet(None, replicas)
+    primary = create_engine("sqlite://")
+
+    session = RoutingSession(bind=primary, replica_set=replica_set)
+    query = select(Blob).where(Blob.hash == "a")
+    first = session.get_bind(clause=query)
+    assert first in {replica.engine.sync_engine for replica in replicas}
+    # 轮询在会话之间进行，同一会话内的读固定在同一副本
+    assert all(session.get_bind(clause=query) is first for _ in range(3))
+    assert RoutingSession(bind=primary, replica_set=replica_set).get_bind(clause=query) is not first
+
+    # 选定的副本被跳过后改走主库，不切换到进度可能不同的其他副本
+    session.replica.healthy = False
+    assert session.get_bind(clause=query) is primary
+
+    other = RoutingSession(bind=primary, replica_set=replica_set)
+    other.get_bind(clause=query)
+    assert other.get_bind(clause=update(Blob).values(ref_count=1)) is primary
+    assert other.get_bind(clause=query) is primary
+
+
+def test_row_estimate_is_routed_as_a_read():
+    replica = make_replica("replica0", "0/0", 0.0)
+    replica.healthy = True
+    session = RoutingSession(bind=create_engine("sqlite://"), replica_set=ReplicaSet(None, [replica]))
+
+    assert session.get_bind(clause=ESTIMATE_SQL) is replica.engine.sync_engine
+    assert not session.wrote
@@ -0,0 +1,180 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from app.models.blob import Blob
+from app.models.image import Image
+from app.services import derivative_service
+from app.services.derivative_service import (
+    STATUS_DONE, STATUS_PENDING, STATUS_PROCESSING, claim_derivative_jobs, list_claimable_derivative_jobs,
+    run_derivative_job, save_derivative_result, touch_derivative_job
+)
+
+FILE_HASH = "a" * 64
+
+
+def add_blob_with_images(db, status: str = STATUS_PROCESSING, image_count: int = 2):
+    db.add(Blob(
+        hash=FILE_HASH,
+        file_path=f"/static/uploads/aa/aa/{FILE_HASH}.jpg",
+        size=1024,
+        mime_type="image/jpeg",
+        processing_status=status,
+        ref_count=image_count
+    ))
+    db.add_all([
+        Image(
+            id=f"image-{index}",
+            filename=f"photo-{index}.png",
+            file_path=f"/static/uploads/aa/aa/{FILE_HASH}.jpg",
+            file_type="image/png",
+            file_size=1024,
+            file_hash=FILE_HASH,
+            user_id="user-1",
+            processing_status=status
+        )
+        for index in range(image_count)
+    ])
+    db.commit()
+
+
+def test_save_derivative_result_updates_blob_and_images(session_factory, monkeypatch):
+    monkeypatch.setattr(derivative_service, "SessionLocal", session_factory)
+    db = session_factory()
+    add_blob_with_images(db)
+
+    captured_at = datetime(2024, 5, 1, 12, 30)
+    save_derivative_result(FILE_HASH, {
+        "thumbnail_path": f"static/thumbnails/aa/aa/{FILE_HASH}.jpg",
+        "renditions": [{"path": f"static/thumbnails/aa/aa/{FILE_HASH}_640.webp", "width": 640, "format": "webp"}],
+        "exif_data": {"camera_model": "X100V"},
+        "width": 6000,
+        "height": 4000,
+        "captured_at": captured_at,
+        "phash": "0f0f0f0f0f0f0f0f",
+        "blurhash": "LEHV6nWB2yk8pyo0adR*.7kCMdnj",
+        "dominant_color": "#336699",
+        "features": b"\x00" * 16,
+        "mime_type": "image/jpeg"
+    })
+
+    db.expire_all()
+    blob = db.get(Blob, FILE_HASH)
+    assert blob.processing_status == STATUS_DONE
+    assert blob.thumbnail_path == f"/static/thumbnails/aa/aa/{FILE_HASH}.jpg"
+    assert blob.features == b"\x00" * 16
+
+    images = db.query(Image).filter(Image.file_hash == FILE_HASH).all()
+    assert len(images) == 2
+    for image in images:
+        assert image.processing_status == STATUS_DONE
+        assert image.thumbnail_path == blob.thumbnail_path
+        assert image.renditions[0]["path"] == f"/static/thumbnails/aa/aa/{FILE_HASH}_640.webp"
+        assert image.exif_data == {"camera_model": "X100V"}
+        assert (image.width, image.height) == (6000, 4000)
+        assert image.captured_at == captured_at
+        # 以文件头识别的类型覆盖客户端声明的类型
+        assert image.file_type == "image/jpeg"
+    db.close()
+
+
+def test_claim_derivative_jobs_claims_each_blob_once(session_factory, monkeypatch):
+    monkeypatch.setattr(derivative_service, "SessionLocal", session_factory)
+    db = session_factory()
+    add_blob_with_images(db, status=STATUS_PENDING)
+
+    assert claim_derivative_jobs() == [(FILE_HASH, f"/static/uploads/aa/aa/{FILE_HASH}.jpg")]
+    # 其他 worker 再领取时已被领走
+    assert claim_derivative_jobs() == []
+    assert claim_derivative_jobs([FILE_HASH]) == []
+
+    db.expire_all()
+    assert db.get(Blob, FILE_HASH).processing_status == STATUS_PROCESSING
+    assert {image.processing_status for image in db.query(Image)} == {STATUS_PROCESSING}
+    db.close()
+
+
+def test_claim_derivative_jobs_reclaims_stale_processing(session_factory, monkeypatch):
+    monkeypatch.setattr(derivative_service, "SessionLocal", session_factory)
+    db = session_factory()
+    add_blob_with_images(db)
+    blob = db.get(Blob, FILE_HASH)
+    blob.updated_at = datetime.now() - timedelta(seconds=derivative_service.settings.DERIVATIVE_STALE_SECONDS + 60)
+    db.commit()
+    db.close()
+
+    assert [row[0] for row in claim_derivative_jobs()] == [FILE_HASH]
+    assert claim_derivative_jobs() == []
+
+
+def test_list_claimable_derivative_jobs_does_not_claim(session_factory, monkeypatch):
+    monkeypatch.setattr(derivative_service, "SessionLocal", session_factory)
+    db = session_factory()
+    add_blob_with_images(db, status=STATUS_PENDING)
+    db.close()
+
+    assert list_claimable_derivative_jobs() == [(FILE_HASH, f"/static/uploads/aa/aa/{FILE_HASH}.jpg")]
+    assert [row[0] for row in claim_derivative_jobs()] == [FILE_HASH]
+    assert list_claimable_derivative_jobs() == []
+
+
+def test_touch_derivative_job_keeps_processing_job_claimed(session_factory, monkeypatch):
+    monkeypatch.setattr(derivative_service, "SessionLocal", session_factory)
+    db = session_factory()
+    add_blob_with_images(db)
+    blob = db.get(Blob, FILE_HASH)
+    blob.updated_at = datetime.now() - timedelta(seconds=derivative_service.settings.DERIVATIVE_STALE_SECONDS + 60)
+    db.commit()
+    db.close()
+
+    touch_derivative_job(FILE_HASH)
+
+    assert claim_derivative_jobs() == []
+
+
+def test_queued_jobs_are_claimed_when_they_start(session_factory, monkeypatch):
+    monkeypatch.setattr(derivative_service, "SessionLocal", session_factory)
+    monkeypatch.setattr(derivative_service, "_pending_semaphore", asyncio.Semaphore(1))
+    monkeypatch.setattr(derivative_service.settings, "DERIVATIVE_STALE_SECONDS", 0.03)
+    db = session_factory()
+    hashes = ["a" * 64, "b" * 64]
+    db.add_all([
+        Blob(hash=file_hash, file_path=f"/{file_hash}.jpg", size=1, mime_type="image/jpeg",
+             processing_status=STATUS_PENDING, ref_count=1)
+        for file_hash in hashes
+    ])
+    db.commit()
+    db.close()
+
+    statuses, touched = [], []
+
+    class RemoteStorage:
+        def local_path(self, key):
+            return None
+
+    def process(file_path, rendition_base):
+        check = session_factory()
+        statuses.append({blob.hash: blob.processing_status for blob in check.query(Blob)})
+        check.close()
+        # 处理耗时超过中断判定时长
+        time.sleep(0.1)
+        return {}
+
+    monkeypatch.setattr(derivative_service, "get_storage", RemoteStorage)
+    monkeypatch.setattr(derivative_service, "process_remote_derivatives", process)
+    monkeypatch.setattr(derivative_service, "save_derivative_result", lambda file_hash, result: None)
+    monkeypatch.setattr(derivative_service, "touch_derivative_job", touched.append)
+
+    async def run():
+        await asyncio.gather(*(
+            run_derivative_job(file_hash, f"/{file_hash}.jpg", f"static/thumbnails/{file_hash}")
+            for file_hash in hashes
+        ))
+
+    asyncio.run(run())
+
+    # 排队等待名额的任务尚未领取，不会因等待过久被其他 worker 当作中断任务
+    assert statuses[0] == {hashes[0]: STATUS_PROCESSING, hashes[1]: STATUS_PENDING}
+    assert statuses[1][hashes[1]] == STATUS_PROCESSING
+    # 处理期间定期刷新心跳
+    assert set(touched) == set(hashes)
@@ -0,0 +1,45 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from app.models.blob import Blob
+from app.services import duplicate_service
+from app.services.duplicate_service import DuplicateIndex
+
+
+def add_blob(db, index: int, phash: str):
+    db.add(Blob(hash=f"{index:064x}", file_path=f"/{index}.jpg", ref_count=1, phash=phash))
+    db.commit()
+
+
+def test_refresh_loads_in_batches_and_finds_near_duplicates(async_db, monkeypatch):
+    monkeypatch.setattr(duplicate_service, "REFRESH_BATCH_ROWS", 2)
+    for index, phash in enumerate(["ffff0000ffff0000", "ffff0000ffff0001", "0000ffff0000ffff", "ffff0000ffff0003"]):
+        add_blob(async_db.session, index, phash)
+
+    index = DuplicateIndex()
+    asyncio.run(index.refresh(async_db))
+
+    assert index.tree.size == 4
+    assert index.search("ffff0000ffff0000", 2) == {f"{0:064x}": 0, f"{1:064x}": 1, f"{3:064x}": 2}
+
+
+def test_refresh_picks_up_rows_committed_behind_the_watermark(async_db):
+    db = async_db.session
+    now = datetime(2024, 1, 1, 12, 0)
+    db.add(Blob(hash="a" * 64, file_path="/a.jpg", ref_count=1, phash="ffff0000ffff0000", updated_at=now))
+    db.commit()
+
+    index = DuplicateIndex()
+    asyncio.run(index.refresh(async_db))
+    assert index.loaded_until == now
+
+    # 另一事务较早取得 updated_at、在上次刷新之后才提交
+    db.add(Blob(
+        hash="b" * 64, file_path="/b.jpg", ref_count=1, phash="ffff0000ffff0001",
+        updated_at=now - timedelta(seconds=5)
+    ))
+    db.commit()
+    asyncio.run(index.refresh(async_db))
+
+    assert index.search("ffff0000ffff0000", 1) == {"a" * 64: 0, "b" * 64: 1}
+    assert index.blobs[int("ffff0000ffff0000", 16)] == {"a" * 64}
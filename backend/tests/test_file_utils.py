@@ -0,0 +1,33 @@
+import io
+import zipfile
+
+import pytest
+
+from app.utils.file_utils import iter_zip_stream, safe_archive_name
+
+
+@pytest.mark.parametrize("filename, expected", [
+    ("photo.jpg", "photo.jpg"),
+    ("../../etc/x.jpg", "x.jpg"),
+    ("/abs/path/x.jpg", "x.jpg"),
+    ("C:\\Users\\me\\x.jpg", "x.jpg"),
+    ("C:x.jpg", "x.jpg"),
+    ("..", "fallback.jpg"),
+    ("dir/", "fallback.jpg"),
+    ("", "fallback.jpg"),
+])
+def test_safe_archive_name(filename, expected):
+    assert safe_archive_name(filename, "fallback.jpg") == expected
+
+
+def test_zip_stream_round_trip():
+    entries = [
+        ("a.jpg", 5, 1700000000, lambda: iter([b"ab", b"cde"])),
+        ("b.txt", 3, 1700000000, lambda: iter([b"xyz"]))
+    ]
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(iter_zip_stream(entries))))
+
+    assert archive.namelist() == ["a.jpg", "b.txt"]
+    assert archive.read("a.jpg") == b"abcde"
+    assert archive.getinfo("a.jpg").compress_type == zipfile.ZIP_STORED
+    assert archive.read("b.txt") == b"xyz"
@@ -0,0 +1,134 @@
+import re
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+
+from app.core.config import settings
+from app.utils.http_utils import MAX_RANGES, media_file_response, parse_range_header
+
+CONTENT = bytes(range(256)) * 4
+
+
+def test_single_and_open_ended_ranges():
+    assert parse_range_header("bytes=0-99", 1000) == [[0, 100]]
+    assert parse_range_header("bytes=900-", 1000) == [[900, 1000]]
+    # 结束位置超出文件大小时截断
+    assert parse_range_header("bytes=900-5000", 1000) == [[900, 1000]]
+
+
+def test_suffix_range():
+    assert parse_range_header("bytes=-100", 1000) == [[900, 1000]]
+    assert parse_range_header("bytes=-5000", 1000) == [[0, 1000]]
+
+
+def test_overlapping_and_adjacent_ranges_are_merged():
+    assert parse_range_header("bytes=500-599, 0-99, 50-149, 150-199", 1000) == [[0, 200], [500, 600]]
+
+
+def test_unsatisfiable_range_raises_416():
+    with pytest.raises(HTTPException) as exc_info:
+        parse_range_header("bytes=1000-1100", 1000)
+    assert exc_info.value.status_code == 416
+    assert exc_info.value.headers["Content-Range"] == "bytes */1000"
+
+
+@pytest.mark.parametrize("header", ["items=0-99", "bytes=", "bytes=abc", "bytes=-", "bytes=200-100"])
+def test_unsupported_or_malformed_range_is_ignored(header):
+    assert parse_range_header(header, 1000) is None
+
+
+def test_too_many_ranges_are_ignored():
+    header = "bytes=" + ",".join(f"{i * 10}-{i * 10 + 4}" for i in range(MAX_RANGES + 1))
+    assert parse_range_header(header, 1000) is None
+
+
+# 以本地临时文件提供 media_file_response 的测试应用（TestClient 依赖 httpx，未安装时跳过）
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(settings, "MEDIA_DELIVERY", "direct")
+    file_path = tmp_path / "photo.jpg"
+    file_path.write_bytes(CONTENT)
+
+    app = FastAPI()
+
+    @app.get("/media")
+    async def media(request: Request):
+        return await media_file_response(
+            request=request,
+            file_path=str(file_path),
+            media_type="image/jpeg",
+            cache_policy="original",
+            use_storage=False
+        )
+
+    return TestClient(app)
+
+
+def test_full_response_has_validators(client):
+    response = client.get("/media")
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["etag"]
+    assert response.headers["last-modified"]
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["cache-control"] == "private, max-age=86400, must-revalidate"
+
+
+def test_if_none_match_returns_304(client):
+    etag = client.get("/media").headers["etag"]
+
+    response = client.get("/media", headers={"If-None-Match": f'"other", {etag}'})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    assert client.get("/media", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_single_range(client):
+    response = client.get("/media", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == CONTENT[10:20]
+    assert response.headers["content-range"] == f"bytes 10-19/{len(CONTENT)}"
+    assert response.headers["content-length"] == "10"
+
+
+def test_if_range_matching_etag_returns_partial_content(client):
+    etag = client.get("/media").headers["etag"]
+
+    response = client.get("/media", headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert response.status_code == 206
+    assert response.content == CONTENT[:10]
+
+
+def test_if_range_mismatch_returns_full_file(client):
+    response = client.get("/media", headers={"Range": "bytes=0-9", "If-Range": '"stale-etag"'})
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert "content-range" not in response.headers
+    assert response.headers["content-length"] == str(len(CONTENT))
+
+
+def test_multiple_ranges_return_multipart_byteranges(client):
+    response = client.get("/media", headers={"Range": "bytes=0-3, 100-103"})
+    assert response.status_code == 206
+
+    match = re.fullmatch(r"multipart/byteranges; boundary=(\S+)", response.headers["content-type"])
+    assert match
+    boundary = match.group(1)
+    assert response.content == (
+        f"--{boundary}\r\nContent-Type: image/jpeg\r\nContent-Range: bytes 0-3/{len(CONTENT)}\r\n\r\n".encode()
+        + CONTENT[0:4] + b"\r\n"
+        + f"--{boundary}\r\nContent-Type: image/jpeg\r\nContent-Range: bytes 100-103/{len(CONTENT)}\r\n\r\n".encode()
+        + CONTENT[100:104] + b"\r\n"
+        + f"--{boundary}--\r\n".encode()
+    )
+
+
+def test_unsatisfiable_range_returns_416(client):
+    response = client.get("/media", headers={"Range": f"bytes={len(CONTENT)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
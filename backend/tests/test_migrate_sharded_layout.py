@@ -0,0 +1,41 @@
+from app.models.image import Image
+from scripts import migrate_sharded_layout
+from scripts.migrate_sharded_layout import replay_journal, write_journal
+
+
+def test_replay_journal_keeps_thumbnails_still_in_use(session_factory, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    journal_path = tmp_path / "staging" / "migrate.journal"
+    monkeypatch.setattr(migrate_sharded_layout, "JOURNAL_PATH", str(journal_path))
+
+    old_upload = tmp_path / "static/uploads/user-1/photo.jpg"
+    old_thumbnail = tmp_path / "static/thumbnails/user-1/photo.jpg"
+    for path in (old_upload, old_thumbnail):
+        path.parent.mkdir(parents=True)
+        path.write_bytes(b"x")
+
+    db = session_factory()
+    # 原图已迁移到分片路径，新缩略图尚未生成，仍使用旧缩略图
+    db.add(Image(
+        id="image-1",
+        filename="photo.jpg",
+        file_path=f"/static/uploads/aa/aa/{'a' * 64}.jpg",
+        thumbnail_path="/static/thumbnails/user-1/photo.jpg",
+        file_hash="a" * 64,
+        user_id="user-1",
+        processing_status="pending"
+    ))
+    db.commit()
+
+    write_journal(["static/uploads/user-1/photo.jpg", "static/thumbnails/user-1/photo.jpg"])
+    assert replay_journal(db) == 1
+    assert not old_upload.exists()
+    assert old_thumbnail.exists()
+    assert journal_path.read_text(encoding="utf-8") == "static/thumbnails/user-1/photo.jpg\n"
+
+    # 衍生数据完成后缩略图改为新路径，旧缩略图随下次清理删除
+    db.get(Image, "image-1").thumbnail_path = f"/static/thumbnails/aa/aa/{'a' * 64}.jpg"
+    db.commit()
+    assert replay_journal(db) == 1
+    assert not old_thumbnail.exists()
+    assert not journal_path.exists()
@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from app.models.image import Image
+from app.utils.pagination_utils import decode_cursor, encode_cursor, keyset_page, split_direction_groups
+
+# 图片集内图片的排序：sort_order 升序，(created_at, id) 降序
+IMAGE_KEYS = [(Image.sort_order, False), (Image.created_at, True), (Image.id, True)]
+BASE_TIME = datetime(2024, 1, 1, 12, 0)
+
+
+def add_images(db, rows: list):
+    db.add_all([
+        Image(
+            id=image_id,
+            filename=f"{image_id}.jpg",
+            file_path=f"/static/uploads/{image_id}.jpg",
+            user_id="user-1",
+            sort_order=sort_order,
+            created_at=BASE_TIME + timedelta(minutes=minutes)
+        )
+        for image_id, sort_order, minutes in rows
+    ])
+    db.commit()
+
+
+def fetch_all_pages(db, keys: list, page_size: int) -> list:
+    ids = []
+    cursor = None
+    while True:
+        rows, cursor = asyncio.run(keyset_page(db, select(Image), keys, cursor, page_size))
+        ids.extend(row.id for row in rows)
+        if cursor is None:
+            return ids
+
+
+def test_split_direction_groups():
+    groups = split_direction_groups(IMAGE_KEYS)
+    assert [[column.key for column, _ in group] for group in groups] == [["sort_order"], ["created_at", "id"]]
+    assert len(split_direction_groups([(Image.created_at, True), (Image.id, True)])) == 1
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 10])
+def test_mixed_direction_pages_match_full_ordering(async_db, page_size):
+    db = async_db.session
+    # 同一 sort_order 内有相同的 created_at，翻页边界会落在并列的行之间
+    add_images(db, [
+        ("i01", 0, 5), ("i02", 0, 5), ("i03", 0, 3),
+        ("i04", 1, 9), ("i05", 1, 9), ("i06", 1, 9),
+        ("i07", 2, 1), ("i08", 0, 7), ("i09", 2, 1)
+    ])
+
+    expected = [
+        image.id for image in db.scalars(
+            select(Image).order_by(Image.sort_order.asc(), Image.created_at.desc(), Image.id.desc())
+        )
+    ]
+    assert expected == ["i08", "i02", "i01", "i03", "i06", "i05", "i04", "i09", "i07"]
+    assert fetch_all_pages(async_db, IMAGE_KEYS, page_size) == expected
+
+
+def test_single_direction_ties_on_created_at(async_db):
+    add_images(async_db.session, [("a", 0, 1), ("b", 0, 1), ("c", 0, 1), ("d", 0, 2)])
+
+    keys = [(Image.created_at, True), (Image.id, True)]
+    assert fetch_all_pages(async_db, keys, 2) == ["d", "c", "b", "a"]
+
+
+def test_cursor_round_trip_restores_datetimes():
+    row = Image(id="i01", sort_order=3, created_at=BASE_TIME)
+    assert decode_cursor(IMAGE_KEYS, encode_cursor(IMAGE_KEYS, row)) == [3, BASE_TIME, "i01"]
+
+
+@pytest.mark.parametrize("cursor", [
+    # 其他排序键生成的游标（如切换了排序字段）
+    encode_cursor([(Image.updated_at, True), (Image.id, True)], Image(id="i01", updated_at=BASE_TIME)),
+    "not-base64!",
+    "e30"  # {}
+])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(IMAGE_KEYS, cursor)
+    assert exc_info.value.status_code == 400
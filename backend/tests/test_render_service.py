@@ -0,0 +1,45 @@
+import os
+
+from app.services.render_service import DiskLRUCache
+
+
+def write_file(path, size: int, mtime: float):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    os.utime(path, (mtime, mtime))
+
+
+def cached_files(root) -> set:
+    return {name for _, _, names in os.walk(root) for name in names}
+
+
+def test_workers_sharing_a_directory_stay_within_one_budget(tmp_path):
+    root = str(tmp_path)
+    # 两个实例模拟两个 worker 进程，各自只记录自己写入的字节数；scan_parts 取大值使每次写入都扫描
+    workers = [DiskLRUCache(root, max_bytes=1000, scan_parts=1000), DiskLRUCache(root, max_bytes=1000, scan_parts=1000)]
+    for index in range(8):
+        path = os.path.join(root, "ab", f"{index}.jpg")
+        write_file(path, 300, 1000 + index)
+        workers[index % 2].add(path)
+
+    total = sum(os.path.getsize(os.path.join(root, "ab", name)) for name in cached_files(root))
+    assert total <= 1000
+    # 淘汰最旧的文件
+    assert cached_files(root) == {"5.jpg", "6.jpg", "7.jpg"}
+
+
+def test_hit_refreshes_recency(tmp_path):
+    root = str(tmp_path)
+    cache = DiskLRUCache(root, max_bytes=600, scan_parts=1000)
+    first, second, third = (os.path.join(root, f"{name}.jpg") for name in ("a", "b", "c"))
+    write_file(first, 300, 1000)
+    write_file(second, 300, 1001)
+    cache.add(second)
+
+    assert cache.get(first)
+    write_file(third, 300, 9999999999)
+    cache.add(third)
+
+    assert cached_files(root) == {"a.jpg", "c.jpg"}
+    assert not cache.get(second)
@@ -0,0 +1,44 @@
+import pytest
+
+from app.core.config import settings
+from app.utils.security_utils import check_media_url_secret, sign_media_url, verify_media_url
+
+
+@pytest.fixture
+def media_settings(monkeypatch):
+    monkeypatch.setattr(settings, "SECRET_KEY", "jwt-secret")
+    monkeypatch.setattr(settings, "MEDIA_URL_SECRET", "")
+    monkeypatch.setattr(settings, "MEDIA_DELIVERY", "direct")
+    monkeypatch.setattr(settings, "MEDIA_URL_SECRET_DEV_RANDOM", False)
+    return settings
+
+
+def test_media_secret_must_differ_from_jwt_secret(media_settings):
+    media_settings.MEDIA_URL_SECRET = "jwt-secret"
+    with pytest.raises(RuntimeError):
+        check_media_url_secret()
+
+
+@pytest.mark.parametrize("delivery", ["direct", "x-accel"])
+def test_missing_media_secret_fails_startup(media_settings, delivery):
+    media_settings.MEDIA_DELIVERY = delivery
+    with pytest.raises(RuntimeError):
+        check_media_url_secret()
+
+
+def test_random_secret_requires_explicit_dev_setting(media_settings):
+    media_settings.MEDIA_URL_SECRET_DEV_RANDOM = True
+    check_media_url_secret()
+    assert media_settings.MEDIA_URL_SECRET
+    assert media_settings.MEDIA_URL_SECRET != media_settings.SECRET_KEY
+
+
+def test_signed_url_round_trip(media_settings):
+    media_settings.MEDIA_URL_SECRET = "media-secret"
+    url = sign_media_url("/static/uploads/ab/cd/abcd.jpg")
+    uri, _, query = url.partition("?")
+    params = dict(part.split("=", 1) for part in query.split("&"))
+    assert verify_media_url(uri, params["md5"], int(params["expires"]))
+
+    media_settings.MEDIA_URL_SECRET = "rotated"
+    assert not verify_media_url(uri, params["md5"], int(params["expires"]))
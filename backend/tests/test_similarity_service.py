@@ -0,0 +1,63 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.models.blob import Blob
+from app.services import similarity_service
+from app.services.similarity_service import FeatureIndex
+from app.utils.file_utils import FEATURE_DIM
+
+
+def unit_vector(index: int) -> np.ndarray:
+    vector = np.zeros(FEATURE_DIM, dtype=np.float32)
+    vector[index] = 1
+    return vector
+
+
+def test_delta_rows_grow_and_are_searchable(async_db, monkeypatch, tmp_path):
+    monkeypatch.setattr(similarity_service, "DELTA_INITIAL_ROWS", 2)
+    db = async_db.session
+    db.add_all([
+        Blob(hash=f"{index:064x}", file_path=f"/{index}.jpg", ref_count=1, features=unit_vector(index).tobytes())
+        for index in range(5)
+    ])
+    db.commit()
+
+    index = FeatureIndex(str(tmp_path))
+    asyncio.run(index.refresh(async_db))
+    assert index.delta_count == 5
+    assert len(index.delta_vectors) >= 5
+
+    results = index.search(unit_vector(3), 2)
+    assert results[0] == (f"{3:064x}", 1.0)
+    assert len(results) == 2
+
+
+def test_updated_features_replace_the_delta_row(tmp_path):
+    index = FeatureIndex(str(tmp_path))
+    index.add_delta("a" * 64, unit_vector(0))
+    index.add_delta("a" * 64, unit_vector(1))
+
+    assert index.delta_count == 1
+    assert index.search(unit_vector(1), 1) == [("a" * 64, 1.0)]
+
+
+def test_refresh_picks_up_rows_committed_behind_the_watermark(async_db, tmp_path):
+    db = async_db.session
+    now = datetime(2024, 1, 1, 12, 0)
+    db.add(Blob(hash="a" * 64, file_path="/a.jpg", ref_count=1, features=unit_vector(0).tobytes(), updated_at=now))
+    db.commit()
+
+    index = FeatureIndex(str(tmp_path))
+    asyncio.run(index.refresh(async_db))
+
+    db.add(Blob(
+        hash="b" * 64, file_path="/b.jpg", ref_count=1, features=unit_vector(1).tobytes(),
+        updated_at=now - timedelta(seconds=5)
+    ))
+    db.commit()
+    asyncio.run(index.refresh(async_db))
+
+    assert index.delta_count == 2
+    assert index.search(unit_vector(1), 1) == [("b" * 64, 1.0)]
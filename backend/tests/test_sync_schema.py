@@ -0,0 +1,36 @@
+from sqlalchemy import create_engine, event
+
+from scripts.sync_schema import schema_statements
+
+
+def test_legacy_images_table_is_backfilled_before_not_null():
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def attach_public_schema(dbapi_connection, connection_record):
+        dbapi_connection.execute("ATTACH DATABASE ':memory:' AS public")
+
+    with engine.begin() as conn:
+        # 旧版模型的 images 表
+        conn.exec_driver_sql(
+            "CREATE TABLE public.images (id VARCHAR(36) PRIMARY KEY, name VARCHAR(255) NOT NULL, "
+            "url VARCHAR(512) NOT NULL, size INTEGER, mime_type VARCHAR(50), user_id VARCHAR(36) NOT NULL)"
+        )
+        statements = [s for s in schema_statements(conn) if "public.images " in s]
+
+    def position(fragment: str) -> int:
+        return next(index for index, statement in enumerate(statements) if fragment in statement)
+
+    add_filename = position("ADD COLUMN IF NOT EXISTS filename")
+    assert "NOT NULL" not in statements[add_filename]
+    backfill = position("SET filename = COALESCE(CAST(name AS VARCHAR(255)), filename)")
+    assert add_filename < backfill < position("ALTER COLUMN filename SET NOT NULL")
+    # 带默认值追加的列同样从旧列回填
+    assert position("ADD COLUMN IF NOT EXISTS file_size INTEGER DEFAULT 0") < position(
+        "SET file_size = COALESCE(CAST(size AS INTEGER), file_size)"
+    )
+
+    # 模型已不再写入的旧列去掉 NOT NULL；模型中仍有的列不动
+    assert "ALTER TABLE public.images ALTER COLUMN name DROP NOT NULL" in statements
+    assert "ALTER TABLE public.images ALTER COLUMN url DROP NOT NULL" in statements
+    assert not any("user_id DROP NOT NULL" in statement for statement in statements)
@@ -0,0 +1,40 @@
+import asyncio
+
+from app.core.config import settings
+from app.services import upload_session_service
+
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def test_periodic_purge_keeps_running_after_failure(monkeypatch):
+    calls = []
+
+    async def purge(db):
+        calls.append(db)
+        if len(calls) == 1:
+            raise RuntimeError("database unavailable")
+        return 1
+
+    monkeypatch.setattr(upload_session_service, "AsyncSessionLocal", FakeSession)
+    monkeypatch.setattr(upload_session_service, "purge_expired_upload_sessions", purge)
+    monkeypatch.setattr(settings, "UPLOAD_SESSION_PURGE_INTERVAL", 0)
+
+    async def run():
+        task = asyncio.create_task(upload_session_service.purge_expired_upload_sessions_periodically())
+        while len(calls) < 3:
+            await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return task
+
+    task = asyncio.run(run())
+
+    # 首次失败后继续按周期清理，关闭时可被取消
+    assert len(calls) >= 3
+    assert task.cancelled()
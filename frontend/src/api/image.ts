@@ -44,6 +44,16 @@ export const getAlbumImages = (albumId: string, page = 1, pageSize = 20) => {
   })
 }
 
+// 按游标获取图片集图片（无限滚动）：首次传空字符串，之后传上一页返回的 next_cursor
+export const getAlbumImagesByCursor = (albumId: string, cursor = '', pageSize = 20) => {
+  return request.get(`/images/album/${albumId}`, {
+    params: {
+      cursor,
+      page_size: pageSize,
+    },
+  })
+}
+
 // 获取图片详情
 export const getImageDetail = (imageId: string) => {
   return request.get(`/images/${imageId}`)
@@ -61,10 +71,16 @@ export const downloadImage = (imageId: string) => {
   })
 }
 
-// 批量下载图片
+// 批量下载图片（接口按表单接收 image_ids，每个ID一个字段；ZIP 边打包边下载，不设超时）
 export const batchDownloadImages = (imageIds: string[]) => {
-  return request.post('/images/batch-download', {
-    image_ids: imageIds,
+  const formData = new FormData()
+  imageIds.forEach((imageId) => formData.append('image_ids', imageId))
+  return request.post('/images/batch-download', formData, {
+    headers: {
+      'Content-Type': 'multipart/form-data',
+    },
+    responseType: 'blob',
+    timeout: 0,
   })
 }
 
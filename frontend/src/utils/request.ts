@@ -7,6 +7,8 @@ import { useUserStore } from '@/store/modules/user'
 const request = axios.create({
   baseURL: import.meta.env.VITE_API_BASE_URL || 'http://localhost:8080/api', // 关键：确保后端地址正确
   timeout: 10000,
+  // 跨域请求携带 Cookie：后端读写分离的写后读粘滞 Cookie（lg_db_primary_until）依赖它
+  withCredentials: true,
   headers: {
     'Content-Type': 'application/json;charset=utf-8',
   },
@@ -32,6 +34,11 @@ request.interceptors.request.use(
 // 响应拦截器
 request.interceptors.response.use(
   (response) => {
+    // 文件下载：响应体是二进制内容，没有统一的 code 包装，原样返回（调用方读取 res.data）
+    if (response.config.responseType === 'blob') {
+      return response
+    }
+
     // 统一处理响应格式
     const { data } = response
 
@@ -13,6 +13,8 @@ docker-compose up -d
 REM 启动后端服务
 echo 2. 启动后端服务...
 cd backend
+REM 本地单进程开发：未配置 MEDIA_URL_SECRET 时使用临时随机密钥签名媒体URL（新窗口继承该环境变量）
+set MEDIA_URL_SECRET_DEV_RANDOM=1
 start cmd /k "conda activate private-website && python main.py"
 
 REM 启动前端服务